@@ -0,0 +1,349 @@
+"""
+ngtitov_p2mpbatch.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Batch of the files of a directory transferred in a single P2MP-FTP session.
+
+The P2MP-FTP Client sends the directory as a single stream: the manifest of
+the files and directories of the tree, i.e. their names, modes, modification
+times and sizes, followed by the contents of the files in the order of the
+manifest. The P2MP-FTP Server unpacks the stream as it is received in
+sequence and recreates the tree in its output directory, so the files are
+written as they arrive and the whole batch is never stored.
+
+The names are relative to the directory, with the components separated by
+'/'. The symbolic links and the special files are not sent. A name that is
+absolute or leads out of the output directory is refused by the Server.
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+import os
+import stat
+import struct
+
+# P2MP-FTP batch manifest is defined:
+"""
+0                      16                      32
+-------------------------------------------------    -
+|               Magic Number 'P2MB'             |     |
+-------------------------------------------------     |
+|               Number of Entries               |     |--> 16 bytes
+-------------------------------------------------     |
+|          Size of the Entries (64 bits)        |     |
+-------------------------------------------------    -
+|                      Mode                     |     |
+-------------------------------------------------     |
+|          Modification Time (64 bits)          |     |
+-------------------------------------------------     |--> 22 bytes
+|                Size (64 bits)                 |     |    + name
+-------------------------------------------------     |
+|      Name Length      |         Name ...      |     |
+-------------------------------------------------    -
+"""
+
+# Initialization of constants
+BATCH_MAGIC = 'P2MB'
+MANIFEST_HEADER = struct.Struct('!4sIQ')
+MANIFEST_ENTRY = struct.Struct('!IQQH')
+
+
+def scan_directory(directory):
+    """Lists the directories and regular files of the tree in the order they
+    are sent.
+
+    Every directory comes before its content, and the entries of every
+    directory are sorted by name.
+
+    Args:
+        directory: root directory of the tree
+
+    Returns:
+        List of tuples of the name relative to the root directory, mode,
+        modification time in seconds and size of the entries
+    """
+    entries = []
+    for root, directories, files in os.walk(directory):
+        directories.sort()
+        prefix = os.path.relpath(root, directory).replace(os.sep, '/')
+        prefix = '' if prefix == '.' else prefix + '/'
+        for name in directories + sorted(files):
+            status = os.lstat(os.path.join(root, name))
+            if stat.S_ISDIR(status.st_mode):
+                entries.append((prefix + name, status.st_mode,
+                                int(status.st_mtime), 0))
+            elif stat.S_ISREG(status.st_mode):
+                entries.append((prefix + name, status.st_mode,
+                                int(status.st_mtime), status.st_size))
+    return entries
+
+
+def pack_manifest(entries):
+    """Packs the manifest of the entries of the batch.
+
+    Args:
+        entries: list of tuples of the name, mode, modification time and size
+
+    Returns:
+        Manifest as a string
+    """
+    packed = ''.join(MANIFEST_ENTRY.pack(mode, mtime, size, len(name)) + name
+                     for name, mode, mtime, size in entries)
+    return MANIFEST_HEADER.pack(BATCH_MAGIC, len(entries), len(packed)) + \
+        packed
+
+
+def unpack_manifest(manifest, count):
+    """Unpacks the entries of the manifest, verifying their names.
+
+    Args:
+        manifest: entries of the manifest following its header (string or
+                  buffer)
+        count: number of entries
+
+    Returns:
+        List of tuples of the name, mode, modification time and size
+
+    Raises:
+        ValueError: if the manifest is malformed or a name is not safe
+    """
+    entries = []
+    offset = 0
+    for _ in range(count):
+        try:
+            mode, mtime, size, length = MANIFEST_ENTRY.unpack_from(manifest,
+                                                                   offset)
+        except struct.error:
+            raise ValueError('Truncated batch manifest')
+        offset = offset + MANIFEST_ENTRY.size
+        name = str(manifest[offset:offset + length])
+        offset = offset + length
+        parts = name.split('/')
+        if len(name) != length or name.startswith('/') or '\0' in name or \
+                any(part in ('', '.', '..') for part in parts):
+            raise ValueError('Unsafe name in batch manifest: ' + repr(name))
+        if not stat.S_ISDIR(mode) and not stat.S_ISREG(mode):
+            raise ValueError('Unsupported entry in batch manifest: ' +
+                             repr(name))
+        entries.append((name, mode, mtime, size))
+    return entries
+
+
+class BatchReader:
+    """Stream of the batch of the directory read by the P2MP-FTP Client.
+
+    Attributes:
+        directory: root directory of the tree
+        entries: list of tuples of the name, mode, modification time and
+                 size of the entries in the order of the manifest
+        files: number of the regular files
+        size: size of the stream in bytes, i.e. of the manifest and of the
+              contents of the files
+        manifest: part of the manifest not read yet
+        index: index of the entry after the file being read
+        file_in: file object of the file being read, None between the files
+        remaining: number of bytes of the file being read not read yet
+    """
+    def __init__(self, directory):
+        """Initiates BatchReader object of the tree of the directory."""
+        self.directory = directory
+        self.entries = scan_directory(directory)
+        self.files = sum(1 for entry in self.entries
+                         if stat.S_ISREG(entry[1]))
+        self.manifest = pack_manifest(self.entries)
+        self.size = len(self.manifest) + sum(entry[3]
+                                             for entry in self.entries)
+        self.index = 0
+        self.file_in = None
+        self.remaining = 0
+
+    def read(self, size):
+        """Reads the next bytes of the stream.
+
+        A file that shrank since it was listed is padded with zeros and a
+        file that grew is cut to its listed size, so the stream keeps to the
+        manifest.
+
+        Args:
+            size: number of bytes to be read
+
+        Returns:
+            String of the size, shorter only at the end of the stream
+        """
+        chunks = []
+        if self.manifest:
+            chunks.append(self.manifest[:size])
+            self.manifest = self.manifest[size:]
+            size = size - len(chunks[-1])
+        while size:
+            if self.file_in is None:
+                while self.index < len(self.entries) and \
+                        not self.entries[self.index][3]:
+                    self.index = self.index + 1
+                if self.index == len(self.entries):
+                    break
+                self.file_in = open(os.path.join(
+                    self.directory, self.entries[self.index][0]), 'rb')
+                self.remaining = self.entries[self.index][3]
+                self.index = self.index + 1
+            data = self.file_in.read(min(size, self.remaining))
+            if not data:
+                # The file shrank
+                data = '\0' * min(size, self.remaining)
+            chunks.append(data)
+            size = size - len(data)
+            self.remaining = self.remaining - len(data)
+            if not self.remaining:
+                self.file_in.close()
+                self.file_in = None
+        return ''.join(chunks)
+
+    def close(self):
+        """Closes the file being read."""
+        if self.file_in is not None:
+            self.file_in.close()
+            self.file_in = None
+
+
+class BatchUnpacker:
+    """Unpacker of the batch received by the P2MP-FTP Server into its output
+    directory.
+
+    It takes the stream in sequence, as the output stream of StreamWriter.
+    The existing files of the tree are replaced. The modes and modification
+    times of the files are set once they are written, those of the
+    directories once the batch is done, so a read-only directory is still
+    written into.
+
+    Attributes:
+        directory: output directory
+        pending: received part of the manifest until it is complete
+        entries: list of tuples of the name, mode, modification time and size
+                 of the entries, None until the manifest is complete
+        index: index of the entry after the file being written
+        file_out: file object of the file being written, None between the
+                  files
+        remaining: number of bytes of the file being written not received
+                   yet
+        files: number of the files written completely
+    """
+    def __init__(self, directory):
+        """Initiates BatchUnpacker object of the output directory."""
+        self.directory = directory
+        self.pending = bytearray()
+        self.entries = None
+        self.index = 0
+        self.file_out = None
+        self.remaining = 0
+        self.files = 0
+
+    def write(self, data):
+        """Unpacks the next bytes of the stream.
+
+        Args:
+            data: data received in sequence (string or buffer)
+
+        Raises:
+            IOError: if the stream is not a valid batch or the tree cannot
+                     be written
+        """
+        try:
+            self.unpack(data)
+        except OSError, e:
+            raise IOError(e.errno, e.strerror, e.filename)
+
+    def unpack(self, data):
+        """Unpacks the manifest, creating the directories of the tree, and
+        writes the next bytes of the files.
+
+        Args:
+            data: data received in sequence (string or buffer)
+        """
+        offset = 0
+        if self.entries is None:
+            self.pending.extend(data)
+            if len(self.pending) < MANIFEST_HEADER.size:
+                return
+            magic, count, size = MANIFEST_HEADER.unpack_from(
+                buffer(self.pending))
+            if magic != BATCH_MAGIC:
+                raise IOError('Received stream is not a batch')
+            end = MANIFEST_HEADER.size + size
+            if len(self.pending) < end:
+                return
+            try:
+                self.entries = unpack_manifest(
+                    buffer(self.pending, MANIFEST_HEADER.size, size), count)
+            except ValueError, e:
+                raise IOError(str(e))
+            for name, mode, mtime, size in self.entries:
+                path = os.path.join(self.directory, name)
+                if stat.S_ISDIR(mode) and not os.path.isdir(path):
+                    os.makedirs(path)
+            # The contents of the files follow the manifest
+            data = self.pending[end:]
+            self.pending = None
+        self.next_file()
+        while offset < len(data) and self.file_out is not None:
+            size = min(self.remaining, len(data) - offset)
+            self.file_out.write(buffer(data, offset, size))
+            offset = offset + size
+            self.remaining = self.remaining - size
+            self.next_file()
+
+    def next_file(self):
+        """Finishes the file written completely and opens the next one,
+        creating the empty files on the way."""
+        while self.file_out is None or not self.remaining:
+            if self.file_out is not None:
+                self.finish_file()
+            if self.index == len(self.entries):
+                return
+            name, mode, mtime, size = self.entries[self.index]
+            self.index = self.index + 1
+            if stat.S_ISREG(mode):
+                self.file_out = open(os.path.join(self.directory, name), 'wb')
+                self.remaining = size
+
+    def finish_file(self):
+        """Closes the file written completely and sets its mode and
+        modification time."""
+        self.file_out.close()
+        self.file_out = None
+        name, mode, mtime, size = self.entries[self.index - 1]
+        path = os.path.join(self.directory, name)
+        os.chmod(path, stat.S_IMODE(mode))
+        os.utime(path, (mtime, mtime))
+        self.files = self.files + 1
+
+    def close(self):
+        """Closes the file being written, and sets the modes and
+        modification times of the directories once the batch is done.
+
+        Raises:
+            IOError: if the modes or times of the directories cannot be set
+        """
+        if self.file_out is not None:
+            self.file_out.close()
+            self.file_out = None
+        if self.entries is None or self.index < len(self.entries):
+            return
+        try:
+            for name, mode, mtime, size in reversed(self.entries):
+                if stat.S_ISDIR(mode):
+                    path = os.path.join(self.directory, name)
+                    os.chmod(path, stat.S_IMODE(mode))
+                    os.utime(path, (mtime, mtime))
+        except OSError, e:
+            raise IOError(e.errno, e.strerror, e.filename)
@@ -0,0 +1,579 @@
+"""
+ngtitov_p2mpbenchmark.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Benchmark of the Point-to-Multipoint File Transfer Protocol (P2MP-FTP) on
+the loopback interface.
+
+Every trial starts N P2MP-FTP Servers listening on the addresses 127.0.0.1,
+..., 127.0.0.N of the same port, transfers the file to them by a single
+P2MP-FTP Client, and verifies that every Server wrote the same file. The
+benchmark sweeps the number of Servers N, the MSS and the packet loss
+probability p, and repeats every combination of them in several trials. The
+classic experiments of the Project 2 are available as presets:
+ - servers: N = 1, ..., 5 with the MSS of 500 bytes and p = 0.05
+ - mss: MSS = 100, 200, ..., 1000 bytes with N = 3 and p = 0.05
+ - loss: p = 0.01, 0.02, ..., 0.10 with N = 3 and the MSS of 500 bytes
+
+Every trial records the transfer time reported by the Client, the goodput,
+i.e. the size of the file over the transfer time, and the numbers of segment
+transmissions, re-transmissions and timeouts. The trials are written to a
+CSV file, the summary statistics of every combination to another one, and
+both to a JSON file. The transfer time and the goodput of the combinations
+are plotted as well when matplotlib is installed.
+
+Execute the program run:
+ > python ngtitov_p2mpbenchmark.py [options]
+ where the options are
+ - -x, --experiment: preset of the classic experiment, 'servers', 'mss' or
+   'loss' (default 'servers')
+ - -n, --servers: comma-separated numbers of Servers N
+ - -m, --mss: comma-separated MSS values in bytes
+ - -p, --loss: comma-separated packet loss probabilities p
+ - -t, --trials: number of trials of every combination (default 5)
+ - -s, --size: size in bytes of the random file transferred (default 1 MB)
+ - -f, --file: file transferred instead of the random one
+ - -c, --client: options of the Client, e.g. '-a sr -w 32'
+ - -r, --server: options of the Servers (Receivers), e.g. '-w 32'
+ - -P, --port: port number of the Servers (default 7735)
+ - -T, --timeout: time in seconds after which the trial fails (default 300)
+ - -o, --output: prefix of the names of the result files (default
+   'benchmark')
+ - -g, --plot: plot the summary into the PNG file
+ - -k, --keep: keep the directories of the trials with the logs and the
+   files written
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None (matplotlib is optional)
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+from collections import OrderedDict
+import csv
+import filecmp
+import getopt
+import json
+import math
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as pyplot
+except ImportError:
+    pyplot = None
+
+# Initialization of constants
+# Presets of the classic experiments as name -> numbers of Servers, MSS
+# values and packet loss probabilities
+EXPERIMENTS = {
+    'servers': ([1, 2, 3, 4, 5], [500], [0.05]),
+    'mss': ([3], range(100, 1001, 100), [0.05]),
+    'loss': ([3], [500], [i / 100.0 for i in range(1, 11)])}
+# Parameters swept by the benchmark
+PARAMETERS = ('servers', 'mss', 'loss')
+DEFAULT_TRIALS = 5
+DEFAULT_FILE_SIZE = 1024 * 1024
+DEFAULT_PORT = 7735
+# Time in seconds after which the trial fails
+TRIAL_TIMEOUT = 300.0
+# Time in seconds the Servers are given to start listening and to exit once
+# the Client is done
+STARTUP_TIMEOUT = 5.0
+SHUTDOWN_TIMEOUT = 5.0
+POLL_INTERVAL = 0.05
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+CLIENT = os.path.join(DIRECTORY, 'ngtitov_p2mpclient.py')
+SERVER = os.path.join(DIRECTORY, 'ngtitov_p2mpserver.py')
+# Report of the Client at the end of the transfer, one per stripe
+TRANSFER_REPORT = re.compile(r'Transfer time = ([0-9.]+) s, transmissions = '
+                             r'(\d+), re-transmissions = (\d+), timeouts = '
+                             r'(\d+)')
+TRIAL_FIELDS = ('servers', 'mss', 'loss', 'trial', 'verified', 'time',
+                'wall_time', 'goodput', 'transmissions', 'retransmissions',
+                'timeouts')
+SUMMARY_FIELDS = ('servers', 'mss', 'loss', 'trials', 'verified',
+                  'time_mean', 'time_stdev', 'time_min', 'time_median',
+                  'time_max', 'goodput_mean', 'goodput_stdev',
+                  'retransmissions_mean', 'timeouts_mean')
+USAGE = 'usage: ngtitov_p2mpbenchmark.py [options]\n\n    options:\n' \
+        '        -x, --experiment NAME: Preset of the classic experiment: ' \
+        '\'servers\' (default), \'mss\' or \'loss\'\n' \
+        '        -n, --servers LIST:    Comma-separated numbers of Servers\n' \
+        '        -m, --mss LIST:        Comma-separated MSS values in ' \
+        'bytes\n' \
+        '        -p, --loss LIST:       Comma-separated packet loss ' \
+        'probabilities\n' \
+        '        -t, --trials N:        Number of trials of every ' \
+        'combination (default 5)\n' \
+        '        -s, --size BYTES:      Size of the random file transferred ' \
+        '(default 1048576)\n' \
+        '        -f, --file FILE:       File transferred instead of the ' \
+        'random one\n' \
+        '        -c, --client OPTIONS:  Options of the Client\n' \
+        '        -r, --server OPTIONS:  Options of the Servers\n' \
+        '        -P, --port PORT:       Port number of the Servers (default ' \
+        '7735)\n' \
+        '        -T, --timeout SECONDS: Time after which the trial fails ' \
+        '(default 300)\n' \
+        '        -o, --output PREFIX:   Prefix of the names of the result ' \
+        'files (default \'benchmark\')\n' \
+        '        -g, --plot:            Plot the summary into the PNG file ' \
+        '(requires matplotlib)\n' \
+        '        -k, --keep:            Keep the directories of the trials'
+
+
+def benchmark():
+    """Runs the trials of every combination of the swept parameters and
+    writes the results.
+
+    Returns:
+        True if every trial is verified
+    """
+    directory = tempfile.mkdtemp(prefix='p2mp-benchmark-')
+    if file_name is None:
+        file_in = os.path.join(directory, 'input.bin')
+        with open(file_in, 'wb') as random_file:
+            random_file.write(os.urandom(file_size))
+    else:
+        file_in = os.path.abspath(file_name)
+    size = os.stat(file_in).st_size
+    rows = []
+    try:
+        for servers in servers_list:
+            for mss in mss_list:
+                for loss in loss_list:
+                    for trial in range(1, trials + 1):
+                        row = run_trial(servers, mss, loss, trial, file_in,
+                                        size)
+                        rows.append(row)
+                        print 'N = {}, MSS = {}, p = {}, trial {}: {}'.format(
+                            servers, mss, loss, trial,
+                            'time = {:.3f} s, goodput = {:.0f} B/s, '
+                            're-transmissions = {}'.format(
+                                row['time'], row['goodput'],
+                                row['retransmissions'])
+                            if row['verified'] else 'FAILED')
+    except KeyboardInterrupt:
+        print 'Interrupted, writing the completed trials...'
+    shutil.rmtree(directory, ignore_errors=True)
+    summary = summarize(rows)
+    write_csv(output + '.csv', TRIAL_FIELDS, rows)
+    write_csv(output + '-summary.csv', SUMMARY_FIELDS, summary)
+    with open(output + '.json', 'w') as json_file:
+        json.dump(OrderedDict([
+            ('file_size', size), ('client_options', client_options),
+            ('server_options', server_options), ('trials', rows),
+            ('summary', summary)]), json_file, indent=2)
+    print_summary(summary)
+    if plot:
+        plot_summary(summary, output + '.png')
+    return all(row['verified'] for row in rows)
+
+
+def run_trial(servers, mss, loss, trial, file_in, size):
+    """Transfers the file to the P2MP-FTP Servers on the loopback interface.
+
+    The Servers are started first and the Client once all of them listen.
+    The trial fails if the Client does not finish in time, if a Server does
+    not start or exit in time, or if a file written is not the same as the
+    file transferred.
+
+    Args:
+        servers: number of Servers N
+        mss: maximum segment size in bytes
+        loss: packet loss probability p of the Servers
+        trial: number of the trial
+        file_in: name of the file transferred
+        size: size of the file in bytes
+
+    Returns:
+        Dictionary of the results as field -> value
+    """
+    directory = tempfile.mkdtemp(prefix='p2mp-trial-')
+    hosts = ['127.0.0.{}'.format(i) for i in range(1, servers + 1)]
+    files_out = [os.path.join(directory, 'out{}'.format(i))
+                 for i in range(1, servers + 1)]
+    processes = []
+    row = OrderedDict([('servers', servers), ('mss', mss), ('loss', loss),
+                       ('trial', trial), ('verified', False),
+                       ('time', None), ('wall_time', None),
+                       ('goodput', None), ('transmissions', None),
+                       ('retransmissions', None), ('timeouts', None)])
+    try:
+        for i, host in enumerate(hosts, 1):
+            processes.append(start(
+                [SERVER, '-l', host] + shlex.split(server_options) +
+                [str(port), files_out[i - 1], str(loss)],
+                os.path.join(directory, 'server{}.log'.format(i))))
+        if not all(wait_for(os.path.join(directory, 'server{}.log'.format(
+                i)), 'initialized', process) for i, process in enumerate(
+                    processes, 1)):
+            return row
+        client_log = os.path.join(directory, 'client.log')
+        start_time = time.time()
+        client = start([CLIENT] + shlex.split(client_options) + hosts +
+                       [str(port), file_in, str(mss)], client_log)
+        processes.append(client)
+        if not wait(client, trial_timeout):
+            return row
+        row['wall_time'] = time.time() - start_time
+        for process in processes:
+            if not wait(process, SHUTDOWN_TIMEOUT):
+                return row
+        with open(client_log) as log:
+            output_lines = log.read()
+        reports = TRANSFER_REPORT.findall(output_lines)
+        if not reports:
+            return row
+        # The stripes are transferred at the same time
+        row['time'] = max(float(report[0]) for report in reports)
+        row['transmissions'] = sum(int(report[1]) for report in reports)
+        row['retransmissions'] = sum(int(report[2]) for report in reports)
+        row['timeouts'] = sum(int(report[3]) for report in reports)
+        row['goodput'] = size / row['time'] if row['time'] else None
+        row['verified'] = all(os.path.isfile(file_out) and filecmp.cmp(
+            file_in, file_out, shallow=False) for file_out in files_out)
+        return row
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        if keep:
+            print 'Trial directory: {}'.format(directory)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def start(arguments, log_name):
+    """Starts the Python program writing its output to the log file.
+
+    Args:
+        arguments: name of the program followed by its arguments
+        log_name: name of the log file
+
+    Returns:
+        Popen object of the process
+    """
+    with open(log_name, 'w') as log:
+        return subprocess.Popen([sys.executable, '-u'] + arguments,
+                                stdout=log, stderr=subprocess.STDOUT,
+                                cwd=os.path.dirname(log_name))
+
+
+def wait(process, timeout):
+    """Waits until the process exits.
+
+    Args:
+        process: Popen object of the process
+        timeout: time in seconds to wait
+
+    Returns:
+        True if the process exited in time
+    """
+    deadline = time.time() + timeout
+    while process.poll() is None:
+        if time.time() >= deadline:
+            return False
+        time.sleep(POLL_INTERVAL)
+    return True
+
+
+def wait_for(log_name, text, process):
+    """Waits until the text appears in the log of the process.
+
+    Args:
+        log_name: name of the log file
+        text: text waited for
+        process: Popen object of the process writing the log
+
+    Returns:
+        True if the text appeared in time, False if it did not or if the
+        process exited
+    """
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        with open(log_name) as log:
+            if text in log.read():
+                return True
+        if process.poll() is not None:
+            return False
+        time.sleep(POLL_INTERVAL)
+    return False
+
+
+def summarize(rows):
+    """Computes the summary statistics of every combination of the swept
+    parameters over its verified trials.
+
+    Args:
+        rows: results of the trials
+
+    Returns:
+        List of the summaries as field -> value, in the order of the trials
+    """
+    groups = OrderedDict()
+    for row in rows:
+        groups.setdefault(tuple(row[key] for key in PARAMETERS),
+                          []).append(row)
+    summary = []
+    for key, group in groups.iteritems():
+        verified = [row for row in group if row['verified']]
+        times = [row['time'] for row in verified]
+        goodputs = [row['goodput'] for row in verified]
+        item = OrderedDict(zip(PARAMETERS, key))
+        item['trials'] = len(group)
+        item['verified'] = len(verified)
+        item['time_mean'] = mean(times)
+        item['time_stdev'] = stdev(times)
+        item['time_min'] = min(times) if times else None
+        item['time_median'] = median(times)
+        item['time_max'] = max(times) if times else None
+        item['goodput_mean'] = mean(goodputs)
+        item['goodput_stdev'] = stdev(goodputs)
+        item['retransmissions_mean'] = mean(
+            [row['retransmissions'] for row in verified])
+        item['timeouts_mean'] = mean([row['timeouts'] for row in verified])
+        summary.append(item)
+    return summary
+
+
+def mean(values):
+    """Computes the arithmetic mean of the values, None if there are none."""
+    if not values:
+        return None
+    return float(sum(values)) / len(values)
+
+
+def stdev(values):
+    """Computes the sample standard deviation of the values, None if there
+    are fewer than two."""
+    if len(values) < 2:
+        return None
+    average = mean(values)
+    return math.sqrt(sum((value - average) ** 2 for value in values) /
+                     (len(values) - 1))
+
+
+def median(values):
+    """Computes the median of the values, None if there are none."""
+    if not values:
+        return None
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def write_csv(csv_name, fields, rows):
+    """Writes the rows into the CSV file, the missing values left empty.
+
+    Args:
+        csv_name: name of the CSV file
+        fields: names of the columns
+        rows: rows as field -> value
+    """
+    with open(csv_name, 'wb') as csv_file:
+        writer = csv.DictWriter(csv_file, fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(dict((key, '' if value is None else value)
+                                 for key, value in row.iteritems()))
+    print 'Results written to \'{}\''.format(csv_name)
+
+
+def print_summary(summary):
+    """Prints the summary statistics as a table.
+
+    Args:
+        summary: summaries of the combinations
+    """
+    print '{:>7} {:>5} {:>6} {:>8} {:>10} {:>10} {:>10} {:>12}'.format(
+        'N', 'MSS', 'p', 'verified', 'time, s', 'stdev, s', 'median, s',
+        'goodput, B/s')
+    for item in summary:
+        print '{:>7} {:>5} {:>6} {:>8} {:>10} {:>10} {:>10} {:>12}'.format(
+            item['servers'], item['mss'], item['loss'], '{}/{}'.format(
+                item['verified'], item['trials']),
+            format_value(item['time_mean'], '.3f'),
+            format_value(item['time_stdev'], '.3f'),
+            format_value(item['time_median'], '.3f'),
+            format_value(item['goodput_mean'], '.0f'))
+
+
+def format_value(value, spec):
+    """Formats the value, '-' if it is None."""
+    return '-' if value is None else format(value, spec)
+
+
+def plot_summary(summary, image_name):
+    """Plots the mean transfer time and goodput of the combinations with
+    their standard deviations against the first swept parameter, one line
+    for every combination of the other swept parameters.
+
+    Args:
+        summary: summaries of the combinations
+        image_name: name of the PNG file
+    """
+    if pyplot is None:
+        print 'matplotlib is not installed, the summary is not plotted'
+        return
+    swept = [key for key in PARAMETERS
+             if len(set(item[key] for item in summary)) > 1] or ['servers']
+    lines = OrderedDict()
+    for item in summary:
+        if item['verified']:
+            lines.setdefault(', '.join('{} = {}'.format(key, item[key])
+                                       for key in swept[1:]),
+                             []).append(item)
+    figure, axes = pyplot.subplots(1, 2, figsize=(12, 4.5))
+    for label, items in lines.iteritems():
+        items.sort(key=lambda item: item[swept[0]])
+        x = [item[swept[0]] for item in items]
+        for axis, field in zip(axes, ('time', 'goodput')):
+            axis.errorbar(x, [item[field + '_mean'] for item in items],
+                          yerr=[item[field + '_stdev'] or 0
+                                for item in items],
+                          marker='o', capsize=3, label=label or None)
+    labels = {'servers': 'Number of Servers N', 'mss': 'MSS, bytes',
+              'loss': 'Packet loss probability p'}
+    for axis, title in zip(axes, ('Transfer time, s', 'Goodput, bytes/s')):
+        axis.set_xlabel(labels[swept[0]])
+        axis.set_ylabel(title)
+        axis.grid(True)
+        if len(swept) > 1:
+            axis.legend()
+    figure.tight_layout()
+    figure.savefig(image_name)
+    print 'Summary plotted to \'{}\''.format(image_name)
+
+
+def parse_list(value, convert, name):
+    """Parses the comma-separated list of the values of a swept parameter.
+
+    Args:
+        value: comma-separated values provided in the command line
+        convert: function converting a value, int or float
+        name: name of the parameter for the error message
+
+    Returns:
+        List of the values
+
+    Raises:
+        AssertionError: if a value is not valid
+    """
+    try:
+        values = [convert(field) for field in value.split(',')]
+    except ValueError:
+        raise AssertionError('Error: {} provided: \'{}\' are not {} '
+                             'values...\n'.format(name, value,
+                                                  convert.__name__))
+    return values
+
+
+# Actual program starts here
+experiment = 'servers'
+servers_list = None
+mss_list = None
+loss_list = None
+trials = DEFAULT_TRIALS
+file_size = DEFAULT_FILE_SIZE
+file_name = None
+client_options = ''
+server_options = ''
+port = DEFAULT_PORT
+trial_timeout = TRIAL_TIMEOUT
+output = 'benchmark'
+plot = False
+keep = False
+try:
+    # Validation of all options and arguments received from command line
+    opts, args = getopt.getopt(sys.argv[1:], 'x:n:m:p:t:s:f:c:r:P:T:o:gk',
+                               ['experiment=', 'servers=', 'mss=', 'loss=',
+                                'trials=', 'size=', 'file=', 'client=',
+                                'server=', 'port=', 'timeout=', 'output=',
+                                'plot', 'keep'])
+    for opt, value in opts:
+        if opt in ('-x', '--experiment'):
+            assert value in EXPERIMENTS, \
+                'Error: Unknown experiment: \'{}\'...\n'.format(value)
+            experiment = value
+        elif opt in ('-n', '--servers'):
+            servers_list = parse_list(value, int, 'Numbers of Servers')
+            assert all(0 < n < 255 for n in servers_list), \
+                'Error: Numbers of Servers provided: \'{}\' are not in ' \
+                'range of [1, 254]...\n'.format(value)
+        elif opt in ('-m', '--mss'):
+            mss_list = parse_list(value, int, 'MSS values')
+            assert all(8 < mss <= 2048 for mss in mss_list), \
+                'Error: MSS values provided: \'{}\' are not in range of ' \
+                '(8, 2048]...\n'.format(value)
+        elif opt in ('-p', '--loss'):
+            loss_list = parse_list(value, float, 'Loss probabilities')
+            assert all(0 <= p <= 1 for p in loss_list), \
+                'Error: Loss probabilities provided: \'{}\' are not in ' \
+                'range of [0, 1]...\n'.format(value)
+        elif opt in ('-t', '--trials'):
+            assert value.isdigit() and int(value) > 0, \
+                'Error: Number of trials provided: \'{}\' is not positive ' \
+                'Integer...\n'.format(value)
+            trials = int(value)
+        elif opt in ('-s', '--size'):
+            assert value.isdigit(), \
+                'Error: File size provided: \'{}\' is not Integer...\n'.format(
+                    value)
+            file_size = int(value)
+        elif opt in ('-f', '--file'):
+            assert os.path.isfile(value), \
+                'Error: \'{}\' no such file...\n'.format(value)
+            file_name = value
+        elif opt in ('-c', '--client'):
+            client_options = value
+        elif opt in ('-r', '--server'):
+            server_options = value
+        elif opt in ('-P', '--port'):
+            assert value.isdigit() and 1024 < int(value) <= 0xffff, \
+                'Port number must be in rage of (1024, 65535]\n'
+            port = int(value)
+        elif opt in ('-T', '--timeout'):
+            trial_timeout = float(value)
+            assert trial_timeout > 0, \
+                'Error: Trial timeout provided: \'{}\' is not ' \
+                'positive...\n'.format(value)
+        elif opt in ('-o', '--output'):
+            output = value
+        elif opt in ('-g', '--plot'):
+            plot = True
+        elif opt in ('-k', '--keep'):
+            keep = True
+    assert not args, 'Error: Wrong number of arguments...\n'
+    # The lists given override the preset of the experiment
+    preset = EXPERIMENTS[experiment]
+    servers_list = servers_list or preset[0]
+    mss_list = mss_list or preset[1]
+    loss_list = loss_list or preset[2]
+    if not benchmark():
+        sys.exit(1)
+except getopt.GetoptError, e:
+    print 'Error: {}...\n'.format(e), USAGE
+except AssertionError, e:
+    print e, USAGE
+except ValueError, e:
+    print 'Error: {}...\n'.format(e), USAGE
@@ -0,0 +1,168 @@
+"""
+ngtitov_p2mpchecksum.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Internet checksum engine shared by the P2MP-FTP Client (Sender) and the
+P2MP-FTP Server (Receiver).
+
+The checksum is the 16-bit one's complement sum of all 16-bit words with any
+overflow wrapped around, as defined by the UDP checksum. Words are formed from
+the pairs of payload bytes with the first byte as the low-order byte, and the
+odd trailing byte (if any) forms the last word on its own.
+
+Instead of adding the words one at a time, the whole payload is viewed as an
+array of 16-bit words and summed in bulk, and the overflow is wrapped around
+once at the end. Since the end-around carry keeps the sum congruent modulo
+0xffff, the result is bit-identical to the word-by-word sum. NumPy is used
+for the bulk sum when it is installed.
+
+Run the module to compare the word-by-word and bulk sums across the allowed
+MSS range:
+ > python ngtitov_p2mpchecksum.py
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None (NumPy is optional)
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+from array import array
+import sys
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Payload size from which the NumPy sum is faster than the array sum
+NUMPY_MIN_SIZE = 1024
+
+
+def ones_complement_sum(data, initial=0):
+    """Calculates 16-bit one's complement sum of all words of the data.
+
+    Args:
+        data: raw binary data (string or buffer) to be summed
+        initial: sum of the 16-bit words that precede the data, i.e. the
+                 header fields covered by the checksum
+
+    Returns:
+        16-bit one's complement sum of the initial value and all data words
+    """
+    if numpy is not None and len(data) >= NUMPY_MIN_SIZE:
+        total = _sum_words_numpy(data)
+    else:
+        total = _sum_words_array(data)
+    return fold(total + initial)
+
+
+def fold(total):
+    """Wraps around the overflow of the sum until it fits into 16 bits.
+
+    Args:
+        total: sum of any number of 16-bit words
+
+    Returns:
+        16-bit one's complement sum
+    """
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return total
+
+
+def wrap_around(a, b):
+    """Performs wrap around on two 16-bit words if overflow occurs.
+
+    Args:
+        a: first 16-bit word
+        b: second 16-bit word
+
+    Returns:
+        Result of the wrap around, a new 16-bit word
+    """
+    checksum = a + b
+    return (checksum & 0xffff) + (checksum >> 16)
+
+
+def _sum_words_array(data):
+    """Sums all words of the data using the array view of 16-bit words."""
+    length = len(data)
+    words = array('H')
+    words.fromstring(buffer(data, 0, length & ~1))
+    if sys.byteorder == 'big':
+        words.byteswap()
+    total = sum(words)
+    if length & 1:
+        total = total + ord(data[length - 1])
+    return total
+
+
+def _sum_words_numpy(data):
+    """Sums all words of the data using NumPy little-endian word view."""
+    length = len(data)
+    total = int(numpy.frombuffer(data, dtype='<u2', count=length >> 1).sum(
+        dtype=numpy.uint64))
+    if length & 1:
+        total = total + ord(data[length - 1])
+    return total
+
+
+def _sum_words_legacy(data):
+    """Sums all words of the data one word at a time (reference)."""
+    checksum = 0
+    for i in range(0, len(data), 2):
+        try:
+            word = ord(data[i]) + (ord(data[i + 1]) << 8)
+        except IndexError:
+            word = ord(data[i]) + (0 << 8)
+        checksum = wrap_around(checksum, word)
+    return checksum
+
+
+def benchmark():
+    """Compares the word-by-word and bulk sums across the allowed MSS range.
+
+    Verifies that all implementations give bit-identical results and prints
+    the time per payload of each of them.
+    """
+    import os
+    import timeit
+    header_size = 8
+    max_mss = 2048
+    backends = [('legacy', _sum_words_legacy), ('array', _sum_words_array)]
+    if numpy is not None:
+        backends.append(('numpy', _sum_words_numpy))
+    # Verify bit-identical results, including odd sizes and overflows
+    for size in range(0, max_mss - header_size + 1):
+        for payload in (os.urandom(size), '\xff' * size):
+            expected = _sum_words_legacy(payload)
+            for name, function in backends:
+                assert fold(function(payload)) == expected, \
+                    '{} sum differs for payload of {} bytes'.format(name, size)
+    print 'All implementations are bit-identical for payloads of 0..{} ' \
+          'bytes'.format(max_mss - header_size)
+    print '{:>6}'.format('MSS') + ''.join(
+        '{:>14}'.format(name + ' (us)') for name, function in backends) + \
+        '{:>10}'.format('speedup')
+    for mss in (9, 64, 128, 256, 512, 1000, 1024, 1500, 2048):
+        payload = os.urandom(mss - header_size)
+        number = 2000
+        times = []
+        for name, function in backends:
+            seconds = min(timeit.repeat(lambda: fold(function(payload)),
+                                        repeat=3, number=number))
+            times.append(seconds / number * 1e6)
+        print '{:>6}'.format(mss) + ''.join(
+            '{:>14.2f}'.format(t) for t in times) + \
+            '{:>9.1f}x'.format(times[0] / min(times[1:]))
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -34,13 +34,167 @@ all receivers have been received, then the sender re-transmits the segment,
 but only to those receivers from which it has not received an ACK yet. This
 process repeats until all ACKs have been received.
 
+Optionally, the client can run Go-Back-N ARQ instead of Stop-and-Wait: it
+keeps up to N segments in flight, the Servers ACK cumulatively and a single
+retransmission timer per Server runs for the whole window. On timeout every
+segment of the window that is not yet ACKed by the Server is re-transmitted
+to that Server.
+With Selective Repeat ARQ every segment is ACKed individually and has its own
+timer, so only the expired segments are re-transmitted to the Servers that
+have not ACKed them. The Servers must run with the same receive window.
+Each Server has its own window that slides as the Server ACKs its segments,
+so the Servers progress independently. The segments are buffered until all
+Servers ACK them; the size of this buffer limits how far the fastest Server
+can run ahead of the slowest one. By default it equals the window size, and
+all Servers move in lockstep.
+
+In the multicast mode every new segment is sent once to an IP multicast group
+joined by the Servers instead of once to each Server, so the upstream usage
+does not grow with the number of Servers. ACKs and re-transmissions stay
+unicast.
+
+With the NACK feedback the Servers do not ACK every segment. They NACK the
+ranges of the missing segments, which are re-transmitted at once, and report
+their progress with periodic cumulative ACKs that slide their windows. The
+retransmission timers only recover the lost feedback and the lost tail of
+the window, so the feedback traffic grows with the loss rather than with the
+number of segments.
+
+Before the transfer the Client negotiates the protocol version with every
+Server by the HELLO handshake. With the version 2 the Servers ACK with the
+next expected sequence number and the SACK bitmap of the segments received
+after it, so the windowed Client re-transmits exactly the missing segments
+after a single ACK instead of waiting for their timers. A Server that does
+not answer the HELLO is assumed to support the version 1 only.
+
+The HELLO offers a random session ID of the transfer as well. The Server
+running in the daemon mode accepts it, and every data packet sent to that
+Server is preceded by the session ID, so the transfers of several Clients
+share its port. Such a Server gets its data packets by unicast in the
+multicast mode.
+
+In the striped mode the file is split into byte ranges of whole segments,
+which are transferred at the same time by a pool of processes, each to its
+own port of the Servers, so the transfer is not limited to a single core and
+a single flow. The HELLO offers the offset of the range in the file, and the
+Servers receiving the stripes write it from there into the same file.
+
+Resuming the interrupted transfer, the Client asks every Server where to
+resume by the HELLO first. The Servers keeping the partial file answer with
+the end of the part they received in sequence, and the Client sends the file
+from the lowest offset answered, offering it by the HELLO the same way as the
+stripe. In the striped mode every stripe is resumed on its own.
+
+With the compression the Client compresses the file in blocks of whole
+segments, each fitting a single data packet, by the codec negotiated by the
+HELLO, so a compressible file takes fewer packets. The segments that do not
+compress are sent as they are.
+
+The file may be a stream of unknown size instead, i.e. the standard input or
+a pipe. The Client reads it ahead of the segments sent, and marks the segment
+that reaches the end of the stream as the last one once the stream ends.
+
+A directory is sent as the batch of its files in a single session to the
+Servers started in the batch mode. The Client streams the manifest of the
+tree, i.e. the names, modes, modification times and sizes of its files and
+directories, followed by the contents of the files, so the HELLO, the first
+RTT samples and the end of the transfer are paid once for the whole tree.
+
+Updating the older versions of the file the Servers hold, the Client fetches
+the signatures of the blocks of every older version after the HELLO, and
+sends the file as the delta against the blocks all of them hold: such a block
+is sent as the instruction to copy it, and only the rest of the file is sent
+as it is. The delta is sent as a stream the same way as the stream of
+unknown size.
+
+With the forward error correction (FEC) the Client sends R parity packets
+after every block of K segments, and the Servers rebuild a lost segment of
+the block from them instead of waiting for its re-transmission, so a single
+parity packet repairs the different losses of many Servers at once. The
+number of parity packets R may be adapted to the segments still
+re-transmitted. The missing segments the Servers report are re-transmitted
+after twice the smoothed RTT, which leaves time for the parity packets of
+their block.
+
+The retransmission timers of all Servers are kept on a single heap, and only
+the Servers whose windows may have moved are revisited to send new segments,
+so the work per ACK does not grow with the number of Servers. The ACKs queued
+in the socket are read before the expired timers are handled, so a Client
+busy with many Servers does not re-transmit the segments already ACKed.
+
+The retransmission timeout (RTO) is kept separately for each Server. It is
+derived from the smoothed RTT and RTT variation measured from the ACK timing
+(Jacobson/Karels algorithm), ignoring ACKs of re-transmitted segments (Karn's
+algorithm), and is doubled on every timeout (exponential backoff).
+
+The windowed Client may pace its datagrams and keep a congestion window per
+Server, so it does not send faster than the slowest path or a shared
+bottleneck can take. The token bucket caps the rate of everything the Client
+sends, each stripe getting its share of the rate. The congestion window of
+the Server grows with its ACKs and is halved when the Server reports a loss
+by the SACK bitmap, the NACK or the duplicate ACKs, once per window of
+segments in flight, and restarts from a single segment on a timeout (AIMD).
+The Server is then paced at its congestion window per smoothed RTT as well,
+unless it sends the NACK feedback.
+
+The Client counts the segments transmitted and re-transmitted to every
+Server, its timeouts, the bytes it ACKed and the time it waited on the
+slower Servers, and keeps the histogram of its RTT samples. The report of the
+transfer is written as JSON at the end, and the metrics may be exported in
+the Prometheus text format while it runs. The timeouts and the NACKed
+segments are logged by the leveled logger, which is silent by default.
+
 Execute the program run:
- > python ngtitov_p2mpclient.py arg1 arg2 ... arg(i) arg(i+1) arg(i+2) arg(i+3)
+ > python ngtitov_p2mpclient.py [options] arg1 arg2 ... arg(i) arg(i+1)
+   arg(i+2) arg(i+3)
  where at least 4 (four) arguments are required
  - arg1, arg2, ..., arg(i): Host name(s) or IPv4 address(es) of the Server(s)
  - arg(i+1): Port number of the Server(s)
- - arg(i+2): Name of the file to be transmitted
+ - arg(i+2): Name of the file to be transmitted, '-' for the standard input,
+   or the directory sent as a batch
  - arg(i+3): Maximum segment size (MSS)
+ and options are
+ - -a, --arq: ARQ protocol, 'saw' (Stop-and-Wait, default), 'gbn'
+   (Go-Back-N) or 'sr' (Selective Repeat)
+ - -w, --window: window size N of the Go-Back-N and Selective Repeat ARQ
+   (default 16)
+ - -b, --buffer: number of segments buffered until all Servers ACK them
+   (default window size), Stop-and-Wait with the buffer greater than 1 lets
+   the Servers progress independently
+ - -t, --timeout: initial retransmission timeout in seconds (default 1.0)
+ - -m, --multicast: IPv4 multicast group joined by the Servers, every segment
+   is sent to the group once and re-transmitted by unicast
+ - -i, --interface: IPv4 address of the local interface for the multicast
+   group
+ - -n, --nack: NACK feedback of the Servers started with the same option,
+   runs Selective Repeat
+ - -p, --protocol: highest protocol version offered to the Servers, 1 (ACK
+   of a single segment, no HELLO) or 2 (ACK with SACK bitmap, default); the
+   version 1 cannot transfer to the Server running in the daemon mode
+ - -s, --stripes: number of stripes K transferred by K processes to the
+   ports arg(i+1), ..., arg(i+1) + K - 1 of the Servers started with the
+   same option (default 1)
+ - -f, --fec: forward error correction by R parity packets per block of K
+   segments, given as K:R, or K to adapt R to the loss, for the Servers
+   started with the same option; runs Go-Back-N or Selective Repeat with the
+   window of at least K segments
+ - -z, --compress: codec of the payload compression offered to the Servers,
+   'zlib' or 'lz4' (if installed); the file is sent uncompressed unless all
+   Servers agree to the compression, not combined with the FEC
+ - -r, --resume: resume the interrupted transfer to the Servers started with
+   the same option from the lowest offset they received the file up to
+ - -j, --stats: name of the JSON file of the report of the transfer, the
+   number of the stripe is inserted before the extension in the striped mode
+ - -e, --metrics: name of the file of the metrics in the Prometheus text
+   format, rewritten every second during the transfer
+ - -v, --verbose: log the timeouts, and the NACKed segments and the
+   reductions of the congestion windows as well if given twice
+ - -l, --limit: rate limit of the datagrams sent in bytes per second, split
+   evenly among the stripes; runs Go-Back-N or Selective Repeat
+ - -c, --congestion: AIMD congestion window of every Server, which is paced
+   at its window per smoothed RTT; runs Go-Back-N or Selective Repeat
+ - -u, --update: send the file as the delta against the older versions of it
+   held by the Servers started with the same option
 
 
 @version: 1.0
@@ -57,10 +211,33 @@ Execute the program run:
 
 # Import required Python libraries
 from socket import *
+from collections import OrderedDict, deque
+from heapq import heappop, heappush, heapreplace
+from select import select
+import getopt
+import mmap
+import multiprocessing
 import sys
 import os
-import requests
+import struct
 import time
+from ngtitov_p2mpchecksum import ones_complement_sum
+from ngtitov_p2mpcodec import DATA_PACKET, LAST_DATA_PACKET, ACK, NACK, \
+    VERSION_1, VERSION_2, HEADER_SIZE, MAX_MSS, SESSION_ID_SIZE, \
+    STRIPE_HELLO_SIZE, pack_header, pack_session, unpack_ack, unpack_sack, \
+    pack_hello, unpack_hello, unpack_nack, COMPRESSED_PACKET, \
+    LAST_COMPRESSED_PACKET, COMPRESSION_HEADER_SIZE, BLOCK_SIGNATURE, \
+    MAX_SIGNATURES, pack_compression_header, pack_signature_request, \
+    unpack_signatures, seq_add, seq_diff, seq_within, sack_ranges, \
+    acknowledged
+from ngtitov_p2mpfec import MAX_BLOCK_SIZE, ParityEncoder
+from ngtitov_p2mpcompress import NO_COMPRESSION, ZLIB, CODECS, CODEC_NAMES, \
+    MAX_SPAN, supported, BlockCompressor
+from ngtitov_p2mpcongestion import TokenBucket, CongestionWindow
+from ngtitov_p2mpbatch import BatchReader
+from ngtitov_p2mpdelta import DeltaReader, delta_block_size
+from ngtitov_p2mpstats import COUNTER, GAUGE, HISTOGRAM, Histogram, Exporter, \
+    format_metrics, report_values, write_report, stripe_name, create_logger
 
 # P2MP-FTP Stop-and-Wait ARQ protocol for Data Packet is defined:
 """
@@ -87,18 +264,112 @@ import time
 """
 
 # Initialization of constants
-DATA_PACKET = 0b0101010101010101
-LAST_DATA_PACKET = 0b0101010101010111
-ACK = 0b1010101010101010
-HEADER_SIZE = 8
-MAX_MSS = 2048
-ACK_SIZE = 8
-USAGE = 'usage: ngtitov_p2mpclient.py arg1 arg2 ... arg(i) arg(i+1) arg(i+2) ' \
-        'arg(i+3)\n\n        arg1, arg2, ..., arg(i): Host name(s) or IPv4 ' \
-        'Address(es) of the Server(s) (receiver(s)) 1, 2, ..., i\n        ' \
-        'arg(i+1):                Port number of the Server(s)\n        arg(' \
-        'i+2):                Name of the file to be transferred\n        ' \
-        'arg(i+3):                Maximum segment size (MSS)'
+STOP_AND_WAIT = 'saw'
+GO_BACK_N = 'gbn'
+SELECTIVE_REPEAT = 'sr'
+DEFAULT_WINDOW_SIZE = 16
+# Retransmission timeout (RTO) estimation parameters in seconds (RFC 6298)
+INITIAL_RTO = 1.0
+MIN_RTO = 0.01
+MAX_RTO = 60.0
+CLOCK_GRANULARITY = 0.001
+RTT_ALPHA = 0.125
+RTT_BETA = 0.25
+# Idle time in seconds after which the Servers send the NACK feedback, the
+# RTO must not expire before it
+FEEDBACK_INTERVAL = 0.05
+# Multicast datagrams do not leave the local network
+MULTICAST_TTL = 1
+# Receive buffer of the socket in bytes, large enough for the bursts of ACKs
+# from many Servers
+RECEIVE_BUFFER_SIZE = 4 * 1024 * 1024
+# Number of HELLO transmissions before the Server is assumed to support the
+# protocol version 1 only
+HELLO_ATTEMPTS = 3
+# Number of duplicate ACKs of Go-Back-N taken for a loss
+DUPLICATE_ACKS = 3
+# Metrics of the transfer and of every Server as tuples of the key of the
+# value, name, type and help text
+TRANSFER_METRICS = (
+    ('elapsed', 'elapsed_seconds', GAUGE, 'Time since the transfer started'),
+    ('goodput', 'goodput_bytes_per_second', GAUGE,
+     'Payload bytes ACKed by every Server per second'),
+    ('transmissions', 'transmissions_total', COUNTER,
+     'Segments transmitted for the first time to all Servers'),
+    ('retransmissions', 'retransmissions_total', COUNTER,
+     'Segments re-transmitted to all Servers'),
+    ('timeouts', 'timeouts_total', COUNTER,
+     'Retransmission timeouts of all Servers'))
+SERVER_METRICS = (
+    ('transmissions', 'server_transmissions_total', COUNTER,
+     'Segments transmitted for the first time to the Server'),
+    ('retransmissions', 'server_retransmissions_total', COUNTER,
+     'Segments re-transmitted to the Server'),
+    ('timeouts', 'server_timeouts_total', COUNTER,
+     'Retransmission timeouts of the Server'),
+    ('delivered', 'server_delivered_bytes_total', COUNTER,
+     'Payload bytes ACKed by the Server'),
+    ('goodput', 'server_goodput_bytes_per_second', GAUGE,
+     'Payload bytes ACKed by the Server per second until its last ACK'),
+    ('stalled', 'server_stalled_seconds_total', COUNTER,
+     'Time the Server waited on the slower Servers'),
+    ('srtt', 'server_srtt_seconds', GAUGE, 'Smoothed RTT of the Server'),
+    ('rto', 'server_rto_seconds', GAUGE,
+     'Retransmission timeout of the Server'),
+    ('rtt', 'server_rtt_seconds', HISTOGRAM, 'RTT samples of the Server'),
+    ('cwnd', 'server_cwnd_segments', GAUGE,
+     'Congestion window of the Server'),
+    ('reductions', 'server_cwnd_reductions_total', COUNTER,
+     'Reductions of the congestion window of the Server'),
+    ('pacing_rate', 'server_pacing_rate_bytes_per_second', GAUGE,
+     'Pacing rate of the Server'))
+USAGE = 'usage: ngtitov_p2mpclient.py [options] arg1 arg2 ... arg(i) ' \
+        'arg(i+1) arg(i+2) arg(i+3)\n\n        arg1, arg2, ..., arg(i): ' \
+        'Host name(s) or IPv4 Address(es) of the Server(s) (receiver(s)) 1, ' \
+        '2, ..., i\n        arg(i+1):                Port number of the ' \
+        'Server(s)\n        arg(i+2):                Name of the file to be ' \
+        'transferred, \'-\' for the standard input, or the directory ' \
+        'sent as a batch\n        arg(i+3):                Maximum segment ' \
+        'size (MSS)\n\n    options:\n        -a, --arq ARQ:           ARQ ' \
+        'protocol: \'saw\' (Stop-and-Wait, default), \'gbn\' (Go-Back-N) or ' \
+        '\'sr\' (Selective Repeat)\n        -w, --window N:          Window ' \
+        'size of the Go-Back-N and Selective Repeat ARQ (default 16)\n' \
+        '        -b, --buffer N:          Number of segments buffered until ' \
+        'all Servers ACK them, i.e. how far the fastest Server can run ' \
+        'ahead of the slowest one (default window size)\n' \
+        '        -t, --timeout SECONDS:   Initial retransmission timeout ' \
+        '(default 1.0)\n' \
+        '        -m, --multicast GROUP:   Send every segment once to the ' \
+        'IPv4 multicast group the Servers joined, re-transmit by unicast\n' \
+        '        -i, --interface ADDR:    IPv4 address of the local ' \
+        'interface for the multicast group\n' \
+        '        -n, --nack:              NACK feedback: Servers NACK the ' \
+        'missing segments and report progress periodically (Selective ' \
+        'Repeat)\n' \
+        '        -p, --protocol VERSION:  Highest protocol version offered ' \
+        'to the Servers: 1 or 2 (ACK with SACK bitmap, default)\n' \
+        '        -s, --stripes K:         Transfer K stripes of the file in ' \
+        'parallel to the ports arg(i+1), ..., arg(i+1) + K - 1 (default 1)\n' \
+        '        -f, --fec K[:R]:         Send R parity packets per block ' \
+        'of K segments, R is adapted to the loss if omitted\n' \
+        '        -z, --compress CODEC:    Compress the payload by \'zlib\' ' \
+        'or \'lz4\' if the Servers agree\n' \
+        '        -r, --resume:            Resume the interrupted transfer ' \
+        'from the lowest offset the Servers received\n' \
+        '        -j, --stats FILE:        Write the report of the transfer ' \
+        'as JSON\n' \
+        '        -e, --metrics FILE:      Export the metrics in the ' \
+        'Prometheus text format every second\n' \
+        '        -v, --verbose:           Log the timeouts, and the NACKed ' \
+        'segments and congestion window reductions as well if given ' \
+        'twice\n' \
+        '        -l, --limit RATE:        Pace the datagrams sent at the ' \
+        'rate in bytes per second (Go-Back-N or Selective Repeat)\n' \
+        '        -c, --congestion:        AIMD congestion window of every ' \
+        'Server, paced at its window per smoothed RTT (Go-Back-N or ' \
+        'Selective Repeat)\n' \
+        '        -u, --update:            Send the file as the delta ' \
+        'against the older versions the Servers hold'
 
 
 def rdt_send():
@@ -109,141 +380,855 @@ def rdt_send():
     helper functions to calculate checksum (sum of all 16 bit words and take
     complement of it), construct the header and transmit the packet.
     """
-    seq_number = 0
-    bytes_sent = 0
-    file_size = os.stat(file_name).st_size
-    file_in = open(file_name, 'rb')
-    payload = file_in.read(mss - HEADER_SIZE)
+    datagrams = read_datagrams(1)
+    # The same UDP socket is used for the whole transfer
+    client_socket = create_socket()
     try:
-        while payload:
-            if seq_number > 0xffffffff:
-                seq_number = seq_number - 0xffffffff
-            # Get the checksum and header
-            checksum = get_checksum(seq_number, payload)
-            if bytes_sent + len(payload) < file_size:
-                bytes_sent = bytes_sent + len(payload)
-                header = get_header(seq_number, checksum)
-            else:
-                header = get_header(seq_number, checksum,
-                                    indicator=LAST_DATA_PACKET)
+        negotiate(client_socket)
+        for seq_number, datagram, parity in datagrams:
+            segment = Segment(seq_number, datagram, dict_hosts, parity)
             # Continuously re-transmit the same datagram until all P2MP-FTP
             # Servers correctly ACKed it
-            while rdt_send_datagram(header + payload, seq_number):
+            while rdt_send_datagram(client_socket, segment):
                 pass
-            # Get header field for the next packet
-            payload = file_in.read(mss - HEADER_SIZE)
-            seq_number = seq_number + mss
+            # The Servers that ACKed the segment waited on the slowest one
+            now = time.time()
+            for host in dict_hosts.itervalues():
+                host.end_stall(now)
     except KeyboardInterrupt:
         pass
-    file_in.close()
+    datagrams.close()
+    client_socket.close()
+    del client_socket
 
 
-def get_checksum(seq_number, payload):
-    """Calculates checksum of the data that will be send to the P2MP-FTP Servers
+def rdt_send_go_back_n():
+    """Transfers the file to the list of P2MP-FTP Servers using Go-Back-N ARQ.
 
-    Calculation is performed by adding all 16 bit words of sequence number,
-    data packet indicator, and payload performing wrap around if overflow
-    occurs and takes complement of it.
+    Every P2MP-FTP Server has its own window of up to window size segments
+    in flight, which slides as soon as the Server cumulatively ACKs its
+    oldest segment. The segments are kept in the shared buffer until all
+    Servers ACKed them. A single retransmission timer per Server is started
+    for the oldest segment of its window. When it expires, every segment of
+    the window that is not ACKed yet by the Server is re-transmitted to that
+    Server only. These segments replace the segments in flight, so they are
+    not held back by the congestion window, which only keeps the new
+    segments until the window of the Server shrinks below it.
+    """
+    # Outstanding segments in sequence order, shared by all Servers
+    window = []
+    datagrams = read_datagrams(buffer_size + 1)
+    client_socket = create_socket()
+    for name, host in dict_hosts.iteritems():
+        host.acked = 0
+        host.sent = 0
+        host.timer_start = None
+    start_congestion_control()
+    ready.update(dict_hosts)
+    try:
+        # The datagrams are read once the compression is agreed on
+        negotiate(client_socket)
+        next_datagram = next(datagrams, None)
+        while next_datagram or window:
+            # Fill the window of every Server with new segments
+            next_datagram = send_windows(client_socket, window, datagrams,
+                                         next_datagram)
+            # Wait for ACKs until the earliest window timer expires or a
+            # paced Server may send
+            remaining = next_wakeup() - time.time()
+            try:
+                if remaining <= 0 and not ack_queued(client_socket):
+                    raise timeout
+                client_socket.settimeout(max(remaining, CLOCK_GRANULARITY))
+                nbytes, (server_ip, port) = client_socket.recvfrom_into(
+                    ack_buffer)
+                extract_ack(client_socket, window,
+                            buffer(ack_buffer, 0, nbytes), server_ip)
+            except timeout:
+                # Go back N: re-transmit the not ACKed part of the window to
+                # every Server whose timer expired, except for the segments
+                # the Server selectively ACKed
+                now = time.time()
+                for name, _segment in expired_timers(now):
+                    host = dict_hosts[name]
+                    logger.info('Timeout, sequence number = %d',
+                                window[host.acked].seq_number)
+                    host.back_off()
+                    for segment in window[host.acked:host.sent]:
+                        if name in segment.pending:
+                            segment.transmit(client_socket, name)
+                    host.start_timer(now)
+            release_segments(window)
+    except KeyboardInterrupt:
+        pass
+    datagrams.close()
+    client_socket.close()
+    del client_socket
+
+
+def rdt_send_selective_repeat():
+    """Transfers the file to the list of P2MP-FTP Servers using Selective
+    Repeat ARQ.
+
+    Every P2MP-FTP Server has its own window of up to window size segments
+    in flight, which slides as soon as the Server ACKs its oldest segment.
+    Every segment is ACKed individually by each Server and has its own
+    retransmission timer per Server. When the timer of a segment expires,
+    the segment is re-transmitted only to the Server that has not ACKed it
+    yet. The segments are kept in the shared buffer until all Servers ACKed
+    them.
+    """
+    # Outstanding segments in sequence order, shared by all Servers
+    window = []
+    datagrams = read_datagrams(buffer_size + 1)
+    client_socket = create_socket()
+    for name, host in dict_hosts.iteritems():
+        host.acked = 0
+        host.sent = 0
+    start_congestion_control()
+    ready.update(dict_hosts)
+    try:
+        # The datagrams are read once the compression is agreed on
+        negotiate(client_socket)
+        next_datagram = next(datagrams, None)
+        while next_datagram or window:
+            # Fill the window of every Server with new segments
+            next_datagram = send_windows(client_socket, window, datagrams,
+                                         next_datagram)
+            # Wait for ACKs until the earliest segment timer expires or a
+            # paced Server may send
+            remaining = next_wakeup() - time.time()
+            try:
+                if remaining <= 0 and not ack_queued(client_socket):
+                    raise timeout
+                client_socket.settimeout(max(remaining, CLOCK_GRANULARITY))
+                nbytes, (server_ip, port) = client_socket.recvfrom_into(
+                    ack_buffer)
+                extract_ack(client_socket, window,
+                            buffer(ack_buffer, 0, nbytes), server_ip)
+            except timeout:
+                # Re-transmit every expired segment to the Servers that have
+                # not ACKed it yet, backing off their timers once
+                expired = expired_timers(time.time())
+                for name in set(name for name, segment in expired):
+                    dict_hosts[name].back_off()
+                for name, segment in expired:
+                    logger.info('Timeout, sequence number = %d',
+                                segment.seq_number)
+                    segment.transmit(client_socket, name)
+            release_segments(window)
+    except KeyboardInterrupt:
+        pass
+    datagrams.close()
+    client_socket.close()
+    del client_socket
+
+
+def send_windows(client_socket, window, datagrams, next_datagram):
+    """Transmits new segments to every P2MP-FTP Server that has room in its
+    window.
+
+    A Server may send up to window size segments past its oldest not ACKed
+    segment. Only the Servers that are ready, i.e. whose windows may have
+    moved since they were filled, are visited. The segment is taken from the
+    shared buffer if another Server already sent it, otherwise the next
+    datagram is appended to the buffer, unless the buffer is full, i.e. the
+    Server is too far ahead of the slowest Server, which then waits until the
+    buffer is released. In the multicast mode the new segment is sent once to
+    the multicast group for all Servers that have room for it, and only the
+    Servers that lag behind get it by unicast later. The Go-Back-N timer of
+    the Server is started if it is not running. With the congestion control
+    the window of the Server is limited by its congestion window, and the
+    Server held back by the pacer waits until it may send. In the multicast
+    mode all Servers share the smallest congestion window past the oldest
+    segment of the buffer, so the new segments are multicast to all of them.
 
     Args:
-        seq_number: sequence number of the packet that will be transmitted
-        payload: raw binary data of the file content that will be transmitted
+        client_socket: UDP socket of the transfer
+        window: list of outstanding segments shared by all Servers
+        datagrams: generator of the datagrams of the file
+        next_datagram: next datagram to be appended to the buffer, None if
+                       the whole file is read
 
     Returns:
-        Checksum of the packet
+        Next datagram to be appended to the buffer, None if the whole file is
+        read
     """
-    # Split 32-bit sequence number into two 16-bit numbers
-    # Initialize checksum with right-most 16 bits of sequence number
-    checksum = seq_number & 0xffff
-    seq_num_left_bits = seq_number >> 16
-    # Add checksum with left-most 16 bits of sequence number and data packet
-    # indicator
-    checksum = wrap_around(checksum, seq_num_left_bits)
-    checksum = wrap_around(checksum, DATA_PACKET)
-    # Include payload (file content) into checksum
-    for i in range(0, len(payload), 2):
+    # The Servers held back by the pacer try again
+    ready.update(paced)
+    paced.clear()
+    shared = None
+    limit = buffer_size
+    if multicast_group is not None and congestion:
+        shared = min(host.window() for host in dict_hosts.itervalues())
+        limit = min(buffer_size, shared)
+    for name in list(ready):
+        host = dict_hosts[name]
+        ready.discard(name)
+        while host.sent < host.acked + (shared or host.window()):
+            if host.sent == len(window):
+                if not next_datagram:
+                    break
+                if len(window) >= limit:
+                    if name not in waiting:
+                        host.start_stall(time.time())
+                        waiting.add(name)
+                    break
+                if pacing_time(host, time.time()) > time.time():
+                    paced.add(name)
+                    break
+                segment = Segment(next_datagram[0], next_datagram[1],
+                                  dict_hosts, next_datagram[2])
+                window.append(segment)
+                next_datagram = next(datagrams, None)
+                if multicast_group is not None:
+                    # Multicast the new segment once to all Servers that
+                    # have room for it in their windows and got all the
+                    # segments before it
+                    index = len(window) - 1
+                    segment.multicast(client_socket, [
+                        _name for _name, _host in dict_hosts.iteritems()
+                        if index < _host.acked + (shared or
+                                                  _host.window()) and
+                        all(_name in window[i].timer_start
+                            for i in range(_host.sent, index))])
+            segment = window[host.sent]
+            if name not in segment.timer_start:
+                if pacing_time(host, time.time()) > time.time():
+                    paced.add(name)
+                    break
+                segment.transmit(client_socket, name)
+            if arq == GO_BACK_N and host.timer_start is None:
+                host.start_timer(segment.timer_start[name])
+            host.sent = host.sent + 1
+    return next_datagram
+
+
+def release_segments(window):
+    """Releases the oldest segments of the buffer ACKed by all P2MP-FTP
+    Servers.
+
+    Args:
+        window: list of outstanding segments shared by all Servers
+    """
+    acked = 0
+    while acked < len(window) and not window[acked].pending:
+        acked = acked + 1
+    if acked:
+        del window[:acked]
+        for host in dict_hosts.itervalues():
+            host.acked = host.acked - acked
+            host.sent = host.sent - acked
+        now = time.time()
+        for name in waiting:
+            dict_hosts[name].end_stall(now)
+        ready.update(waiting)
+        waiting.clear()
+
+
+def rdt_send_file():
+    """Transfers the file, or the stripe of it, by the ARQ protocol and
+    reports the transfer time and the number of segment transmissions.
+
+    The metrics are exported while the transfer runs and the report is
+    written once it ends, if their files are given.
+    """
+    global transfer_start, transfer_end
+    transfer_start = time.time()
+    exporter = None
+    if metrics_name is not None:
+        exporter = Exporter(metrics_name, collect_metrics)
+    try:
+        if arq == GO_BACK_N:
+            rdt_send_go_back_n()
+        elif arq == SELECTIVE_REPEAT:
+            rdt_send_selective_repeat()
+        else:
+            rdt_send()
+    finally:
+        transfer_end = time.time()
+        if exporter is not None:
+            exporter.close()
+        if stats_name is not None:
+            write_report(stats_name, transfer_report())
+    print 'Transfer time = {:.6f} s, transmissions = {}, ' \
+          're-transmissions = {}, timeouts = {}'.format(
+              transfer_end - transfer_start, transmissions, retransmissions,
+              sum(host.timeouts for host in dict_hosts.itervalues()))
+    if delta is not None:
+        print 'Delta = {} bytes, literal = {} bytes, copied = {} ' \
+              'bytes'.format(stream_end, delta.literal, delta.copied)
+
+
+def transfer_values():
+    """Collects the values of the metrics of the transfer.
+
+    The goodput of the transfer counts the payload bytes ACKed by every
+    Server, i.e. by the slowest one.
+
+    Returns:
+        Dictionary of the values as key -> number or None
+    """
+    now = transfer_end or time.time()
+    elapsed = now - transfer_start
+    delivered = min(host.delivered for host in dict_hosts.itervalues())
+    return OrderedDict([
+        ('elapsed', elapsed),
+        ('goodput', delivered / elapsed if elapsed > 0 else None),
+        ('transmissions', transmissions),
+        ('retransmissions', retransmissions),
+        ('timeouts', sum(host.timeouts for host in dict_hosts.itervalues()))])
+
+
+def collect_metrics():
+    """Collects the metrics of the transfer and of every P2MP-FTP Server in
+    the Prometheus text format.
+
+    Returns:
+        Metrics as text
+    """
+    now = transfer_end or time.time()
+    labels = [('port', server_port)]
+    return format_metrics('p2mp_client_', TRANSFER_METRICS,
+                          [(labels, transfer_values())]) + \
+        format_metrics('p2mp_client_', SERVER_METRICS,
+                       [(labels + [('server', name)], host.values(now))
+                        for name, host in sorted(dict_hosts.iteritems())])
+
+
+def transfer_report():
+    """Builds the report of the transfer and of every P2MP-FTP Server.
+
+    Returns:
+        Dictionary of the report
+    """
+    now = transfer_end or time.time()
+    if streaming:
+        first, end = 0, stream_end
+    else:
+        first, end = file_range or (0, os.stat(file_name).st_size)
+    report = OrderedDict([
+        ('file', file_name), ('first', first), ('end', end),
+        ('port', server_port), ('arq', arq), ('mss', mss),
+        ('window', window_size), ('multicast', multicast_group),
+        ('nack', nack), ('fec', fec_block_size),
+        ('compression', CODEC_NAMES[compression]),
+        ('rate_limit', rate_limit), ('congestion', congestion),
+        ('update', update)])
+    if delta is not None:
+        report['literal'] = delta.literal
+        report['copied'] = delta.copied
+    report.update(transfer_values())
+    report['servers'] = OrderedDict(
+        (name, report_values(host.values(now)))
+        for name, host in sorted(dict_hosts.iteritems()))
+    return report
+
+
+def rdt_send_striped():
+    """Transfers the stripes of the file by a pool of worker processes.
+
+    The file is split into the stripes of the same number of whole segments
+    but the last one. The stripe k is transferred by its own process to the
+    port of the P2MP-FTP Servers following the well-known one by k, using
+    the ARQ protocol of the Client. Waits until all processes are done.
+    """
+    payload_size = mss - HEADER_SIZE
+    file_size = os.stat(file_name).st_size
+    segments = (file_size + payload_size - 1) // payload_size
+    stripe_size = (segments + stripes - 1) // stripes * payload_size
+    workers = [multiprocessing.Process(
+        target=send_stripe,
+        args=(stripe, min(stripe * stripe_size, file_size),
+              min((stripe + 1) * stripe_size, file_size)))
+        for stripe in range(stripes)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        # Every worker gets the <Ctrl c> as well
+        for worker in workers:
+            worker.join()
+    print 'Stripes transferred = {} of {}'.format(
+        sum(1 for worker in workers if worker.exitcode == 0), stripes)
+
+
+def send_stripe(stripe, first, end):
+    """Transfers a stripe of the file (worker process).
+
+    The process exits with 0 if the stripe is transferred, with 1 if a
+    Server does not receive the stripes.
+
+    Args:
+        stripe: number of the stripe
+        first: offset in the file of the first byte of the stripe
+        end: offset in the file following the stripe
+    """
+    global server_port, file_range, stripe_offset, stats_name, metrics_name
+    server_port = server_port + stripe
+    file_range = (first, end)
+    stripe_offset = first
+    if stats_name is not None:
+        stats_name = stripe_name(stats_name, stripe)
+    if metrics_name is not None:
+        metrics_name = stripe_name(metrics_name, stripe)
+    try:
+        rdt_send_file()
+    except AssertionError, e:
+        print e
+        sys.exit(1)
+
+
+def negotiate(client_socket):
+    """Negotiates the protocol version with every P2MP-FTP Server.
+
+    Sends the HELLO with the highest protocol version of the Client and the
+    session ID of the transfer to every Server and waits for the HELLO with
+    the agreed version back. The Server that echoes the session ID runs the
+    sessions of the daemon mode. The HELLO is re-transmitted on the timeout
+    of the Server, and the Server that does not answer after HELLO_ATTEMPTS
+    transmissions is assumed to support the version 1 only. The answer gives
+    the first RTT sample of the Server. The HELLO of the stripe offers the
+    offset of the stripe in the file as well, and every Server must echo it.
+    The HELLO offers the codec of the compression too, and the file is
+    compressed by the codec every Server agrees on, zlib if some Server
+    answers with zlib, or not at all if some Server does not compress.
+
+    Resuming the transfer, the HELLO with the resume flag asks every Server
+    first where to resume the file, or the stripe, from. The transfer is
+    resumed from the lowest offset answered, which the HELLO offers then the
+    same way as the offset of the stripe. The Server that does not answer
+    with the resume flag, or with an offset out of the range, has nothing to
+    resume from.
+
+    Updating the older versions of the file, the HELLO offers the delta with
+    the block size of the file, and every Server must answer with the size of
+    its older version. The delta is then read against the blocks every
+    Server holds.
+
+    Args:
+        client_socket: UDP socket of the transfer
+    """
+    global compression, file_range, stripe_offset, delta
+    if protocol_version == VERSION_1:
+        return
+    if resume:
+        first, end = file_range or (0, os.stat(file_name).st_size)
+        offsets = exchange_hello(client_socket, query=True)
+        offset = min(offsets.get(name, first) for name in dict_hosts)
+        if not first <= offset <= end:
+            offset = first
+        if offset > first:
+            file_range = (offset, end)
+            stripe_offset = offset
+        print 'Resume from offset = {}'.format(offset)
+    exchange_hello(client_socket)
+    if compression != NO_COMPRESSION:
+        # The codec numbers grow from no compression to zlib to the others
+        compression = min(host.codec for host in dict_hosts.itervalues())
+        print 'Compression = {}'.format(CODEC_NAMES[compression])
+    if update:
+        delta = DeltaReader(file_name, fetch_signatures(client_socket),
+                            delta_block)
+
+
+def exchange_hello(client_socket, query=False):
+    """Sends the HELLO to every P2MP-FTP Server and handles the answers,
+    re-transmitting the HELLO on the timeout of the Server.
+
+    Args:
+        client_socket: UDP socket of the transfer
+        query: True if the HELLO asks where to resume the transfer from
+
+    Returns:
+        Offsets the Servers answered with the resume flag as name of the
+        Server -> offset in the file
+    """
+    size = pack_hello(hello_packet, protocol_version, session_id,
+                      delta_block if update else stripe_offset, compression,
+                      query, update)
+    offsets = {}
+    pending = set(dict_hosts)
+    attempts = dict.fromkeys(dict_hosts, 0)
+    timer_start = {}
+    while pending:
+        now = time.time()
+        for name in list(pending):
+            host = dict_hosts[name]
+            if name in timer_start and timer_start[name] + host.rto > now:
+                continue
+            if attempts[name] == HELLO_ATTEMPTS:
+                assert stripe_offset is None, \
+                    'Error: Server {} does not receive the stripes on port ' \
+                    '{}...'.format(name, server_port)
+                print 'No HELLO from {}, protocol version = {}'.format(
+                    name, host.version)
+                pending.discard(name)
+                continue
+            if attempts[name]:
+                host.back_off()
+            client_socket.sendto(buffer(hello_packet, 0, size),
+                                 (name, server_port))
+            attempts[name] = attempts[name] + 1
+            timer_start[name] = now
+        if not pending:
+            break
         try:
-            word = ord(payload[i]) + (ord(payload[i+1]) << 8)
-        except IndexError:
-            word = ord(payload[i]) + (0 << 8)
-        checksum = wrap_around(checksum, word)
-    return ~checksum & 0xffff
+            remaining = min(timer_start[name] + dict_hosts[name].rto
+                            for name in pending) - time.time()
+            if remaining <= 0:
+                raise timeout
+            client_socket.settimeout(remaining)
+            nbytes, (server_ip, port) = client_socket.recvfrom_into(
+                ack_buffer)
+            version, session, offset, codec, resumed, delta_agreed = \
+                unpack_hello(buffer(ack_buffer, 0, nbytes))
+            assert server_ip in pending
+            assert VERSION_1 <= version <= protocol_version
+            assert session in (0, session_id)
+            assert offset == stripe_offset or query and resumed or \
+                update and delta_agreed
+            assert codec in (NO_COMPRESSION, ZLIB, compression)
+            host = dict_hosts[server_ip]
+            host.version = version
+            host.session = session == session_id
+            host.codec = codec
+            host.basis_size = offset if delta_agreed else None
+            # The answer to the re-transmitted HELLO is ambiguous
+            if attempts[server_ip] == 1:
+                host.update_rtt(time.time() - timer_start[server_ip])
+            else:
+                host.update_rtt(None)
+            pending.discard(server_ip)
+            if query and resumed:
+                offsets[server_ip] = offset
+                print 'HELLO from {}, resume offset = {}'.format(server_ip,
+                                                                 offset)
+            elif host.session:
+                print 'HELLO from {}, protocol version = {}, session = ' \
+                      '{:08x}'.format(server_ip, version, session_id)
+            else:
+                print 'HELLO from {}, protocol version = {}'.format(
+                    server_ip, version)
+        except timeout:
+            pass
+        except (AssertionError, ValueError, struct.error):
+            pass
+    return offsets
+
 
+def fetch_signatures(client_socket):
+    """Fetches the signatures of the blocks of the older version of the file
+    from every P2MP-FTP Server.
 
-def wrap_around(a, b):
-    """Performs wrap around on two 16-bit words if overflow occurs.
+    Every Server is asked for the signatures of as many blocks as fit the
+    MSS at a time, with up to the window size of requests outstanding. The
+    request is re-transmitted on the timeout of the Server, and the Server
+    that does not answer after HELLO_ATTEMPTS transmissions of the same
+    request fails the transfer.
 
     Args:
-        a: first 16-bit word
-        b: second 16-bit word
+        client_socket: UDP socket of the transfer
+
+    Returns:
+        Signatures of the blocks every Server holds as a set of tuples of the
+        weak rolling checksum and the strong hash
+
+    Raises:
+        AssertionError: if a Server does not hold the older version or does
+                        not answer
+    """
+    count = max(1, min((mss - HEADER_SIZE) // BLOCK_SIGNATURE.size,
+                       MAX_SIGNATURES))
+    # Requests not sent yet as tuples of the first block index and number
+    # of blocks, and outstanding ones as first block index -> [number of
+    # blocks, time sent, transmissions], of every Server
+    waiting = {}
+    outstanding = {}
+    for name, host in dict_hosts.iteritems():
+        assert host.basis_size is not None, \
+            'Error: Server {} does not hold the older version of the ' \
+            'file...\n'.format(name)
+        host.signatures = set()
+        blocks = host.basis_size // delta_block
+        waiting[name] = deque((index, min(count, blocks - index))
+                              for index in xrange(0, blocks, count))
+        outstanding[name] = {}
+    while True:
+        now = time.time()
+        deadline = None
+        for name, host in dict_hosts.iteritems():
+            for index, request in outstanding[name].iteritems():
+                if request[1] + host.rto > now:
+                    continue
+                assert request[2] < HELLO_ATTEMPTS, \
+                    'Error: Server {} does not answer the requests of the ' \
+                    'signatures...\n'.format(name)
+                host.back_off()
+                size = pack_signature_request(hello_packet, index,
+                                              request[0])
+                client_socket.sendto(buffer(hello_packet, 0, size),
+                                     (name, server_port))
+                request[1] = now
+                request[2] = request[2] + 1
+            while waiting[name] and len(outstanding[name]) < window_size:
+                index, blocks = waiting[name].popleft()
+                size = pack_signature_request(hello_packet, index, blocks)
+                client_socket.sendto(buffer(hello_packet, 0, size),
+                                     (name, server_port))
+                outstanding[name][index] = [blocks, now, 1]
+            for request in outstanding[name].itervalues():
+                if deadline is None or request[1] + host.rto < deadline:
+                    deadline = request[1] + host.rto
+        if deadline is None:
+            break
+        try:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise timeout
+            client_socket.settimeout(remaining)
+            nbytes, (server_ip, port) = client_socket.recvfrom_into(
+                ack_buffer)
+            index, blocks, signatures = unpack_signatures(
+                buffer(ack_buffer, 0, nbytes))
+            request = outstanding[server_ip][index]
+            assert len(signatures) == blocks == request[0]
+            dict_hosts[server_ip].signatures.update(signatures)
+            del outstanding[server_ip][index]
+        except timeout:
+            pass
+        except (AssertionError, KeyError, ValueError, struct.error):
+            pass
+    for name, host in sorted(dict_hosts.iteritems()):
+        print 'Signatures from {}: older version = {} bytes, {} blocks ' \
+              'of {}'.format(name, host.basis_size, len(host.signatures),
+                             delta_block)
+    blocks = set.intersection(*[host.signatures
+                                for host in dict_hosts.itervalues()])
+    for host in dict_hosts.itervalues():
+        host.signatures = None
+    return blocks
+
+
+def create_socket():
+    """Creates the UDP socket of the transfer.
+
+    The receive buffer is enlarged to hold the ACKs all Servers send at
+    about the same time. In the multicast mode the datagrams sent to the
+    multicast group leave through the given local interface, and are looped
+    back to the P2MP-FTP Servers running on this host.
 
     Returns:
-        Result of the wrap around, a new 16-bit word
+        UDP socket of the transfer
     """
-    checksum = a + b
-    return (checksum & 0xffff) + (checksum >> 16)
+    client_socket = socket(AF_INET, SOCK_DGRAM)
+    client_socket.setsockopt(SOL_SOCKET, SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+    if multicast_group is not None:
+        client_socket.setsockopt(IPPROTO_IP, IP_MULTICAST_TTL,
+                                 MULTICAST_TTL)
+        client_socket.setsockopt(IPPROTO_IP, IP_MULTICAST_LOOP, 1)
+        if multicast_interface is not None:
+            client_socket.setsockopt(IPPROTO_IP, IP_MULTICAST_IF,
+                                     inet_aton(multicast_interface))
+    return client_socket
+
+
+def read_datagrams(count):
+    """Reads the file and builds the datagrams of 1 MSS each.
 
+    Takes 1 MSS packet worth of data from the file and calls helper
+    functions to calculate checksum and pack the header. The very last
+    segment of the file is marked with the last data packet indicator. The
+    file is memory-mapped, so the payload is checksummed in place and copied
+    once from the page cache straight into one of the preallocated datagram
+    buffers, which are reused in turn, behind the header packed into it.
+    Every buffer starts with the session ID of the transfer, followed by the
+    datagram. Only the range of the stripe is read in the striped mode. An
+    empty file or range is sent as a single empty last data packet. With the
+    FEC the payload is added to the parity packets of its block as well,
+    which come with the last segment of the block. With the compression the
+    data packet carries the compressed block of as many segments as fit,
+    and its sequence number is followed by the sequence numbers of all of
+    them.
 
-def get_header(seq_number, checksum, indicator=DATA_PACKET):
-    """Converts sequence number, checksum, and data packet indicator integer
-    numbers into hexadecimal byte representation to fit all header data into
-    8 bytes as defined by P2MP-FTP protocol
+    The stream, i.e. the standard input or a pipe, is read ahead of the
+    segment sent by as much as the largest compressed block takes and one
+    byte more, so the segment is known to be the last one once the stream
+    ends within that look-ahead, without knowing the size of the stream.
+
+    Args:
+        count: number of datagram buffers, i.e. the maximum number of
+               datagrams the caller holds at the same time
+
+    Yields:
+        Tuple of sequence number, datagram preceded by the session ID as a
+        memoryview of the buffer and list of the parity packets of the block
+        the datagram completes, None if it does not complete one
+    """
+    global stream_end
+    seq_number = 0
+    if streaming:
+        first, end = 0, 0
+        if delta is not None:
+            file_in = delta
+        elif batch is not None:
+            file_in = batch
+        else:
+            file_in = sys.stdin if file_name == '-' else open(file_name, 'rb')
+        # Data read from the stream from its offset base on
+        file_map = bytearray()
+        base = 0
+        eof = False
+        lookahead = (MAX_SPAN if compression != NO_COMPRESSION else 1) * \
+            (mss - HEADER_SIZE) + 1
+    else:
+        first, end = file_range or (0, os.stat(file_name).st_size)
+        file_in = open(file_name, 'rb')
+        # The empty file cannot be memory-mapped
+        file_map = mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ) \
+            if end else ''
+        base = 0
+    buffers = [bytearray(SESSION_ID_SIZE + mss) for _ in range(count)]
+    for buf in buffers:
+        pack_session(buf, session_id)
+    encoder = None
+    if fec_block_size:
+        encoder = ParityEncoder(fec_block_size, fec_count, session_id, mss)
+    compressor = None
+    if compression != NO_COMPRESSION:
+        compressor = BlockCompressor(compression, mss - HEADER_SIZE,
+                                     mss - HEADER_SIZE -
+                                     COMPRESSION_HEADER_SIZE)
+    start = SESSION_ID_SIZE + HEADER_SIZE
+    offset = first
+    i = 0
+    try:
+        while not i or offset < end:
+            if streaming:
+                if offset - base >= lookahead:
+                    # Drop the data already sent
+                    del file_map[:offset - base]
+                    base = offset
+                if not eof and base + len(file_map) - offset < lookahead:
+                    data = file_in.read(lookahead)
+                    eof = len(data) < lookahead
+                    file_map.extend(data)
+                    end = base + len(file_map)
+                    stream_end = end
+            buf = buffers[i % count]
+            block = None
+            if compressor is not None and offset < end:
+                block = compressor.compress_block(file_map, offset - base,
+                                                  end - base)
+            if block is None:
+                # The segment is sent uncompressed
+                span = 1
+                size = min(mss - HEADER_SIZE, end - offset)
+                payload = buffer(file_map, offset - base, size)
+                memoryview(buf)[start:start + size] = payload
+                payload_size = size
+                indicator = DATA_PACKET
+            else:
+                span, size, compressed = block
+                pack_compression_header(buf, span, size, offset=start)
+                payload_size = COMPRESSION_HEADER_SIZE + len(compressed)
+                buf[start + COMPRESSION_HEADER_SIZE:start + payload_size] = \
+                    compressed
+                payload = buffer(buf, start, payload_size)
+                indicator = COMPRESSED_PACKET
+            last = offset + size >= end
+            if last:
+                indicator = LAST_DATA_PACKET if block is None else \
+                    LAST_COMPRESSED_PACKET
+            checksum = get_checksum(seq_number, payload)
+            pack_header(buf, seq_number, checksum, indicator=indicator,
+                        offset=SESSION_ID_SIZE)
+            parity = None
+            if encoder is not None:
+                encoder.adapt(transmissions, retransmissions)
+                parity = encoder.add(seq_number, payload, last)
+            yield seq_number, memoryview(buf)[:start + payload_size], parity
+            seq_number = seq_add(seq_number, span * mss)
+            offset = offset + size
+            i = i + 1
+    finally:
+        if not streaming and end:
+            file_map.close()
+        if file_in is not sys.stdin:
+            file_in.close()
+
+
+def get_checksum(seq_number, payload):
+    """Calculates checksum of the data that will be send to the P2MP-FTP Servers
+
+    Calculation is performed by adding all 16 bit words of sequence number,
+    data packet indicator, and payload performing wrap around if overflow
+    occurs and takes complement of it.
 
     Args:
-        seq_number: sequence number integer
-        checksum: checksum integer
-        indicator: by default data packet indicator
+        seq_number: sequence number of the packet that will be transmitted
+        payload: raw binary data of the file content that will be transmitted
 
     Returns:
-        8-byte header field in the hexadecimal byte representation
+        Checksum of the packet
     """
-    seq_number_hex = hex(seq_number).lstrip('-0x').zfill(8).decode('hex')
-    checksum_hex = hex(checksum).lstrip('-0x').zfill(4).decode('hex')
-    indicator_hex = hex(indicator).lstrip('-0x').zfill(4).decode('hex')
-    return seq_number_hex + checksum_hex + indicator_hex
+    # Split 32-bit sequence number into two 16-bit numbers and add them with
+    # data packet indicator and payload (file content) words
+    checksum = ones_complement_sum(
+        payload, (seq_number & 0xffff) + (seq_number >> 16) + DATA_PACKET)
+    return ~checksum & 0xffff
 
 
-def rdt_send_datagram(datagram, seq_number):
+def rdt_send_datagram(client_socket, segment):
     """Sends datagram to all the P2MP-FTP Servers via multi-cast.
 
-    Create new UDP socket with timeout interval to transfer datagram to
-    P2MP-FTP Servers. The multi-cast technique is used to send the same (one)
-    datagram to all P2MP-FTP Servers. After datagram is sent to all P2MP-FTP
-    Servers, it waits for ACK responses from P2MP-FTP Servers. Calls helper
-    function to determine what P2MP-FTP Servers received data packets correctly.
+    Uses the UDP socket of the transfer to transfer datagram to P2MP-FTP
+    Servers. The multi-cast technique is used to send the same (one) datagram
+    to all P2MP-FTP Servers, either as a separate unicast to each Server or,
+    in the multicast mode, once to the multicast group. After datagram is
+    sent to all P2MP-FTP Servers, it waits for ACK responses from P2MP-FTP
+    Servers until the retransmission timer of one of them expires. Calls
+    helper function to determine what P2MP-FTP Servers received data packets
+    correctly. On timeout, the datagram is re-transmitted to every Server
+    whose timer expired.
 
     Args:
-        datagram: datagram in a byte representation
-        seq_number: expected sequence number ACKed by the P2MP-FTP Servers
+        client_socket: UDP socket of the transfer
+        segment: segment to be ACKed by all P2MP-FTP Servers
 
     Returns:
         Boolean retransmit indicating whether retransmit is required or not
     """
-    retransmit = False
-    client_socket = socket(AF_INET, SOCK_DGRAM)
-    client_socket.settimeout(timeout_interval)
+    # Send datagram to P2MP-FTP Servers yet did not receive this datagram
+    if multicast_group is not None and not segment.timer_start:
+        segment.multicast(client_socket, segment.pending)
+    for name in segment.pending:
+        if name not in segment.timer_start:
+            segment.transmit(client_socket, name)
     try:
-        # Send datagram to P2MP-FTP Servers yet did not receive this datagram
-        # using new UDP socket
-        for name, host in dict_hosts.iteritems():
-            # No need to retransmit datagram if server has already received it
-            if host.ack != seq_number:
-                host.ack_response = False
-                retransmit = True
-                client_socket.sendto(datagram, (name, server_port))
         # Read ACKs until whether all P2MP-FTP Servers ACKed this datagram or
         # timeout is triggered
-        while not all_responses_received():
-            ack_packet, (server_ip, port) = client_socket.recvfrom(ACK_SIZE)
-            extract_server_ack(seq_number, ack_packet, server_ip)
+        while segment.pending:
+            remaining = next_timeout() - time.time()
+            if remaining <= 0 and not ack_queued(client_socket):
+                raise timeout
+            client_socket.settimeout(max(remaining, CLOCK_GRANULARITY))
+            nbytes, (server_ip, port) = client_socket.recvfrom_into(
+                ack_buffer)
+            extract_server_ack(segment, buffer(ack_buffer, 0, nbytes),
+                               server_ip)
     except timeout:
-        print 'Timeout, sequence number = {}'.format(seq_number)
-    client_socket.close()
-    del client_socket
-    return retransmit
+        logger.info('Timeout, sequence number = %d', segment.seq_number)
+        for name, _segment in expired_timers(time.time()):
+            dict_hosts[name].back_off()
+            segment.transmit(client_socket, name)
+        return True
+    return False
 
 
-def extract_server_ack(seq_number, ack_packet, server_ip):
+def extract_server_ack(segment, ack_packet, server_ip):
     """Extracts the ACK received from P2MP-FTP Server as response.
 
     It extracts the packet received from the socket and verifies whether this
@@ -251,43 +1236,221 @@ def extract_server_ack(seq_number, ack_packet, server_ip):
     sending a data packet. This packet can be corrupted, or not P2MP-FTP
     protocol packet or not even from P2MP-FTP Server. Each case is handled
     gracefully with an exception. If this is expected ACK, it updates the host
-    object accordingly.
+    object accordingly. Since the socket lives for the whole transfer, a late
+    ACK of an earlier segment is ignored rather than counted as a response.
+    The ACK of version 2 acknowledges the segment if its next expected
+    sequence number is past the segment.
 
     Args:
-        seq_number: expected sequence number ACKed by a P2MP-FTP Server
-        ack_packet: hexadecimal encoded ACK packet that is received from a
-                    P2MP-FTP Server as response and retrieved from the socket
+        segment: segment expected to be ACKed by a P2MP-FTP Server
+        ack_packet: binary ACK packet that is received from a P2MP-FTP
+                    Server as response and retrieved from the socket
         server_ip: IPv4 address of a P2MP-FTP Server
     """
     try:
-        dict_hosts[server_ip].ack_response = True
+        host = dict_hosts[server_ip]
         # Extract received ACKed sequence number, zero field and ACK indicator
-        rcv_ack = int(ack_packet[:4].encode('hex'), 16)
-        rcv_zero_field = int(ack_packet[4:6].encode('hex'), 16)
-        rcv_ack_indicator = int(ack_packet[6:8].encode('hex'), 16)
+        rcv_ack, rcv_zero_field, rcv_ack_indicator = unpack_ack(ack_packet)
         # Verify whether this server responded with an ACK and in-sequence ACK
         assert rcv_ack_indicator == ACK
+        if rcv_zero_field == VERSION_2:
+            assert seq_diff(rcv_ack, segment.seq_number) > 0
+        else:
+            assert rcv_zero_field == 0
+            assert rcv_ack == segment.seq_number
+        assert server_ip in segment.pending
+        segment.acknowledge(server_ip)
+        host.ack = segment.seq_number
+        host.update_rtt(segment.rtt_sample(server_ip))
+        host.start_stall(host.last_ack)
+    except (AssertionError, KeyError, struct.error):
+        return
+
+
+def extract_ack(client_socket, window, ack_packet, server_ip):
+    """Extracts the ACK received from P2MP-FTP Server by its format.
+
+    The ACK of version 2 and the NACK report every segment the P2MP-FTP
+    Server received. The ACK of version 1 is cumulative in Go-Back-N and
+    with the NACK feedback, and selective in Selective Repeat.
+
+    Args:
+        client_socket: UDP socket of the transfer
+        window: list of outstanding segments
+        ack_packet: binary ACK or NACK packet that is received from a
+                    P2MP-FTP Server and retrieved from the socket
+        server_ip: IPv4 address of a P2MP-FTP Server
+    """
+    try:
+        rcv_ack, rcv_field, rcv_indicator = unpack_ack(ack_packet)
+    except struct.error:
+        return
+    if server_ip in dict_hosts:
+        # The window of the Server may move
+        ready.add(server_ip)
+    if nack or rcv_indicator == NACK or \
+            rcv_indicator == ACK and rcv_field == VERSION_2:
+        extract_sack(client_socket, window, ack_packet, server_ip)
+    elif arq == GO_BACK_N:
+        extract_cumulative_ack(window, ack_packet, server_ip)
+    else:
+        extract_selective_ack(window, ack_packet, server_ip)
+
+
+def extract_cumulative_ack(window, ack_packet, server_ip):
+    """Extracts the cumulative ACK received from P2MP-FTP Server in Go-Back-N.
+
+    The ACKed sequence number acknowledges the segment with this sequence
+    number and all segments before it. The ACK is matched against the
+    segments sent to this P2MP-FTP Server that it has not ACKed yet; stale,
+    duplicate, corrupted or unknown packets are ignored. The timer of the
+    Server is restarted if it still has segments to ACK. The duplicate ACKs
+    of the last ACKed segment are counted, and so many of them in a row are
+    taken for the loss of the next one by the congestion control.
+
+    Args:
+        window: list of outstanding segments
+        ack_packet: binary ACK packet that is received from a P2MP-FTP
+                    Server as response and retrieved from the socket
+        server_ip: IPv4 address of a P2MP-FTP Server
+    """
+    try:
+        host = dict_hosts[server_ip]
+        rcv_ack, rcv_zero_field, rcv_ack_indicator = unpack_ack(ack_packet)
+        assert rcv_ack_indicator == ACK
         assert rcv_zero_field == 0
-        assert rcv_ack == seq_number
-        dict_hosts[server_ip].ack = seq_number
-    except (AssertionError, KeyError, TypeError):
+        for i in range(host.acked, host.sent):
+            if window[i].seq_number == rcv_ack:
+                for segment in window[host.acked:i + 1]:
+                    segment.acknowledge(server_ip)
+                host.ack = rcv_ack
+                host.acked = i + 1
+                host.duplicate_acks = 0
+                host.update_rtt(window[i].rtt_sample(server_ip))
+                if host.acked < host.sent:
+                    host.start_timer(time.time())
+                else:
+                    host.timer_start = None
+                return
+        if rcv_ack == host.ack and host.acked < host.sent:
+            host.duplicate_acks = host.duplicate_acks + 1
+            if host.duplicate_acks == DUPLICATE_ACKS:
+                host.lose(window[host.acked], time.time())
+    except (AssertionError, KeyError, struct.error):
         return
 
 
-def all_responses_received():
-    """Verifies whether ACK is received from all P2MP-FTP Servers.
+def extract_selective_ack(window, ack_packet, server_ip):
+    """Extracts the selective ACK received from P2MP-FTP Server in Selective
+    Repeat.
 
-    It must not ACK the segment correctly, only need to check if the response
-    is received.
+    The ACKed sequence number acknowledges only the segment with this
+    sequence number. The window of the P2MP-FTP Server slides over the
+    oldest segments it ACKed. Stale, duplicate, corrupted or unknown packets
+    are ignored.
 
-    Returns:
-        Boolean True or False indicating whether all P2MP-FTP Servers ACKed
-        or responded to the outstanding packet or not
+    Args:
+        window: list of outstanding segments
+        ack_packet: binary ACK packet that is received from a P2MP-FTP
+                    Server as response and retrieved from the socket
+        server_ip: IPv4 address of a P2MP-FTP Server
     """
-    for name, host in dict_hosts.iteritems():
-        if not host.ack_response:
-            return False
-    return True
+    try:
+        host = dict_hosts[server_ip]
+        rcv_ack, rcv_zero_field, rcv_ack_indicator = unpack_ack(ack_packet)
+        assert rcv_ack_indicator == ACK
+        assert rcv_zero_field == 0
+        for segment in window[host.acked:host.sent]:
+            if segment.seq_number == rcv_ack and \
+                    server_ip in segment.pending:
+                segment.acknowledge(server_ip)
+                host.ack = rcv_ack
+                host.update_rtt(segment.rtt_sample(server_ip))
+                # Slide the window of the Server over its ACKed segments
+                while host.acked < host.sent and \
+                        server_ip not in window[host.acked].pending:
+                    host.acked = host.acked + 1
+                return
+    except (AssertionError, KeyError, struct.error):
+        return
+
+
+def extract_sack(client_socket, window, feedback_packet, server_ip):
+    """Extracts the ACK of version 2 or the NACK feedback received from
+    P2MP-FTP Server.
+
+    The cumulative ACK acknowledges the segment with the ACKed sequence
+    number and all segments before it. The ACK of version 2 and the NACK
+    acknowledge all segments before the next expected sequence number and
+    the segments after it received out-of-sequence, i.e. those set in the
+    SACK bitmap or before the end of the last range and not within any
+    missing range. The missing segments are re-transmitted to the Server at
+    once, unless they were transmitted to it less than the smoothed RTT ago,
+    or twice the smoothed RTT with the FEC, and are taken for a loss by the
+    congestion control.
+    The window of the P2MP-FTP Server slides over the oldest segments it
+    ACKed, and its Go-Back-N timer is restarted on new ACKs. Stale,
+    corrupted or unknown packets are ignored.
+
+    Args:
+        client_socket: UDP socket of the transfer
+        window: list of outstanding segments
+        feedback_packet: binary ACK or NACK packet that is received from a
+                         P2MP-FTP Server and retrieved from the socket
+        server_ip: IPv4 address of a P2MP-FTP Server
+    """
+    try:
+        host = dict_hosts[server_ip]
+        rcv_ack, rcv_field, rcv_indicator = unpack_ack(feedback_packet)
+        if rcv_indicator == ACK and rcv_field == VERSION_2:
+            rcv_ack, bitmap, bits = unpack_sack(feedback_packet)
+            ranges, highest = sack_ranges(rcv_ack, bitmap, bits, mss)
+        elif rcv_indicator == ACK:
+            assert rcv_field == 0
+            ranges = []
+            # Sequence number following the cumulatively ACKed segment
+            rcv_ack = seq_add(rcv_ack, 1)
+            highest = rcv_ack
+        else:
+            assert rcv_indicator == NACK
+            rcv_ack, ranges = unpack_nack(feedback_packet)
+            # Sequence number following the highest received segment
+            highest = ranges[-1][1] if ranges else rcv_ack
+        segments = window[host.acked:host.sent]
+        # The newest ACKed segment gives the RTT sample
+        newest = None
+        for segment in segments:
+            if server_ip in segment.pending and \
+                    acknowledged(segment.seq_number, rcv_ack, ranges, highest):
+                segment.acknowledge(server_ip)
+                host.ack = segment.seq_number
+                newest = segment
+        if newest is not None:
+            host.update_rtt(newest.rtt_sample(server_ip))
+        # Re-transmit the missing segments, the Server may still rebuild them
+        # from the parity packets of their blocks
+        now = time.time()
+        delay = (host.srtt or 0) * (2 if fec_block_size else 1)
+        for start, end in ranges:
+            for segment in segments:
+                if seq_within(segment.seq_number, start, end) and \
+                        server_ip in segment.pending and \
+                        now - segment.timer_start[server_ip] >= delay:
+                    logger.debug('NACK, sequence number = %d',
+                                 segment.seq_number)
+                    host.lose(segment, now)
+                    segment.transmit(client_socket, server_ip)
+        # Slide the window of the Server over its ACKed segments
+        while host.acked < host.sent and \
+                server_ip not in window[host.acked].pending:
+            host.acked = host.acked + 1
+        if arq == GO_BACK_N and newest is not None:
+            if host.acked < host.sent:
+                host.start_timer(time.time())
+            else:
+                host.timer_start = None
+    except (AssertionError, KeyError, struct.error):
+        return
 
 
 class Host:
@@ -295,69 +1458,784 @@ class Host:
 
     Used for keeping track of the name of the P2MP-FTP Server, latest ACK
     packet received from P2MP-FTP Server, ACKs for the last successfully
-    received in-sequence packet.
+    received in-sequence packet and the retransmission timeout (RTO) of the
+    Server. The RTO is derived from the smoothed RTT and RTT variation
+    estimated from the ACK timing (Jacobson/Karels algorithm, RFC 6298) and
+    is doubled on every timeout (exponential backoff). The congestion window
+    and the pacer of the Server, and its telemetry are kept as well.
 
     Attributes:
         name: hostname of the P2MP-FTP Server
         ack: ACK for the last successfully received in-sequence packet
-        ack_response: boolean indicating whether not response packet (ACK) is
-                      received from a P2MP-FTP Server
+        acked: number of the oldest segments of the buffer ACKed by the
+               P2MP-FTP Server, i.e. the base of its window
+        sent: number of the oldest segments of the buffer transmitted to the
+              P2MP-FTP Server, i.e. the next segment of its window
+        timer_start: time when the Go-Back-N retransmission timer of the
+                     P2MP-FTP Server is started, None if it is not running
+        segment_timers: queue of the segment retransmission timers of the
+                        P2MP-FTP Server as tuples of start time and segment,
+                        in the order they are started
+        deadline: deadline of the entry of the P2MP-FTP Server on the heap
+                  of timers, None if it has no entry
+        srtt: smoothed round trip time (RTT) in seconds
+        rttvar: round trip time variation in seconds
+        rto: retransmission timeout in seconds
+        version: protocol version agreed on with the P2MP-FTP Server
+        session: True if the P2MP-FTP Server accepted the session ID, i.e.
+                 the data packets are preceded by the session ID
+        codec: codec of the compression agreed on with the P2MP-FTP Server
+        transmissions: number of segments transmitted for the first time to
+                       the P2MP-FTP Server
+        retransmissions: number of segments re-transmitted to the P2MP-FTP
+                         Server
+        timeouts: number of retransmission timeouts of the P2MP-FTP Server
+        delivered: number of payload bytes ACKed by the P2MP-FTP Server
+        last_ack: time when the P2MP-FTP Server last ACKed a segment, None
+                  until it does
+        stalled: time in seconds the P2MP-FTP Server waited on the slower
+                 Servers, i.e. had nothing to receive until they ACKed
+        stall_start: time when the current wait on the slower Servers
+                     started, None if the P2MP-FTP Server does not wait
+        rtt: histogram of the RTT samples of the P2MP-FTP Server
+        congestion: congestion window of the P2MP-FTP Server, None without
+                    the congestion control
+        pacer: token bucket pacing the P2MP-FTP Server at its congestion
+               window per smoothed RTT, None until the RTT is measured
+        duplicate_acks: number of duplicate ACKs of the last ACKed segment
+                        in a row
+        basis_size: size of the older version of the file the P2MP-FTP
+                    Server holds, None unless it agreed on the delta
+        signatures: signatures of the blocks of the older version as a set
+                    of tuples of the weak rolling checksum and the strong
+                    hash, None until they are fetched
    """
     def __init__(self, name):
         """Initiates Host object with default attributes."""
         self.name = name
         self.ack = None
-        self.ack_response = False
+        self.acked = 0
+        self.sent = 0
+        self.timer_start = None
+        self.segment_timers = deque()
+        self.deadline = None
+        self.srtt = None
+        self.rttvar = None
+        self.rto = initial_rto
+        self.version = VERSION_1
+        self.session = False
+        self.codec = NO_COMPRESSION
+        self.transmissions = 0
+        self.retransmissions = 0
+        self.timeouts = 0
+        self.delivered = 0
+        self.last_ack = None
+        self.stalled = 0.0
+        self.stall_start = None
+        self.rtt = Histogram()
+        self.congestion = None
+        self.pacer = None
+        self.duplicate_acks = 0
+        self.basis_size = None
+        self.signatures = None
+
+    def update_rtt(self, rtt):
+        """Updates RTT estimation when new data is ACKed and derives the RTO.
+
+        The ACK of a re-transmitted segment is ambiguous and gives no RTT
+        sample (Karn's algorithm). Still, it acknowledges new data, so the
+        backed off RTO is recomputed from the current estimation, or reset
+        to the initial RTO if there is no estimation yet.
+
+        Args:
+            rtt: RTT sample in seconds, None if the segment was
+                 re-transmitted and cannot be sampled
+        """
+        rto = self.rto
+        if rtt is not None:
+            self.rtt.observe(rtt)
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar = (1 - RTT_BETA) * self.rttvar + \
+                    RTT_BETA * abs(self.srtt - rtt)
+                self.srtt = (1 - RTT_ALPHA) * self.srtt + RTT_ALPHA * rtt
+        if self.srtt is None:
+            self.rto = initial_rto
+        else:
+            self.rto = min(max(self.srtt + max(CLOCK_GRANULARITY,
+                                               4 * self.rttvar), min_rto),
+                           MAX_RTO)
+        if self.rto < rto:
+            # The earliest timer of the Server expires sooner
+            self.schedule()
+
+    def back_off(self):
+        """Doubles the RTO after the retransmission timer expired."""
+        self.timeouts = self.timeouts + 1
+        self.rto = min(self.rto * 2, MAX_RTO)
+        if self.congestion is not None:
+            self.congestion.on_timeout(time.time())
+
+    def window(self):
+        """Finds the number of segments the Server may have in flight.
+
+        Returns:
+            Window size, limited by the congestion window if there is one
+        """
+        if self.congestion is None:
+            return window_size
+        return min(window_size, self.congestion.segments())
+
+    def lose(self, segment, now):
+        """Reduces the congestion window of the Server for the lost segment.
+
+        Args:
+            segment: segment lost on the way to the Server
+            now: current time
+        """
+        if self.congestion is not None and \
+                self.congestion.on_loss(segment.timer_start[self.name], now):
+            logger.debug('Congestion, server = %s, window = %.1f',
+                         self.name, self.congestion.size)
+
+    def start_stall(self, now):
+        """Starts the wait of the Server on the slower Servers.
+
+        Args:
+            now: current time
+        """
+        self.stall_start = now
+
+    def end_stall(self, now):
+        """Ends the wait of the Server on the slower Servers, if it waits.
+
+        Args:
+            now: current time
+        """
+        if self.stall_start is not None:
+            self.stalled = self.stalled + now - self.stall_start
+            self.stall_start = None
+
+    def values(self, now):
+        """Collects the values of the metrics of the Server.
+
+        Args:
+            now: current time
+
+        Returns:
+            Dictionary of the values as key -> number, Histogram or None
+        """
+        stalled = self.stalled
+        if self.stall_start is not None:
+            stalled = stalled + now - self.stall_start
+        goodput = None
+        if self.last_ack is not None and self.last_ack > transfer_start:
+            goodput = self.delivered / (self.last_ack - transfer_start)
+        return OrderedDict([
+            ('version', self.version), ('transmissions', self.transmissions),
+            ('retransmissions', self.retransmissions),
+            ('timeouts', self.timeouts), ('delivered', self.delivered),
+            ('goodput', goodput), ('stalled', stalled), ('srtt', self.srtt),
+            ('rto', self.rto), ('rtt', self.rtt),
+            ('cwnd', self.congestion and self.congestion.size),
+            ('reductions', self.congestion and self.congestion.reductions),
+            ('pacing_rate', self.pacer and self.pacer.rate)])
+
+    def start_timer(self, start, segment=None):
+        """Starts a retransmission timer of the Server.
+
+        Args:
+            start: time when the timer is started
+            segment: segment transmitted to the Server, None to start the
+                     Go-Back-N timer of the Server
+        """
+        if segment is None:
+            self.timer_start = start
+            self.schedule()
+        else:
+            self.segment_timers.append((start, segment))
+            if len(self.segment_timers) == 1:
+                self.schedule()
+
+    def earliest_timer(self):
+        """Finds the earliest running retransmission timer of the Server.
+
+        The segment timers are left in the queue when they are stopped or
+        restarted, and are dropped from its head here.
+
+        Returns:
+            Time when the timer is started, None if no timer is running
+        """
+        if arq == GO_BACK_N:
+            return self.timer_start
+        while self.segment_timers:
+            start, segment = self.segment_timers[0]
+            if self.name in segment.pending and \
+                    segment.timer_start.get(self.name) == start:
+                return start
+            self.segment_timers.popleft()
+        return None
+
+    def schedule(self):
+        """Pushes the deadline of the earliest timer of the Server onto the
+        heap of timers, unless its entry on the heap expires sooner.
+
+        The entry pushed supersedes the entry of the Server already on the
+        heap, which is dropped once it gets on the top of the heap.
+        """
+        start = self.earliest_timer()
+        if start is not None and (self.deadline is None or
+                                  start + self.rto < self.deadline):
+            self.deadline = start + self.rto
+            heappush(timers, (self.deadline, self.name, start))
+
+
+class Segment:
+    """Outstanding segment transmitted to the P2MP-FTP Servers.
+
+    Used for keeping track of the segment that is transmitted but not ACKed
+    by all P2MP-FTP Servers yet.
+
+    Attributes:
+        seq_number: sequence number of the segment
+        datagram: datagram of the segment in a byte representation
+        session_datagram: datagram of the segment preceded by the session ID
+        pending: set of names of the P2MP-FTP Servers that have not ACKed the
+                 segment yet
+        timer_start: dictionary of the time when the segment was last
+                     transmitted to each P2MP-FTP Server
+        retransmitted: set of names of the P2MP-FTP Servers the segment was
+                       re-transmitted to
+        parity: list of the parity packets preceded by the session ID sent
+                after the first transmission of the segment, None if there
+                are none
+    """
+    def __init__(self, seq_number, session_datagram, names, parity=None):
+        """Initiates Segment object to be ACKed by the names."""
+        self.seq_number = seq_number
+        self.datagram = session_datagram[SESSION_ID_SIZE:]
+        self.session_datagram = session_datagram
+        self.pending = set(names)
+        self.timer_start = {}
+        self.retransmitted = set()
+        self.parity = parity
+
+    def transmit(self, client_socket, name):
+        """Transmits the segment to a P2MP-FTP Server and starts its timer.
+
+        The parity packets of the segment follow its first transmission.
+
+        Args:
+            client_socket: UDP socket of the transfer
+            name: name of the P2MP-FTP Server
+        """
+        global transmissions, retransmissions
+        host = dict_hosts[name]
+        first = name not in self.timer_start
+        if first:
+            transmissions = transmissions + 1
+            host.transmissions = host.transmissions + 1
+        else:
+            retransmissions = retransmissions + 1
+            host.retransmissions = host.retransmissions + 1
+            self.retransmitted.add(name)
+        size = 0
+        if host.session:
+            size = size + client_socket.sendto(self.session_datagram,
+                                               (name, server_port))
+            if first and self.parity:
+                for parity in self.parity:
+                    size = size + client_socket.sendto(parity,
+                                                       (name, server_port))
+        else:
+            size = size + client_socket.sendto(self.datagram,
+                                               (name, server_port))
+            if first and self.parity:
+                for parity in self.parity:
+                    size = size + client_socket.sendto(
+                        buffer(parity, SESSION_ID_SIZE), (name, server_port))
+        self.timer_start[name] = time.time()
+        charge([name], size, self.timer_start[name])
+        if arq != GO_BACK_N:
+            host.start_timer(self.timer_start[name], self)
+
+    def multicast(self, client_socket, names):
+        """Transmits the segment once to the multicast group and starts the
+        timers of the P2MP-FTP Servers it is sent for.
+
+        The P2MP-FTP Servers that accepted the session ID are left out, as
+        they get the segment by unicast. The parity packets of the segment
+        are multicast after it.
+
+        Args:
+            client_socket: UDP socket of the transfer
+            names: names of the P2MP-FTP Servers the segment is sent for
+        """
+        global transmissions
+        names = [name for name in names if not dict_hosts[name].session]
+        if not names:
+            return
+        size = client_socket.sendto(self.datagram,
+                                    (multicast_group, server_port))
+        if self.parity:
+            for parity in self.parity:
+                size = size + client_socket.sendto(
+                    buffer(parity, SESSION_ID_SIZE),
+                    (multicast_group, server_port))
+        transmissions = transmissions + len(names)
+        now = time.time()
+        charge(names, size, now)
+        for name in names:
+            dict_hosts[name].transmissions = \
+                dict_hosts[name].transmissions + 1
+            self.timer_start[name] = now
+            if arq != GO_BACK_N:
+                dict_hosts[name].start_timer(now, self)
+
+    def acknowledge(self, name):
+        """Records the ACK of the segment by a P2MP-FTP Server.
+
+        Args:
+            name: name of the P2MP-FTP Server
+        """
+        if name in self.pending:
+            self.pending.discard(name)
+            host = dict_hosts[name]
+            host.delivered = host.delivered + len(self.datagram) - HEADER_SIZE
+            host.last_ack = time.time()
+            if host.congestion is not None:
+                host.congestion.on_ack()
+
+    def rtt_sample(self, name):
+        """Measures RTT of the segment that is just ACKed by a Server.
+
+        Args:
+            name: name of the P2MP-FTP Server
+
+        Returns:
+            RTT sample in seconds or None if the segment was re-transmitted
+            to the Server, as the ACK is ambiguous (Karn's algorithm)
+        """
+        if name in self.retransmitted:
+            return None
+        return time.time() - self.timer_start[name]
+
+
+def start_congestion_control():
+    """Starts the pacer of the rate limit and the congestion window of
+    every P2MP-FTP Server, if they are enabled."""
+    global pacer
+    if rate_limit is not None:
+        pacer = TokenBucket(rate_limit, mss, time.time())
+    if congestion:
+        for host in dict_hosts.itervalues():
+            host.congestion = CongestionWindow(window_size)
+
+
+def pacing_time(host, now):
+    """Finds the time when the next segment may be sent to a P2MP-FTP
+    Server.
+
+    The segment waits for the pacer of the rate limit and for the pacer of
+    the Server, whose rate follows its congestion window and smoothed RTT.
+    The Server is not paced with the NACK feedback, as the Server sends its
+    feedback only after the segments stop coming, so the RTT it gives
+    includes the feedback interval.
+
+    Args:
+        host: P2MP-FTP Server
+        now: current time
+
+    Returns:
+        Time when the segment may be sent, not later than now if at once
+    """
+    send_time = now
+    if pacer is not None:
+        send_time = pacer.next_time(mss, now)
+    if host.congestion is not None and host.srtt is not None and not nack:
+        rate = host.congestion.pacing_rate(mss, host.srtt)
+        if host.pacer is None:
+            host.pacer = TokenBucket(rate, mss, now)
+        else:
+            host.pacer.set_rate(rate, mss, now)
+        send_time = max(send_time, host.pacer.next_time(mss, now))
+    return send_time
+
+
+def charge(names, size, now):
+    """Takes the bytes sent from the pacers.
+
+    Args:
+        names: names of the P2MP-FTP Servers the datagrams are sent to
+        size: number of bytes sent
+        now: current time
+    """
+    if pacer is not None:
+        pacer.consume(size, now)
+    for name in names:
+        if dict_hosts[name].pacer is not None:
+            dict_hosts[name].pacer.consume(size, now)
+
+
+def ack_queued(client_socket):
+    """Checks whether an ACK is already received and queued in the socket.
+
+    Args:
+        client_socket: UDP socket of the transfer
+
+    Returns:
+        True if an ACK can be read without waiting, False otherwise
+    """
+    return bool(select([client_socket], [], [], 0)[0])
+
+
+def next_timeout():
+    """Finds the earliest deadline of the running retransmission timers.
+
+    The heap holds a single entry with the deadline of the earliest timer of
+    every Server with a running timer. The deadline is pushed again whenever
+    it comes sooner, i.e. a Server starts its first timer or its RTO
+    decreases, so the stale deadlines are never earlier than the actual
+    ones. They are corrected on the top of the heap here, or dropped if the
+    Server has no running timer or the entry is superseded.
+
+    Returns:
+        Earliest deadline in seconds since the epoch, None if no timer is
+        running
+    """
+    while timers:
+        deadline, name = timers[0][:2]
+        host = dict_hosts[name]
+        if deadline != host.deadline:
+            heappop(timers)
+            continue
+        start = host.earliest_timer()
+        if start is None:
+            heappop(timers)
+            host.deadline = None
+        elif start + host.rto != deadline:
+            host.deadline = start + host.rto
+            heapreplace(timers, (host.deadline, name, start))
+        else:
+            return deadline
+    return None
+
+
+def next_wakeup():
+    """Finds when the Client stops waiting for ACKs: the earliest deadline
+    of the running retransmission timers, or the time when a P2MP-FTP Server
+    held back by the pacer may send.
+
+    Returns:
+        Time in seconds since the epoch, None if no timer is running and no
+        Server is held back
+    """
+    deadline = next_timeout()
+    now = time.time()
+    for name in paced:
+        send_time = pacing_time(dict_hosts[name], now)
+        if deadline is None or send_time < deadline:
+            deadline = send_time
+    return deadline
+
+
+def expired_timers(now):
+    """Takes the expired retransmission timers off the heap and the queues of
+    the Servers.
+
+    Args:
+        now: current time
+
+    Returns:
+        List of tuples of the name of the P2MP-FTP Server and the segment,
+        or None for the Go-Back-N timer of the Server
+    """
+    expired = []
+    while True:
+        deadline = next_timeout()
+        if deadline is None or deadline > now:
+            return expired
+        name = heappop(timers)[1]
+        host = dict_hosts[name]
+        host.deadline = None
+        if arq == GO_BACK_N:
+            host.timer_start = None
+            expired.append((name, None))
+            continue
+        while host.earliest_timer() is not None and \
+                host.segment_timers[0][0] + host.rto <= now:
+            start, segment = host.segment_timers.popleft()
+            expired.append((name, segment))
+        host.schedule()
+
+
+def is_ipv4_address(address, multicast=False):
+    """Verifies whether the address is a dotted-decimal IPv4 address.
+
+    Args:
+        address: address provided in the command line
+        multicast: if True, the address must be an IPv4 multicast group
+                   address, i.e. in range of [224.0.0.0, 239.255.255.255]
+
+    Returns:
+        Boolean indicating whether the address is valid
+    """
+    octets = address.split('.')
+    if len(octets) != 4 or \
+            not all(o.isdigit() and int(o) <= 255 for o in octets):
+        return False
+    return not multicast or 224 <= int(octets[0]) <= 239
 
 
 # Actual program starts here
 # Initialize dictionary of host objects
 dict_hosts = {}
-timeout_interval = 0
+initial_rto = INITIAL_RTO
+min_rto = MIN_RTO
+# Reusable buffer for the ACK and NACK packets received from P2MP-FTP
+# Servers
+ack_buffer = bytearray(MAX_MSS)
+hello_packet = bytearray(STRIPE_HELLO_SIZE)
+# Random non-zero session ID of the transfer offered to the Servers
+session_id = struct.unpack('!I', os.urandom(4))[0] or 1
+# Heap of the earliest retransmission timers of the Servers as tuples of
+# deadline, name of the Server and start time
+timers = []
+# Names of the Servers whose windows may have moved, and of the Servers
+# waiting for the buffer to be released
+ready = set()
+waiting = set()
+# Names of the Servers held back by the pacer
+paced = set()
+protocol_version = VERSION_2
+arq = STOP_AND_WAIT
+window_size = DEFAULT_WINDOW_SIZE
+buffer_size = None
+multicast_group = None
+multicast_interface = None
+nack = False
+stripes = 1
+# Range of the file transferred, and its offset offered by the HELLO, in
+# the striped mode
+file_range = None
+stripe_offset = None
+# Number of segments per block K and parity packets per block R of the FEC,
+# None to adapt it, and the segment transmissions and re-transmissions it is
+# adapted to
+fec_block_size = 0
+fec_count = None
+transmissions = 0
+retransmissions = 0
+# Codec of the compression offered to the Servers, and agreed on once they
+# answer the HELLO
+compression = NO_COMPRESSION
+resume = False
+# Whether the file is read as a stream, and the number of its bytes read
+streaming = False
+stream_end = 0
+# Batch of the files of the directory sent, None for a single file
+batch = None
+# Whether the file is sent as the delta against the older versions the
+# Servers hold, the block size of their signatures, and the delta read
+update = False
+delta_block = 0
+delta = None
+# Names of the files of the report and of the metrics, and the time the
+# transfer started and ended
+stats_name = None
+metrics_name = None
+verbosity = 0
+transfer_start = None
+transfer_end = None
+# Rate limit in bytes per second and its pacer, None if there is none, and
+# whether the congestion control is enabled
+rate_limit = None
+pacer = None
+congestion = False
 try:
-    # Validation of all arguments received from command line
-    assert len(sys.argv) >= 5, 'Error: Wrong number of arguments...\n'
-    assert sys.argv[-1].isdigit(), \
+    # Validation of all options and arguments received from command line
+    opts, args = getopt.getopt(sys.argv[1:], 'a:w:b:t:m:i:np:s:f:z:rj:e:vl:cu',
+                               ['arq=', 'window=', 'buffer=', 'timeout=',
+                                'multicast=', 'interface=', 'nack',
+                                'protocol=', 'stripes=', 'fec=',
+                                'compress=', 'resume', 'stats=', 'metrics=',
+                                'verbose', 'limit=', 'congestion',
+                                'update'])
+    for opt, value in opts:
+        if opt in ('-a', '--arq'):
+            assert value in (STOP_AND_WAIT, GO_BACK_N, SELECTIVE_REPEAT), \
+                'Error: Unknown ARQ protocol: \'{}\'...\n'.format(value)
+            arq = value
+        elif opt in ('-w', '--window'):
+            assert value.isdigit() and int(value) > 0, \
+                'Error: Window size provided: \'{}\' is not positive ' \
+                'Integer...\n'.format(value)
+            window_size = int(value)
+        elif opt in ('-b', '--buffer'):
+            assert value.isdigit() and int(value) > 0, \
+                'Error: Buffer size provided: \'{}\' is not positive ' \
+                'Integer...\n'.format(value)
+            buffer_size = int(value)
+        elif opt in ('-t', '--timeout'):
+            initial_rto = float(value)
+            assert initial_rto > 0, \
+                'Error: Initial retransmission timeout provided: \'{}\' is ' \
+                'not positive...\n'.format(value)
+        elif opt in ('-m', '--multicast'):
+            assert is_ipv4_address(value, multicast=True), \
+                'Error: Multicast group provided: \'{}\' is not IPv4 ' \
+                'multicast address...\n'.format(value)
+            multicast_group = value
+        elif opt in ('-i', '--interface'):
+            assert is_ipv4_address(value), \
+                'Error: Interface address provided: \'{}\' is not IPv4 ' \
+                'address...\n'.format(value)
+            multicast_interface = value
+        elif opt in ('-n', '--nack'):
+            nack = True
+        elif opt in ('-p', '--protocol'):
+            assert value in (str(VERSION_1), str(VERSION_2)), \
+                'Error: Protocol version provided: \'{}\' is not ' \
+                'supported...\n'.format(value)
+            protocol_version = int(value)
+        elif opt in ('-s', '--stripes'):
+            assert value.isdigit() and int(value) > 0, \
+                'Error: Number of stripes provided: \'{}\' is not ' \
+                'positive Integer...\n'.format(value)
+            stripes = int(value)
+        elif opt in ('-f', '--fec'):
+            fields = value.split(':')
+            assert len(fields) <= 2 and all(
+                field.isdigit() for field in fields) and \
+                0 < int(fields[-1]) <= int(fields[0]) <= MAX_BLOCK_SIZE, \
+                'Error: FEC provided: \'{}\' is not K[:R] with 0 < R <= K ' \
+                '<= {}...\n'.format(value, MAX_BLOCK_SIZE)
+            fec_block_size = int(fields[0])
+            if len(fields) == 2:
+                fec_count = int(fields[1])
+        elif opt in ('-z', '--compress'):
+            assert value in CODECS and supported(CODECS[value]), \
+                'Error: Compression codec provided: \'{}\' is not ' \
+                'supported...\n'.format(value)
+            compression = CODECS[value]
+        elif opt in ('-r', '--resume'):
+            resume = True
+        elif opt in ('-j', '--stats'):
+            stats_name = value
+        elif opt in ('-e', '--metrics'):
+            metrics_name = value
+        elif opt in ('-v', '--verbose'):
+            verbosity = verbosity + 1
+        elif opt in ('-l', '--limit'):
+            rate_limit = float(value)
+            assert rate_limit > 0, \
+                'Error: Rate limit provided: \'{}\' is not ' \
+                'positive...\n'.format(value)
+        elif opt in ('-c', '--congestion'):
+            congestion = True
+        elif opt in ('-u', '--update'):
+            update = True
+    logger = create_logger('ngtitov_p2mpclient', verbosity)
+    assert stripes == 1 or protocol_version == VERSION_2, \
+        'Error: Stripes are offered by the HELLO of the protocol version ' \
+        '2...\n'
+    assert compression == NO_COMPRESSION or protocol_version == VERSION_2, \
+        'Error: Compression is offered by the HELLO of the protocol version ' \
+        '2...\n'
+    assert not resume or protocol_version == VERSION_2, \
+        'Error: Resume is asked for by the HELLO of the protocol version ' \
+        '2...\n'
+    # The parity packets cover the segments by their sequence numbers, which
+    # the compressed blocks skip
+    assert compression == NO_COMPRESSION or not fec_block_size, \
+        'Error: Compression cannot be combined with the FEC...\n'
+    assert len(args) >= 4, 'Error: Wrong number of arguments...\n'
+    assert args[-1].isdigit(), \
         'Error: Maximum Segment Size (MSS) provided: \'{}\' is not Integer ' \
-        'type...\n'.format(sys.argv[-1])
-    assert sys.argv[-3].isdigit(), \
+        'type...\n'.format(args[-1])
+    assert args[-3].isdigit(), \
         'Error: Port number of the Server(s) provided: \'{}\' is not Integer ' \
-        'type...\n'.format(sys.argv[-3])
-    mss = int(sys.argv[-1])
-    server_port = int(sys.argv[-3])
+        'type...\n'.format(args[-3])
+    mss = int(args[-1])
+    server_port = int(args[-3])
     assert mss > HEADER_SIZE, \
         'Exception: Maximum Segment Size (MSS) provided: \'{}\' <= 8 bytes ' \
         'is not enough to encapsulate the payload into the ' \
-        'segment...\n'.format(sys.argv[-1])
+        'segment...\n'.format(args[-1])
     assert MAX_MSS >= mss, \
         'Exception: Maximum Segment Size (MSS) provided: \'{}\' exceeds ' \
         'possible MSS value of 2048 bytes (consider smaller value for ' \
-        'MMS)...'.format(sys.argv[-1])
-    assert 1024 < server_port <= 0xffff, \
+        'MMS)...'.format(args[-1])
+    assert 1024 < server_port <= 0xffff - stripes + 1, \
         'Port number must be in rage of (1024, 65535]\n'
-    file_name = sys.argv[-2]
-    assert os.path.isfile(file_name), \
+    file_name = args[-2]
+    # The delta is read from the regular file, and the Servers answer the
+    # HELLO with their older versions
+    assert not update or os.path.isfile(file_name) and stripes == 1 and \
+        not resume and protocol_version == VERSION_2, \
+        'Error: Delta of \'{}\' needs the regular file, the protocol ' \
+        'version 2 and cannot be striped or resumed...\n'.format(file_name)
+    if update:
+        delta_block = delta_block_size(os.path.getsize(file_name))
+    if os.path.isdir(file_name):
+        batch = BatchReader(file_name)
+        print 'Batch of {} files, {} bytes'.format(batch.files, batch.size)
+    # Anything but a regular file, e.g. a pipe or the batch of a directory,
+    # and the delta are read as a stream
+    streaming = update or file_name == '-' or os.path.exists(file_name) and \
+        not os.path.isfile(file_name)
+    assert streaming or os.path.isfile(file_name), \
         'Error: \'{}\' no such file...\n'.format(file_name)
-    for h in range(1, len(sys.argv) - 3):
-        # Create host object with the name, ACK response packet and ACK
-        # sequence number. Store object into the dictionary of hosts
-        if sys.argv[h] == 'localhost':
+    assert not streaming or stripes == 1 and not resume, \
+        'Error: Stream of unknown size cannot be striped or resumed...\n'
+    for h in range(len(args) - 3):
+        # Create host object with the name, ACK sequence number and RTT
+        # estimation. Store object into the dictionary of hosts
+        if args[h] == 'localhost':
             hostname = '127.0.0.1'
         else:
-            hostname = sys.argv[h]
+            hostname = args[h]
         _host = Host(hostname)
         dict_hosts[hostname] = _host
-        # Determine RTT to this host and adjust timeout accordingly
-        start_time = time.time()
-        try:
-            http_request = requests.get('http://{}'.format(hostname))
-            rtt = http_request.elapsed.total_seconds()
-        except requests.exceptions.RequestException:
-            rtt = time.time() - start_time
-        if rtt > timeout_interval:
-            timeout_interval = rtt
+    if nack:
+        # NACK feedback runs on top of Selective Repeat. The feedback may be
+        # delayed by the Servers up to the feedback interval
+        arq = SELECTIVE_REPEAT
+        min_rto = max(MIN_RTO, 2 * FEEDBACK_INTERVAL)
+    if arq == STOP_AND_WAIT and buffer_size > 1:
+        # Stop-and-Wait with independent progress of the Servers is
+        # Selective Repeat with the window of 1 segment per Server
+        arq = SELECTIVE_REPEAT
+        window_size = 1
+    if buffer_size is None:
+        buffer_size = window_size
+    assert buffer_size >= window_size, \
+        'Error: Buffer size provided: \'{}\' is less than the window size ' \
+        '{}...\n'.format(buffer_size, window_size)
+    # The parity packets come after the whole block, which Stop-and-Wait or
+    # a smaller window never sends without the ACKs of its segments
+    assert not fec_block_size or arq != STOP_AND_WAIT and \
+        window_size >= fec_block_size, \
+        'Error: FEC of {} segments per block needs the window of Go-Back-N ' \
+        'or Selective Repeat of at least as many segments...\n'.format(
+            fec_block_size)
+    # Stop-and-Wait sends a single segment at a time already
+    assert rate_limit is None and not congestion or \
+        arq != STOP_AND_WAIT, \
+        'Error: Rate limit and congestion control need Go-Back-N or ' \
+        'Selective Repeat...\n'
+    if rate_limit is not None:
+        # Every stripe is paced on its own at its share of the rate
+        rate_limit = rate_limit / stripes
     # Start transferring data to P2MP-FTP Servers
-    rdt_send()
+    if stripes > 1:
+        rdt_send_striped()
+    else:
+        rdt_send_file()
+except getopt.GetoptError, e:
+    print 'Error: {}...\n'.format(e), USAGE
 except AssertionError, e:
     print e, USAGE
 except ValueError, e:
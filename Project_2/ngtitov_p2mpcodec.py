@@ -0,0 +1,702 @@
+"""
+ngtitov_p2mpcodec.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Binary header codec of the P2MP-FTP protocol shared by the P2MP-FTP Client
+(Sender) and the P2MP-FTP Server (Receiver).
+
+The Data Packet header and the ACK packet have the same layout of a 32-bit
+word followed by two 16-bit words in network byte order. Both are encoded and
+decoded with the precompiled struct formats below. Headers are packed
+directly into a reusable buffer and unpacked from the received buffer, so no
+intermediate strings are built on the per-packet path.
+
+P2MP-FTP protocol for Data Packet is defined:
+0                      16                      32
+-------------------------------------------------    -
+|                Sequence Number                |     |
+-------------------------------------------------     |
+|        Checksum       | Data Packet Indicator |     |
+-------------------------------------------------     |--> MSS
+|                                               |     |
+|                    Payload                    |     |
+|                                               |     |
+-------------------------------------------------    -
+
+P2MP-FTP protocol for ACK is defined:
+0                      16                      32
+-------------------------------------------------    -
+|              ACKed Sequence Number            |     |
+-------------------------------------------------     |--> 8 bytes
+|        0x0000         |  ACK Packet Indicator |     |
+-------------------------------------------------    -
+
+P2MP-FTP protocol version 2 for ACK is defined:
+0                      16                      32
+-------------------------------------------------    -
+|         Next Expected Sequence Number         |     |
+-------------------------------------------------     |--> 8 bytes
+|        0x0002         |  ACK Packet Indicator |     |
+-------------------------------------------------    -
+|                  SACK Bitmap                  |     |--> 4 bytes per
+-------------------------------------------------    -    32 segments
+|                      ...                      |
+
+The ACK of version 2 acknowledges every segment before the next expected
+sequence number. Each bit of the SACK bitmap, starting from the most
+significant bit of the first word, stands for the next segments following
+the next expected one, and is set if the segment is received.
+
+P2MP-FTP protocol for HELLO is defined:
+0                      16                      32
+-------------------------------------------------    -
+|                   Session ID                  |     |
+-------------------------------------------------     |--> 8 bytes
+|R|D| Codec |  Version  | HELLO Packet Indicator|     |
+-------------------------------------------------    -
+
+The Client offers the highest protocol version it supports, and the Server
+answers with the version to be used, which is the highest version supported
+by both. The Client offers the session ID of the transfer as well. The Server
+running the sessions of the daemon mode answers with the same session ID,
+any other Server answers with 0x00000000. The Client offers the codec of the
+payload compression, 0 if it does not compress, and the Server answers with
+the codec to be used. The Server not aware of the compression answers with
+0, as the whole 16-bit word is greater than its highest version. The resume
+flag R asks the Server for the offset in the file it resumes the transfer
+from instead, which the Server keeping the partial file answers with the
+flag set.
+
+P2MP-FTP protocol for HELLO of a stripe is defined:
+0                      16                      32
+-------------------------------------------------    -
+|                   Session ID                  |     |
+-------------------------------------------------     |--> 8 bytes
+|R|D| Codec |  Version  | HELLO Packet Indicator|     |
+-------------------------------------------------    -
+|                                               |     |
+|              Stripe Offset (64 bits)          |     |--> 8 bytes
+|                                               |     |
+-------------------------------------------------    -
+
+The striped Client transfers every byte range of the file separately and
+offers the offset of the range in the file. The Server receiving the stripes
+writes the range at that offset and echoes the offset in its answer. The
+resumed transfer offers the offset it resumes from the same way.
+
+The delta flag D offers to send the file as the delta against the older
+version of it the Server holds, in place of the offset giving the size of
+the blocks the older version is signed by. The Server holding the older
+version answers with the flag set and the size of the older version in
+place of the offset.
+
+P2MP-FTP protocol for signatures is defined:
+0                      16                      32
+-------------------------------------------------    -
+|               First Block Index               |     |
+-------------------------------------------------     |--> 8 bytes
+|    Number of Blocks   |  Signature Indicator  |     |
+-------------------------------------------------    -
+|             Weak Rolling Checksum             |     |
+-------------------------------------------------     |
+|                                               |     |--> 12 bytes per
+|             Strong Hash (64 bits)             |     |    block
+|                                               |     |
+-------------------------------------------------    -
+|                      ...                      |
+
+The Client asks for the signatures of the number of blocks of the older
+version of the file from the first block index by the header alone, and the
+Server answers with the same header and the signatures of the blocks it
+holds. The weak rolling checksum is the Adler-32 checksum of the block and
+the strong hash is the first 8 bytes of its MD5 digest.
+
+P2MP-FTP protocol for Data Packet of a session is defined:
+0                      16                      32
+-------------------------------------------------    -
+|                   Session ID                  |     |--> 4 bytes
+-------------------------------------------------    -
+|                Sequence Number                |     |
+-------------------------------------------------     |
+|        Checksum       | Data Packet Indicator |     |
+-------------------------------------------------     |--> MSS
+|                                               |     |
+|                    Payload                    |     |
+|                                               |     |
+-------------------------------------------------    -
+
+The data packets sent to the Server that answered with the session ID are
+preceded by the session ID, which lets several transfers share the port of
+the Server. The sequence numbers and the checksum cover the data packet
+only, the same as without the session ID.
+
+P2MP-FTP protocol for compressed Data Packet is defined:
+0                      16                      32
+-------------------------------------------------    -
+|                Sequence Number                |     |
+-------------------------------------------------     |
+|        Checksum       | Compressed Indicator  |     |
+-------------------------------------------------     |
+|   Number of Segments  |     Size of Data      |     |
+-------------------------------------------------     |--> up to MSS
+| Size of Data (cont.)  |                       |     |
+-------------------------                       |     |
+|                Compressed Data                |     |
+|                                               |     |
+-------------------------------------------------    -
+
+The compressed data packet carries a block of whole segments of the file
+compressed by the negotiated codec, along with the number of the segments and
+the size of the data before the compression. The sequence number of the next
+packet follows the sequence numbers of all segments of the block, and the
+checksum is the same as for the data packet. The segment that does not fit
+the payload even compressed is sent as the data packet.
+
+P2MP-FTP protocol for parity packet (FEC) is defined:
+0                      16                      32
+-------------------------------------------------    -
+|    Sequence Number of the First Block Segment |     |
+-------------------------------------------------     |
+|        Checksum       |  FEC Packet Indicator |     |
+-------------------------------------------------     |--> 16 bytes
+|   Index   |   Count   |      Block Size       |     |
+-------------------------------------------------     |
+|     Segment Size      |   XOR of Payload Sizes|     |
+-------------------------------------------------    -
+|                                               |     |
+|          XOR of Payloads of the Segments      |     |--> MSS - 8
+|                                               |     |
+-------------------------------------------------    -
+
+The parity packet number Index out of Count parity packets of the block of
+Block Size segments is the XOR of the payloads of the segments Index,
+Index + Count, Index + 2 * Count, ... of the block, which follow each other
+by Segment Size of the sequence numbers. The checksum covers every other
+16-bit word of the header and the payload. The parity packets of the block
+of the last data packet carry the last FEC packet indicator. In a session
+the parity packet is preceded by the session ID, the same as the data
+packet.
+
+P2MP-FTP protocol for NACK is defined:
+0                      16                      32
+-------------------------------------------------    -
+|         Next Expected Sequence Number         |     |
+-------------------------------------------------     |--> 8 bytes
+|    Number of Ranges   | NACK Packet Indicator |     |
+-------------------------------------------------    -
+|          First Missing Sequence Number        |     |
+-------------------------------------------------     |--> 8 bytes per
+|   Sequence Number Following Missing Range     |     |    missing range
+-------------------------------------------------    -
+|                      ...                      |
+
+The NACK acknowledges every segment before the next expected sequence number
+and lists the ranges of the sequence numbers missing after it. The last range
+is empty and marks the sequence number following the highest received
+segment: every segment before it that is not within a missing range is
+received as well.
+
+The sequence numbers wrap around modulo 2^32 past 4 GB of the transfer. They
+are advanced and compared by the serial number arithmetic (RFC 1982): one
+sequence number precedes another if the distance from it to the other one
+modulo 2^32 is less than 2^31, which holds as long as the window spans less
+than 2 GB of the sequence numbers.
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+import struct
+
+# Initialization of constants
+DATA_PACKET = 0b0101010101010101
+LAST_DATA_PACKET = 0b0101010101010111
+ACK = 0b1010101010101010
+NACK = 0b1010101010101011
+HELLO = 0b0101101001011010
+FEC_PACKET = 0b0101010101011001
+LAST_FEC_PACKET = 0b0101010101011011
+COMPRESSED_PACKET = 0b0101010101011101
+LAST_COMPRESSED_PACKET = 0b0101010101011111
+SIGNATURE = 0b1010101010101101
+# Protocol versions: ACK packets of version 1 carry 0x0000 in the place of
+# the version
+VERSION_1 = 1
+VERSION_2 = 2
+HEADER_SIZE = 8
+ACK_SIZE = 8
+MAX_MSS = 2048
+SESSION_ID_SIZE = 4
+STRIPE_HELLO_SIZE = 16
+FEC_HEADER_SIZE = 16
+COMPRESSION_HEADER_SIZE = 6
+# Largest datagram carrying a data packet or a parity packet, preceded by
+# the session ID
+MAX_DATAGRAM_SIZE = SESSION_ID_SIZE + FEC_HEADER_SIZE - HEADER_SIZE + MAX_MSS
+# Resume and delta flags of the version word of the HELLO packet, above the
+# codec
+RESUME_FLAG = 0x8000
+DELTA_FLAG = 0x4000
+
+# Precompiled formats: sequence number, checksum, data packet indicator and
+# ACKed sequence number, zero field (protocol version), ACK packet indicator
+DATA_HEADER = struct.Struct('!IHH')
+ACK_PACKET = struct.Struct('!IHH')
+# Missing range of the NACK packet: first missing sequence number and the
+# sequence number following the range
+NACK_RANGE = struct.Struct('!II')
+# Word of the SACK bitmap of the ACK packet of version 2
+SACK_WORD = struct.Struct('!I')
+# Session ID preceding the data packet of a session
+SESSION_ID = struct.Struct('!I')
+# Offset in the file of the stripe following the HELLO packet
+STRIPE_OFFSET = struct.Struct('!Q')
+# Header of the parity packet: sequence number of the first segment of the
+# block, checksum, FEC packet indicator, index of the parity packet, number
+# of parity packets, block size, segment size, XOR of the payload sizes
+FEC_HEADER = struct.Struct('!IHHBBHHH')
+# Header of the compressed block: number of segments and size of the data
+# before the compression
+COMPRESSION_HEADER = struct.Struct('!HI')
+# Signature of the block of the older version of the file: weak rolling
+# checksum and strong hash
+BLOCK_SIGNATURE = struct.Struct('!I8s')
+MAX_SIGNATURES = (MAX_MSS - ACK_SIZE) // BLOCK_SIGNATURE.size
+MAX_NACK_RANGES = (MAX_MSS - ACK_SIZE) // NACK_RANGE.size
+# Sequence numbers wrap around modulo 2^32, half of the space precedes any
+# sequence number and the other half follows it
+SEQUENCE_MASK = 0xffffffff
+SEQUENCE_SPACE = 0x100000000
+SEQUENCE_HALF = 0x80000000
+
+
+def seq_add(seq_number, n):
+    """Advances the sequence number modulo 2^32.
+
+    Args:
+        seq_number: sequence number integer
+        n: number of sequence numbers to advance by
+
+    Returns:
+        Sequence number following the given one by n
+    """
+    return (seq_number + n) & SEQUENCE_MASK
+
+
+def seq_diff(seq_number, other):
+    """Calculates the signed distance between the sequence numbers modulo
+    2^32.
+
+    Args:
+        seq_number: sequence number integer
+        other: sequence number integer to measure the distance from
+
+    Returns:
+        Distance from the other sequence number to the sequence number,
+        negative if the sequence number precedes the other one
+    """
+    diff = (seq_number - other) & SEQUENCE_MASK
+    return diff - SEQUENCE_SPACE if diff >= SEQUENCE_HALF else diff
+
+
+def seq_within(seq_number, start, end):
+    """Verifies whether the sequence number is within the range.
+
+    Args:
+        seq_number: sequence number integer
+        start: first sequence number of the range
+        end: sequence number following the range
+
+    Returns:
+        True if the sequence number is not before the start of the range and
+        before its end, False otherwise
+    """
+    return seq_diff(seq_number, start) >= 0 and seq_diff(seq_number, end) < 0
+
+
+def pack_header(buf, seq_number, checksum, indicator=DATA_PACKET, offset=0):
+    """Packs the Data Packet header into 8 bytes of the buffer.
+
+    Args:
+        buf: writable buffer (bytearray) that holds the datagram
+        seq_number: sequence number integer
+        checksum: checksum integer
+        indicator: by default data packet indicator
+        offset: offset of the header in the buffer, by default the first
+                byte
+    """
+    DATA_HEADER.pack_into(buf, offset, seq_number, checksum, indicator)
+
+
+def unpack_header(datagram):
+    """Unpacks the Data Packet header from the first 8 bytes of the datagram.
+
+    Args:
+        datagram: received datagram (string or buffer)
+
+    Returns:
+        Tuple of sequence number, checksum and data packet indicator
+    """
+    return DATA_HEADER.unpack_from(datagram)
+
+
+def pack_session(buf, session_id):
+    """Packs the session ID into the first 4 bytes of the buffer.
+
+    Args:
+        buf: writable buffer (bytearray) that holds the datagram
+        session_id: session ID of the transfer
+    """
+    SESSION_ID.pack_into(buf, 0, session_id)
+
+
+def unpack_session(datagram):
+    """Unpacks the session ID from the first 4 bytes of the datagram.
+
+    Args:
+        datagram: received datagram (string or buffer)
+
+    Returns:
+        Session ID of the transfer
+    """
+    return SESSION_ID.unpack_from(datagram)[0]
+
+
+def pack_ack(buf, seq_number):
+    """Packs the ACK packet into the buffer.
+
+    Args:
+        buf: writable buffer (bytearray) of at least 8 bytes
+        seq_number: ACKed sequence number
+    """
+    ACK_PACKET.pack_into(buf, 0, seq_number, 0, ACK)
+
+
+def unpack_ack(ack_packet):
+    """Unpacks the ACK packet.
+
+    Args:
+        ack_packet: received ACK packet (string or buffer)
+
+    Returns:
+        Tuple of ACKed sequence number, zero field and ACK packet indicator
+    """
+    return ACK_PACKET.unpack_from(ack_packet)
+
+
+def pack_sack(buf, seq_number, bitmap, words):
+    """Packs the ACK packet of version 2 into the buffer.
+
+    Args:
+        buf: writable buffer (bytearray) of at least MAX_MSS bytes
+        seq_number: next expected sequence number
+        bitmap: SACK bitmap as an integer, the most significant of its
+                32 * words bits stands for the segment following the next
+                expected one
+        words: number of 32-bit words of the SACK bitmap
+
+    Returns:
+        Size of the ACK packet in bytes
+    """
+    ACK_PACKET.pack_into(buf, 0, seq_number, VERSION_2, ACK)
+    offset = ACK_SIZE
+    for i in range(words - 1, -1, -1):
+        SACK_WORD.pack_into(buf, offset, (bitmap >> (32 * i)) & 0xffffffff)
+        offset = offset + SACK_WORD.size
+    return offset
+
+
+def unpack_sack(ack_packet):
+    """Unpacks the ACK packet of version 2.
+
+    Args:
+        ack_packet: received ACK packet (string or buffer)
+
+    Returns:
+        Tuple of next expected sequence number, SACK bitmap as an integer
+        and number of bits of the SACK bitmap
+    """
+    seq_number, version, indicator = ACK_PACKET.unpack_from(ack_packet)
+    words = (len(ack_packet) - ACK_SIZE) // SACK_WORD.size
+    bitmap = 0
+    for i in range(words):
+        bitmap = (bitmap << 32) | SACK_WORD.unpack_from(
+            ack_packet, ACK_SIZE + i * SACK_WORD.size)[0]
+    return seq_number, bitmap, 32 * words
+
+
+def sack_ranges(seq_number, bitmap, bits, segment_size):
+    """Converts the SACK bitmap of the ACK of version 2 into the missing
+    ranges.
+
+    Args:
+        seq_number: next expected sequence number
+        bitmap: SACK bitmap as an integer
+        bits: number of bits of the SACK bitmap
+        segment_size: sequence numbers every segment spans, i.e. the MSS
+
+    Returns:
+        Tuple of the list of missing ranges as tuples of the first missing
+        sequence number and the sequence number following the range, and
+        the sequence number following the highest received segment
+    """
+    ranges = []
+    highest = seq_number
+    for i in range(1, bits + 1):
+        if bitmap >> (bits - i) & 1:
+            rcv_seq_number = seq_add(seq_number, i * segment_size)
+            if highest != rcv_seq_number:
+                ranges.append((highest, rcv_seq_number))
+            highest = seq_add(rcv_seq_number, segment_size)
+    return ranges, highest
+
+
+def acknowledged(seq_number, next_seq_number, ranges, highest):
+    """Verifies whether the segment is acknowledged by the ACK of version 2
+    or the NACK.
+
+    Args:
+        seq_number: sequence number of the segment
+        next_seq_number: next expected sequence number
+        ranges: list of missing ranges as tuples of the first missing
+                sequence number and the sequence number following the range
+        highest: sequence number following the highest received segment
+
+    Returns:
+        True if the segment is before the next expected sequence number, or
+        before the highest received segment and not within any missing
+        range, False otherwise
+    """
+    if seq_diff(seq_number, next_seq_number) < 0:
+        return True
+    return seq_diff(seq_number, highest) < 0 and not any(
+        seq_within(seq_number, start, end) for start, end in ranges)
+
+
+def pack_hello(buf, version, session_id=0, offset=None, codec=0,
+               resume=False, delta=False):
+    """Packs the HELLO packet into the buffer.
+
+    Args:
+        buf: writable buffer (bytearray) of at least 16 bytes with the
+             stripe offset, 8 bytes otherwise
+        version: protocol version offered or agreed on
+        session_id: session ID offered or accepted, 0 if there is none
+        offset: offset in the file of the stripe, None if the file is not
+                striped
+        codec: codec of the compression offered or agreed on, 0 if there is
+               none
+        resume: True if the offset the transfer is resumed from is asked
+                for or answered
+        delta: True if the delta is offered or agreed on, the offset is the
+               block size offered or the size of the older version answered
+
+    Returns:
+        Size of the HELLO packet in bytes
+    """
+    if resume:
+        version = version | RESUME_FLAG
+    if delta:
+        version = version | DELTA_FLAG
+    ACK_PACKET.pack_into(buf, 0, session_id, codec << 8 | version, HELLO)
+    if offset is None:
+        return ACK_SIZE
+    STRIPE_OFFSET.pack_into(buf, ACK_SIZE, offset)
+    return STRIPE_HELLO_SIZE
+
+
+def unpack_hello(hello_packet):
+    """Unpacks the HELLO packet.
+
+    Args:
+        hello_packet: received HELLO packet (string or buffer)
+
+    Returns:
+        Tuple of protocol version offered or agreed on, session ID offered
+        or accepted, 0 if there is none, offset in the file of the stripe,
+        None if the file is not striped, codec of the compression offered
+        or agreed on, 0 if there is none, True if the resume flag is set and
+        True if the delta flag is set
+
+    Raises:
+        ValueError: if it is not a HELLO packet
+    """
+    session_id, version, indicator = ACK_PACKET.unpack_from(hello_packet)
+    if indicator != HELLO or \
+            len(hello_packet) not in (ACK_SIZE, STRIPE_HELLO_SIZE):
+        raise ValueError('Not a HELLO packet')
+    offset = None
+    if len(hello_packet) == STRIPE_HELLO_SIZE:
+        offset = STRIPE_OFFSET.unpack_from(hello_packet, ACK_SIZE)[0]
+    return version & 0xff, session_id, offset, \
+        (version & ~(RESUME_FLAG | DELTA_FLAG)) >> 8, \
+        bool(version & RESUME_FLAG), bool(version & DELTA_FLAG)
+
+
+def pack_signature_request(buf, index, count):
+    """Packs the request of the signatures of the blocks into the buffer.
+
+    Args:
+        buf: writable buffer (bytearray) of at least 8 bytes
+        index: index of the first block
+        count: number of blocks
+
+    Returns:
+        Size of the request in bytes
+    """
+    ACK_PACKET.pack_into(buf, 0, index, count, SIGNATURE)
+    return ACK_SIZE
+
+
+def pack_signatures(buf, index, signatures):
+    """Packs the signatures of the blocks into the buffer.
+
+    Args:
+        buf: writable buffer (bytearray) of at least MAX_MSS bytes
+        index: index of the first block
+        signatures: packed signatures of the blocks (string or buffer)
+
+    Returns:
+        Size of the signature packet in bytes
+    """
+    ACK_PACKET.pack_into(buf, 0, index,
+                         len(signatures) // BLOCK_SIGNATURE.size, SIGNATURE)
+    buf[ACK_SIZE:ACK_SIZE + len(signatures)] = signatures
+    return ACK_SIZE + len(signatures)
+
+
+def unpack_signatures(signature_packet):
+    """Unpacks the request of the signatures or the signatures of the
+    blocks.
+
+    Args:
+        signature_packet: received signature packet (string or buffer)
+
+    Returns:
+        Tuple of index of the first block, number of blocks and list of the
+        tuples of weak rolling checksum and strong hash of the blocks, empty
+        for the request
+
+    Raises:
+        ValueError: if it is not a signature packet
+    """
+    index, count, indicator = ACK_PACKET.unpack_from(signature_packet)
+    if indicator != SIGNATURE or len(signature_packet) not in (
+            ACK_SIZE, ACK_SIZE + count * BLOCK_SIGNATURE.size):
+        raise ValueError('Not a signature packet')
+    if len(signature_packet) == ACK_SIZE:
+        return index, count, []
+    return index, count, [
+        BLOCK_SIGNATURE.unpack_from(signature_packet,
+                                    ACK_SIZE + i * BLOCK_SIGNATURE.size)
+        for i in range(count)]
+
+
+def pack_fec_header(buf, seq_number, checksum, indicator, index, count,
+                    block_size, segment_size, length, offset=0):
+    """Packs the parity packet header into 16 bytes of the buffer.
+
+    Args:
+        buf: writable buffer (bytearray) that holds the parity packet
+        seq_number: sequence number of the first segment of the block
+        checksum: checksum integer
+        indicator: FEC packet indicator or last FEC packet indicator
+        index: index of the parity packet in the block
+        count: number of parity packets of the block
+        block_size: number of segments of the block
+        segment_size: size of the datagrams but the last one, i.e. the MSS
+        length: XOR of the payload sizes of the segments
+        offset: offset of the header in the buffer, by default the first
+                byte
+    """
+    FEC_HEADER.pack_into(buf, offset, seq_number, checksum, indicator, index,
+                         count, block_size, segment_size, length)
+
+
+def unpack_fec_header(parity_packet):
+    """Unpacks the parity packet header from the first 16 bytes of the
+    parity packet.
+
+    Args:
+        parity_packet: received parity packet (string or buffer)
+
+    Returns:
+        Tuple of sequence number of the first segment of the block,
+        checksum, FEC packet indicator, index of the parity packet, number
+        of parity packets, block size, segment size and XOR of the payload
+        sizes
+    """
+    return FEC_HEADER.unpack_from(parity_packet)
+
+
+def pack_compression_header(buf, span, size, offset=0):
+    """Packs the header of the compressed block into 6 bytes of the buffer.
+
+    Args:
+        buf: writable buffer (bytearray) that holds the datagram
+        span: number of segments of the file in the block
+        size: size of the data of the block before the compression
+        offset: offset of the header in the buffer, by default the first
+                byte
+    """
+    COMPRESSION_HEADER.pack_into(buf, offset, span, size)
+
+
+def unpack_compression_header(block):
+    """Unpacks the header of the compressed block from its first 6 bytes.
+
+    Args:
+        block: payload of the compressed data packet (string or buffer)
+
+    Returns:
+        Tuple of number of segments of the file in the block and size of the
+        data of the block before the compression
+    """
+    return COMPRESSION_HEADER.unpack_from(block)
+
+
+def pack_nack(buf, seq_number, ranges):
+    """Packs the NACK packet into the buffer.
+
+    Only the first missing ranges that fit into the maximum MSS are packed.
+
+    Args:
+        buf: writable buffer (bytearray) of at least MAX_MSS bytes
+        seq_number: next expected sequence number
+        ranges: list of missing ranges as tuples of the first missing
+                sequence number and the sequence number following the range
+
+    Returns:
+        Size of the NACK packet in bytes
+    """
+    ranges = ranges[:MAX_NACK_RANGES]
+    ACK_PACKET.pack_into(buf, 0, seq_number, len(ranges), NACK)
+    offset = ACK_SIZE
+    for start, end in ranges:
+        NACK_RANGE.pack_into(buf, offset, start, end)
+        offset = offset + NACK_RANGE.size
+    return offset
+
+
+def unpack_nack(nack_packet):
+    """Unpacks the NACK packet.
+
+    Args:
+        nack_packet: received NACK packet (string or buffer)
+
+    Returns:
+        Tuple of next expected sequence number and list of missing ranges
+    """
+    seq_number, count, indicator = ACK_PACKET.unpack_from(nack_packet)
+    return seq_number, [
+        NACK_RANGE.unpack_from(nack_packet, ACK_SIZE + i * NACK_RANGE.size)
+        for i in range(count)]
@@ -0,0 +1,187 @@
+"""
+ngtitov_p2mpcompress.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Payload compression of the P2MP-FTP Client (Sender) and the P2MP-FTP Server
+(Receiver).
+
+The Client compresses the file in blocks of whole segments, each block small
+enough to fit the payload of a single data packet, so every data packet is
+decompressed on its own, whether it arrives in sequence or not. The block
+takes as many segments of the file as fit, estimated from the compression
+ratio of the previous block. A segment that does not fit even on its own is
+sent uncompressed, as the data packet without the compression, so data that
+does not compress costs no extra bytes. The Client then stops trying to
+compress it for a while, backing off exponentially while the data stays
+incompressible.
+
+The codec is negotiated by the HELLO. zlib is always available, and the
+faster LZ4 is used when the lz4 package is installed. The Server that does
+not support the offered codec answers with zlib.
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None (lz4 is optional)
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+import zlib
+try:
+    import lz4.block
+except ImportError:
+    lz4 = None
+from ngtitov_p2mpcodec import COMPRESSION_HEADER_SIZE, \
+    unpack_compression_header
+
+# Initialization of constants
+# Codecs negotiated by the HELLO
+NO_COMPRESSION = 0
+ZLIB = 1
+LZ4 = 2
+CODECS = {'zlib': ZLIB, 'lz4': LZ4}
+CODEC_NAMES = {NO_COMPRESSION: 'none', ZLIB: 'zlib', LZ4: 'lz4'}
+# Largest number of segments of the file compressed into a single block
+MAX_SPAN = 256
+# Largest number of segments sent uncompressed after a segment that does not
+# compress, before the compression is tried again
+MAX_BACKOFF = 64
+
+
+def supported(codec):
+    """Checks whether the codec is available on this host.
+
+    Args:
+        codec: codec number
+
+    Returns:
+        True if the data can be compressed and decompressed by the codec
+    """
+    return codec == ZLIB or codec == LZ4 and lz4 is not None
+
+
+def accept(codec):
+    """Selects the codec the Server answers the offered one with.
+
+    Args:
+        codec: codec offered by the Client
+
+    Returns:
+        Offered codec if it is supported, zlib otherwise, or no compression
+        if none is offered
+    """
+    if codec == NO_COMPRESSION or supported(codec):
+        return codec
+    return ZLIB
+
+
+def compress(codec, data):
+    """Compresses the data by the codec.
+
+    Args:
+        codec: codec number
+        data: data to be compressed (string or buffer)
+
+    Returns:
+        Compressed data string
+    """
+    if codec == LZ4:
+        return lz4.block.compress(data, store_size=False)
+    return zlib.compress(data)
+
+
+def decompress(codec, block):
+    """Decompresses the block of the payload of the compressed data packet.
+
+    Args:
+        codec: codec number
+        block: payload of the compressed data packet starting with the
+               compression header (string or buffer)
+
+    Returns:
+        Decompressed data string
+
+    Raises:
+        ValueError: if the block does not decompress into its size
+    """
+    span, size = unpack_compression_header(block)
+    data = buffer(block, COMPRESSION_HEADER_SIZE)
+    try:
+        if codec == LZ4:
+            data = lz4.block.decompress(data, uncompressed_size=size)
+        else:
+            # The output is capped just above the size, so a block that
+            # inflates beyond it is refused without being inflated fully
+            data = zlib.decompressobj().decompress(data, size + 1)
+    except Exception, e:
+        raise ValueError('Block is not decompressed: {}'.format(e))
+    if len(data) != size:
+        raise ValueError('Block is decompressed into {} bytes instead of '
+                         '{}'.format(len(data), size))
+    return data
+
+
+class BlockCompressor:
+    """Compressed blocks of the file built by the P2MP-FTP Client.
+
+    Attributes:
+        codec: codec number
+        unit: size of the payload of a segment of the file
+        capacity: largest size of the compressed data of a block
+        span: number of segments of the file the next block is started with
+        skip: number of segments to be sent uncompressed before the
+              compression is tried again
+        backoff: number of segments skipped after the next segment that does
+                 not compress
+    """
+    def __init__(self, codec, unit, capacity):
+        """Initiates BlockCompressor object."""
+        self.codec = codec
+        self.unit = unit
+        self.capacity = capacity
+        self.span = 1
+        self.skip = 0
+        self.backoff = 1
+
+    def compress_block(self, data, offset, end):
+        """Compresses the most whole segments of the file from the offset
+        that fit the capacity.
+
+        The segments the previous block fitted, scaled by its compression
+        ratio, are tried first, and fewer segments whenever they do not fit.
+
+        Args:
+            data: content of the file (string, buffer or mmap)
+            offset: offset of the block in the file
+            end: end of the data to be compressed in the file
+
+        Returns:
+            Tuple of the number of segments of the block, size of the block
+            and its compressed data, or None if the segment at the offset is
+            sent uncompressed
+        """
+        if self.skip:
+            self.skip = self.skip - 1
+            return None
+        span = min(self.span, (end - offset + self.unit - 1) // self.unit)
+        while True:
+            size = min(span * self.unit, end - offset)
+            compressed = compress(self.codec, buffer(data, offset, size))
+            if len(compressed) <= self.capacity:
+                self.span = min(max(span * self.capacity // max(
+                    len(compressed), 1), 1), MAX_SPAN)
+                self.backoff = 1
+                return span, size, compressed
+            if span == 1:
+                self.skip = self.backoff
+                self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+                return None
+            span = max(min(span - 1, span * self.capacity // len(compressed)),
+                       1)
@@ -0,0 +1,226 @@
+"""
+ngtitov_p2mpcongestion.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Rate pacing and congestion control of the P2MP-FTP Client (Sender).
+
+The token bucket paces the datagrams sent by the Client. The tokens are the
+bytes the Client may send, which accumulate at the rate of the bucket up to
+its depth, so a burst never exceeds the depth however long the Client stayed
+idle. A new segment waits until the bucket holds enough tokens for it. A
+re-transmission is sent at once, but takes its tokens all the same, leaving
+the bucket in debt, so the new segments wait until the debt is paid and the
+rate holds on average.
+
+The congestion window limits the segments in flight to a Server by the
+additive increase, multiplicative decrease (AIMD) rules of TCP (RFC 5681).
+The window starts small and grows by a segment per segment ACKed (slow
+start) up to the slow start threshold, and by a segment per window ACKed
+beyond it (congestion avoidance). A loss reported by the Server, i.e. the
+missing segments of the SACK bitmap or the NACK, or the duplicate ACKs,
+halves the window once per window of segments in flight. A timeout halves
+the threshold and restarts the slow start from a single segment.
+
+In the automatic mode the Client paces every Server at its congestion window
+per smoothed RTT, scaled by a gain that lets the window grow, so the window
+is spread over the RTT instead of sent in a burst.
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Initialization of constants
+# Congestion window in segments the transfer starts with, and the smallest
+# one
+INITIAL_WINDOW = 4
+MIN_WINDOW = 1
+# Gains of the automatic pacing rate in the slow start and in the congestion
+# avoidance
+SLOW_START_GAIN = 2.0
+CONGESTION_AVOIDANCE_GAIN = 1.25
+# Smallest depth of the token bucket in segments, and in seconds of its rate
+BURST_SEGMENTS = 2
+BURST_TIME = 0.002
+
+
+class TokenBucket:
+    """Token bucket of the bytes the Client may send.
+
+    Attributes:
+        rate: rate of the tokens in bytes per second
+        depth: largest number of tokens in bytes, i.e. the largest burst
+        tokens: number of tokens in bytes, negative while in debt
+        stamp: time when the tokens were last counted
+    """
+    def __init__(self, rate, mss, now):
+        """Initiates full TokenBucket object of the rate for the segments of
+        the MSS."""
+        self.rate = float(rate)
+        self.depth = max(BURST_SEGMENTS * mss, self.rate * BURST_TIME)
+        self.tokens = self.depth
+        self.stamp = now
+
+    def refill(self, now):
+        """Adds the tokens accumulated since they were last counted.
+
+        Args:
+            now: current time
+        """
+        if now > self.stamp:
+            self.tokens = min(self.depth,
+                              self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def set_rate(self, rate, mss, now):
+        """Changes the rate, counting the tokens accumulated at the previous
+        one first.
+
+        Args:
+            rate: new rate in bytes per second
+            mss: maximum segment size in bytes
+            now: current time
+        """
+        self.refill(now)
+        self.rate = float(rate)
+        self.depth = max(BURST_SEGMENTS * mss, self.rate * BURST_TIME)
+        self.tokens = min(self.tokens, self.depth)
+
+    def admits(self, size, now):
+        """Checks whether the datagram may be sent now.
+
+        Args:
+            size: size of the datagram in bytes
+            now: current time
+
+        Returns:
+            True if the bucket holds the tokens for the datagram
+        """
+        self.refill(now)
+        return self.tokens >= min(size, self.depth)
+
+    def consume(self, size, now):
+        """Takes the tokens of the datagram sent, going into debt if there
+        are not enough of them.
+
+        Args:
+            size: size of the datagram in bytes
+            now: current time
+        """
+        self.refill(now)
+        self.tokens = self.tokens - size
+
+    def next_time(self, size, now):
+        """Finds the time when the datagram may be sent.
+
+        Args:
+            size: size of the datagram in bytes
+            now: current time
+
+        Returns:
+            Time when the bucket holds the tokens for the datagram
+        """
+        self.refill(now)
+        missing = min(size, self.depth) - self.tokens
+        if missing <= 0:
+            return now
+        return now + missing / self.rate
+
+
+class CongestionWindow:
+    """Congestion window of the path to a P2MP-FTP Server in segments.
+
+    Attributes:
+        size: congestion window in segments, fractional in the congestion
+              avoidance
+        threshold: slow start threshold in segments
+        maximum: largest congestion window, i.e. the window size of the ARQ
+        recovery_start: time when the window was last reduced, the losses
+                        of the segments sent before it do not reduce it
+                        again
+        reductions: number of times the window was reduced
+    """
+    def __init__(self, maximum):
+        """Initiates CongestionWindow object up to the window size of the
+        ARQ."""
+        self.size = float(min(INITIAL_WINDOW, maximum))
+        self.threshold = float(maximum)
+        self.maximum = float(maximum)
+        self.recovery_start = 0.0
+        self.reductions = 0
+
+    def segments(self):
+        """Finds the number of segments the window lets in flight.
+
+        Returns:
+            Whole number of segments, at least 1
+        """
+        return max(int(self.size), MIN_WINDOW)
+
+    def slow_start(self):
+        """Checks whether the window is in the slow start.
+
+        Returns:
+            True below the slow start threshold
+        """
+        return self.size < self.threshold
+
+    def pacing_rate(self, mss, srtt):
+        """Finds the rate of the automatic pacing of the path.
+
+        Args:
+            mss: maximum segment size in bytes
+            srtt: smoothed RTT of the path in seconds
+
+        Returns:
+            Rate in bytes per second
+        """
+        gain = SLOW_START_GAIN if self.slow_start() else \
+            CONGESTION_AVOIDANCE_GAIN
+        return gain * self.size * mss / max(srtt, 1e-6)
+
+    def on_ack(self):
+        """Grows the window for the segment ACKed."""
+        if self.size < self.threshold:
+            self.size = min(self.size + 1, self.maximum)
+        else:
+            self.size = min(self.size + 1 / self.size, self.maximum)
+
+    def on_loss(self, sent, now):
+        """Halves the window for the lost segment, unless it was sent before
+        the window was last reduced.
+
+        Args:
+            sent: time when the lost segment was sent
+            now: current time
+
+        Returns:
+            True if the window is reduced
+        """
+        if sent < self.recovery_start:
+            return False
+        self.threshold = max(self.size / 2, MIN_WINDOW)
+        self.size = self.threshold
+        self.recovery_start = now
+        self.reductions = self.reductions + 1
+        return True
+
+    def on_timeout(self, now):
+        """Halves the slow start threshold and restarts the slow start from
+        a single segment after the retransmission timer expired.
+
+        Args:
+            now: current time
+        """
+        self.threshold = max(self.size / 2, MIN_WINDOW)
+        self.size = float(MIN_WINDOW)
+        self.recovery_start = now
+        self.reductions = self.reductions + 1
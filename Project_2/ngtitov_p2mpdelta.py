@@ -0,0 +1,440 @@
+"""
+ngtitov_p2mpdelta.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Block-level delta of the file against the older versions of it the P2MP-FTP
+Servers hold.
+
+The Server signs its older version of the file by the blocks of the size the
+Client offers: every whole block gets the weak rolling checksum (Adler-32)
+and the strong hash (the first 8 bytes of MD5). The Client collects the
+signatures of every Server and keeps the blocks all of them hold. It slides
+the window of the block size over the file, rolling the weak checksum by one
+byte at a time, and hashes the window only when the weak checksum is known.
+The window found in the older versions is sent as the instruction to copy the
+block, and the Client jumps over it. The data between the copied blocks is
+sent as it is, so the blocks missing from any Server are sent once to all of
+them.
+
+The delta is a stream sent the same way as a stream of unknown size, and the
+Server patches its older version by it in sequence into the output file. The
+Server looks the copied block up by its signature, so the Servers holding
+different older versions follow the same delta. The delta ends with the MD5
+digest of the whole file, which the Server checks once the file is written.
+
+P2MP-FTP delta is defined:
+0                      16                      32
+-------------------------------------------------    -
+|               Magic Number 'P2MD'             |     |
+-------------------------------------------------     |
+|                   Block Size                  |     |--> 16 bytes
+-------------------------------------------------     |
+|           Size of the File (64 bits)          |     |
+-------------------------------------------------    -
+| 'L' |            Size of the Data             |     |--> 5 bytes +
+-------------------------------------------------     |    data
+|                     Data ...                  |     |
+-------------------------------------------------    -
+| 'C' |           Weak Rolling Checksum         |     |--> 13 bytes
+-------------------------------------------------     |
+|           Strong Hash (64 bits) ...           |     |
+-------------------------------------------------    -
+| 'E' |          MD5 Digest of the File ...     |     |--> 17 bytes
+-------------------------------------------------    -
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+import hashlib
+import math
+import mmap
+import os
+import struct
+import zlib
+from ngtitov_p2mpcodec import BLOCK_SIGNATURE
+
+# Initialization of constants
+DELTA_MAGIC = 'P2MD'
+# Smallest and largest block size, the block size of the file is the power
+# of two closest to the square root of its size
+MIN_DELTA_BLOCK = 1024
+MAX_DELTA_BLOCK = 131072
+# Largest data of a single literal instruction, so the delta is produced in
+# pieces of bounded size
+MAX_LITERAL = 65536
+# Modulus of the Adler-32 checksum
+ADLER_MODULUS = 65521
+LITERAL = 'L'
+COPY = 'C'
+END = 'E'
+DELTA_HEADER = struct.Struct('!4sIQ')
+LITERAL_HEADER = struct.Struct('!cI')
+COPY_INSTRUCTION = struct.Struct('!cI8s')
+END_INSTRUCTION = struct.Struct('!c16s')
+INSTRUCTION_SIZES = {LITERAL: LITERAL_HEADER.size,
+                     COPY: COPY_INSTRUCTION.size,
+                     END: END_INSTRUCTION.size}
+
+
+def delta_block_size(size):
+    """Finds the block size of the delta of the file.
+
+    Args:
+        size: size of the file in bytes
+
+    Returns:
+        Power of two closest to the square root of the size, within
+        [MIN_DELTA_BLOCK, MAX_DELTA_BLOCK]
+    """
+    block = 1 << int(round(math.log(max(size, 1), 2) / 2))
+    return min(max(block, MIN_DELTA_BLOCK), MAX_DELTA_BLOCK)
+
+
+def sign_block(data):
+    """Signs the block.
+
+    Args:
+        data: data of the block (string or buffer)
+
+    Returns:
+        Tuple of the weak rolling checksum and the strong hash of the block
+    """
+    return zlib.adler32(data) & 0xffffffff, hashlib.md5(data).digest()[:8]
+
+
+def map_file(file_name):
+    """Memory-maps the file for reading.
+
+    Args:
+        file_name: name of the file
+
+    Returns:
+        Tuple of the file object, the memory-mapped file, an empty string for
+        the empty file, and the size of the file
+    """
+    file_in = open(file_name, 'rb')
+    size = os.fstat(file_in.fileno()).st_size
+    # The empty file cannot be memory-mapped
+    file_map = mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ) \
+        if size else ''
+    return file_in, file_map, size
+
+
+class Basis:
+    """Older version of the file held by the P2MP-FTP Server.
+
+    Attributes:
+        file_in: file object of the older version
+        file_map: memory-mapped older version
+        size: size of the older version in bytes
+        block: block size of the signatures, 0 until it is signed
+        signatures: packed signatures of the whole blocks in their order
+        offsets: offsets of the blocks as tuple of the weak rolling checksum
+                 and the strong hash -> offset in the older version
+    """
+    def __init__(self, file_name):
+        """Initiates Basis object of the existing file, or of the empty one
+        if there is no such file, signed by the block size of its size."""
+        if os.path.isfile(file_name):
+            self.file_in, self.file_map, self.size = map_file(file_name)
+        else:
+            self.file_in, self.file_map, self.size = None, '', 0
+        self.block = 0
+        self.signatures = ''
+        self.offsets = {}
+        self.sign(delta_block_size(self.size))
+
+    def sign(self, block):
+        """Signs the whole blocks of the block size, unless they are signed
+        already.
+
+        Args:
+            block: block size in bytes
+        """
+        if block == self.block:
+            return
+        count = self.size // block
+        signatures = bytearray(count * BLOCK_SIGNATURE.size)
+        offsets = {}
+        for i in xrange(count):
+            signature = sign_block(buffer(self.file_map, i * block, block))
+            BLOCK_SIGNATURE.pack_into(signatures, i * BLOCK_SIGNATURE.size,
+                                      *signature)
+            offsets.setdefault(signature, i * block)
+        self.block = block
+        self.signatures = str(signatures)
+        self.offsets = offsets
+
+    def block_data(self, signature):
+        """Finds the data of the block by its signature.
+
+        Args:
+            signature: tuple of the weak rolling checksum and the strong hash
+
+        Returns:
+            Data of the block as a buffer, None if there is no such block
+        """
+        offset = self.offsets.get(signature)
+        if offset is None:
+            return None
+        return buffer(self.file_map, offset, self.block)
+
+    def close(self):
+        """Closes the older version."""
+        if self.file_in is not None:
+            if self.size:
+                self.file_map.close()
+            self.file_in.close()
+            self.file_in = None
+
+
+class DeltaReader:
+    """Stream of the delta of the file read by the P2MP-FTP Client.
+
+    Attributes:
+        file_in: file object of the file
+        file_map: memory-mapped file
+        size: size of the file in bytes
+        block: block size of the signatures
+        blocks: signatures of the blocks every Server holds as a set of
+                tuples of the weak rolling checksum and the strong hash
+        checksums: weak rolling checksums of the blocks
+        offset: offset in the file of the next window
+        literal_start: offset in the file of the data not sent yet
+        output: delta produced and not read yet
+        digest: MD5 digest of the file up to the data not sent yet
+        literal: number of bytes of the file sent as they are
+        copied: number of bytes of the file sent as the copied blocks
+        done: True once the whole delta is produced
+    """
+    def __init__(self, file_name, blocks, block):
+        """Initiates DeltaReader object of the file against the blocks of
+        the block size."""
+        self.file_in, self.file_map, self.size = map_file(file_name)
+        self.block = block
+        self.blocks = blocks
+        self.checksums = set(weak for weak, strong in blocks)
+        self.offset = 0
+        self.literal_start = 0
+        self.output = bytearray(DELTA_HEADER.pack(DELTA_MAGIC, block,
+                                                  self.size))
+        self.digest = hashlib.md5()
+        self.literal = 0
+        self.copied = 0
+        self.done = False
+
+    def read(self, size):
+        """Reads the next bytes of the delta.
+
+        Args:
+            size: number of bytes to be read
+
+        Returns:
+            String of the size, shorter only at the end of the delta
+        """
+        while len(self.output) < size and not self.done:
+            self.scan()
+        data = str(self.output[:size])
+        del self.output[:size]
+        return data
+
+    def scan(self):
+        """Slides the window over the file until it finds a block of the
+        Servers, or until the data not sent yet reaches MAX_LITERAL bytes,
+        and adds the instructions to the output."""
+        block = self.block
+        offset = self.offset
+        last = -1
+        if self.checksums:
+            last = min(self.size - block,
+                       self.literal_start + MAX_LITERAL - 1)
+        if offset > last:
+            # No block fits the rest of the file
+            end = min(self.size, self.literal_start + MAX_LITERAL)
+            self.add_literal(end)
+            self.offset = end
+            if end == self.size:
+                self.output.extend(END_INSTRUCTION.pack(
+                    END, self.digest.digest()))
+                self.done = True
+            return
+        checksums = self.checksums
+        weak = zlib.adler32(buffer(self.file_map, offset, block)) & \
+            0xffffffff
+        a = weak & 0xffff
+        b = weak >> 16
+        window = None
+        while True:
+            if weak in checksums:
+                signature = sign_block(buffer(self.file_map, offset, block))
+                if signature in self.blocks:
+                    self.add_literal(offset)
+                    self.output.extend(COPY_INSTRUCTION.pack(COPY,
+                                                             *signature))
+                    self.digest.update(buffer(self.file_map, offset, block))
+                    self.copied = self.copied + block
+                    self.offset = self.literal_start = offset + block
+                    return
+            if offset == last:
+                break
+            if window is None:
+                # Bytes of the windows up to the last one as integers
+                base = offset
+                window = bytearray(self.file_map[base:last + block])
+            # Roll the window by one byte
+            removed = window[offset - base]
+            a = (a - removed + window[offset - base + block]) % \
+                ADLER_MODULUS
+            b = (b - block * removed + a - 1) % ADLER_MODULUS
+            weak = b << 16 | a
+            offset = offset + 1
+        self.offset = last + 1
+        if self.offset - self.literal_start == MAX_LITERAL:
+            self.add_literal(self.offset)
+
+    def add_literal(self, end):
+        """Adds the data not sent yet up to the offset to the output.
+
+        Args:
+            end: offset in the file following the data
+        """
+        size = end - self.literal_start
+        if not size:
+            return
+        data = buffer(self.file_map, self.literal_start, size)
+        self.output.extend(LITERAL_HEADER.pack(LITERAL, size))
+        self.output.extend(data)
+        self.digest.update(data)
+        self.literal = self.literal + size
+        self.literal_start = end
+
+    def close(self):
+        """Closes the file."""
+        if self.size:
+            self.file_map.close()
+        self.file_in.close()
+
+
+class DeltaPatcher:
+    """Patcher of the older version of the file held by the P2MP-FTP Server
+    by the delta received.
+
+    It takes the delta in sequence, as the output stream of StreamWriter,
+    and writes the file into the output stream in sequence as well.
+
+    Attributes:
+        basis: older version of the file
+        file_out: file object of the output file
+        pending: received part of the header or of the instruction
+        block: block size of the delta, 0 until the header is received
+        size: size of the file the delta makes up
+        written: number of bytes of the file written
+        remaining: number of bytes of the data of the literal instruction
+                   not received yet
+        digest: MD5 digest of the file written
+        done: True once the digest of the file is checked
+    """
+    def __init__(self, basis, file_out):
+        """Initiates DeltaPatcher object of the older version into the
+        output file."""
+        self.basis = basis
+        self.file_out = file_out
+        self.pending = bytearray()
+        self.block = 0
+        self.size = 0
+        self.written = 0
+        self.remaining = 0
+        self.digest = hashlib.md5()
+        self.done = False
+
+    def write(self, data):
+        """Patches by the next bytes of the delta.
+
+        Args:
+            data: delta received in sequence (string or buffer)
+
+        Raises:
+            IOError: if the delta is not valid for the older version, or the
+                     file it makes up does not match its digest
+        """
+        offset = 0
+        while offset < len(data) and not self.done:
+            if self.remaining:
+                size = min(self.remaining, len(data) - offset)
+                self.output(buffer(data, offset, size))
+                offset = offset + size
+                self.remaining = self.remaining - size
+                continue
+            if not self.block:
+                needed = DELTA_HEADER.size
+            elif self.pending:
+                needed = INSTRUCTION_SIZES.get(chr(self.pending[0]))
+                if needed is None:
+                    raise IOError('Unknown delta instruction')
+            else:
+                needed = 1
+            size = min(needed - len(self.pending), len(data) - offset)
+            self.pending.extend(buffer(data, offset, size))
+            offset = offset + size
+            if len(self.pending) == needed and (not self.block or
+                                                needed > 1):
+                self.execute()
+                self.pending = bytearray()
+
+    def execute(self):
+        """Executes the received header or instruction.
+
+        Raises:
+            IOError: if the delta is not valid for the older version, or the
+                     file it makes up does not match its digest
+        """
+        if not self.block:
+            magic, self.block, self.size = DELTA_HEADER.unpack_from(
+                buffer(self.pending))
+            if magic != DELTA_MAGIC or not self.block:
+                raise IOError('Received stream is not a delta')
+            # The older version is signed by the block size of the HELLO
+            self.basis.sign(self.block)
+            return
+        tag = chr(self.pending[0])
+        if tag == LITERAL:
+            self.remaining = LITERAL_HEADER.unpack_from(
+                buffer(self.pending))[1]
+        elif tag == COPY:
+            data = self.basis.block_data(COPY_INSTRUCTION.unpack_from(
+                buffer(self.pending))[1:])
+            if data is None:
+                raise IOError('Copied block is not in the older version')
+            self.output(data)
+        else:
+            digest = END_INSTRUCTION.unpack_from(buffer(self.pending))[1]
+            if self.written != self.size or \
+                    digest != self.digest.digest():
+                raise IOError('Patched file does not match the file sent')
+            self.done = True
+
+    def output(self, data):
+        """Writes the data of the file.
+
+        Args:
+            data: data of the file (string or buffer)
+        """
+        self.file_out.write(data)
+        self.digest.update(data)
+        self.written = self.written + len(data)
+
+    def close(self):
+        """Closes the output file and the older version."""
+        self.file_out.close()
+        self.basis.close()
@@ -0,0 +1,402 @@
+"""
+ngtitov_p2mpemulator.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Network emulator of the Point-to-Multipoint File Transfer Protocol (P2MP-FTP).
+
+The emulator is a UDP relay placed between the P2MP-FTP Client and a
+P2MP-FTP Server. The Client sends to the port of the emulator instead of the
+port of the Server, the emulator forwards every datagram to the Server from
+a socket of its own for every Client, and forwards the answers of the Server
+back to the Client the datagrams came from. The daemon mode Server behind
+the emulator serves several Clients the same way.
+
+Every datagram is impaired on its way, separately on the data path (Client
+to Server) and on the ACK path (Server to Client):
+ - loss: Bernoulli with a fixed probability, or Gilbert-Elliott, which
+   switches between the good and the bad state with their own loss
+   probabilities to model the bursts of loss
+ - bandwidth cap: the datagrams leave at the given rate, queued behind each
+   other, and the ones arriving at the full queue are dropped
+ - delay: fixed one-way delay and uniformly distributed jitter
+ - reordering: the datagram is held back by the reorder delay, so the
+   datagrams following it overtake it
+ - duplication: the datagram is delivered twice
+Every path draws from its own random number generator seeded by the given
+seed, so the same sequence of datagrams meets the same impairments in every
+run.
+
+The multicast datagrams of the Client do not pass the emulator.
+
+Execute the program run:
+ > python ngtitov_p2mpemulator.py [options] arg1 arg2 arg3
+ where all 3 (three) arguments are required
+ - arg1: Port number of the emulator the Client sends to
+ - arg2: Host name or IPv4 address of the Server
+ - arg3: Port number of the Server
+ and options are
+ - -l, --listen: IPv4 address the emulator listens on (default all), several
+   emulators on the same port let the Client reach several Servers on one
+   host
+ - -d, --data: impairments of the data path (Client to Server)
+ - -a, --ack: impairments of the ACK path (Server to Client)
+ - -s, --seed: seed of the random number generators (default 0)
+ where the impairments are given as comma-separated key=value pairs:
+ - loss=P: Bernoulli loss probability P
+ - ge=P:R[:B[:G]]: Gilbert-Elliott loss moving from the good to the bad
+   state with probability P and back with probability R per datagram, and
+   losing the datagram with probability B in the bad state (default 1) and
+   G in the good state (default 0)
+ - delay=SECONDS: one-way delay
+ - jitter=SECONDS: largest deviation of the delay either way
+ - reorder=P[:SECONDS]: probability P of holding the datagram back by the
+   reorder delay (default 0.01)
+ - dup=P: duplication probability P
+ - rate=BYTES: bandwidth cap in bytes per second
+ - queue=N: number of datagrams queued for the bandwidth cap (default 1000)
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+from socket import *
+from collections import deque
+from heapq import heappop, heappush
+from random import Random
+from select import select
+import getopt
+import sys
+import time
+
+# Initialization of constants
+# Largest UDP datagram relayed
+MAX_DATAGRAM_SIZE = 65535
+# Number of datagrams queued for the bandwidth cap by default
+DEFAULT_QUEUE_SIZE = 1000
+# Time in seconds the reordered datagram is held back by default
+DEFAULT_REORDER_DELAY = 0.01
+USAGE = 'usage: ngtitov_p2mpemulator.py [options] arg1 arg2 arg3\n\n        ' \
+        'arg1: Port number of the emulator the Client sends to\n        ' \
+        'arg2: Host name or IPv4 address of the Server\n        arg3: Port ' \
+        'number of the Server\n\n    options:\n' \
+        '        -l, --listen ADDR:  IPv4 address the emulator listens on ' \
+        '(default all)\n' \
+        '        -d, --data SPEC:    Impairments of the data path (Client ' \
+        'to Server)\n' \
+        '        -a, --ack SPEC:     Impairments of the ACK path (Server to ' \
+        'Client)\n' \
+        '        -s, --seed N:       Seed of the random number generators ' \
+        '(default 0)\n\n    SPEC: comma-separated loss=P, ge=P:R[:B[:G]], ' \
+        'delay=SECONDS, jitter=SECONDS, reorder=P[:SECONDS], dup=P, ' \
+        'rate=BYTES, queue=N'
+
+
+def relay():
+    """Relays the datagrams between the P2MP-FTP Clients and the P2MP-FTP
+    Server, impairing them on the way.
+
+    The datagram of a new Client gets the socket of its own the datagrams
+    of the Client are forwarded to the Server from, so the answers of the
+    Server arriving at that socket are forwarded back to the Client. The
+    impaired datagrams wait on the heap until their delivery time. It runs
+    until Keyboard Interrupt - <Ctrl c>.
+    """
+    listen_socket = socket(AF_INET, SOCK_DGRAM)
+    # Sockets towards the Server as address of the Client -> socket, and
+    # the other way around
+    upstream = {}
+    clients = {}
+    # Datagrams to be delivered as tuples of delivery time, order of
+    # arrival, path, socket to send from, datagram and destination address
+    pending = []
+    order = 0
+    try:
+        listen_socket.bind((listen_address, listen_port))
+        print 'P2MP-FTP emulator is relaying {}:{} to {}:{} ...'.format(
+            listen_address or '*', listen_port, server_address[0],
+            server_address[1])
+        while True:
+            remaining = None
+            if pending:
+                remaining = max(pending[0][0] - time.time(), 0)
+            readable = select([listen_socket] + clients.keys(), [], [],
+                              remaining)[0]
+            now = time.time()
+            for sock in readable:
+                try:
+                    datagram, address = sock.recvfrom(MAX_DATAGRAM_SIZE)
+                except error:
+                    # ICMP error of a datagram relayed before
+                    continue
+                if sock is listen_socket:
+                    sender = upstream.get(address)
+                    if sender is None:
+                        sender = socket(AF_INET, SOCK_DGRAM)
+                        sender.bind(('', 0))
+                        upstream[address] = sender
+                        clients[sender] = address
+                        print 'Client {}:{} is relayed'.format(*address)
+                    path, destination = data_path, server_address
+                else:
+                    sender, destination = listen_socket, clients[sock]
+                    path = ack_path
+                for delivery in path.schedule(now, len(datagram)):
+                    heappush(pending, (delivery, order, path, sender,
+                                       datagram, destination))
+                    order = order + 1
+            now = time.time()
+            while pending and pending[0][0] <= now:
+                _, _, path, sender, datagram, destination = heappop(pending)
+                try:
+                    sender.sendto(datagram, destination)
+                    path.delivered = path.delivered + 1
+                except error:
+                    pass
+    except error, (value, message):
+        print 'Exception while creating and binding the emulator socket:'
+        print message
+    except KeyboardInterrupt:
+        print 'Goodbye!'
+    for name, path in (('Data', data_path), ('ACK', ack_path)):
+        print '{} path: {}'.format(name, path.report())
+    for sock in clients:
+        sock.close()
+    listen_socket.close()
+
+
+def parse_impairments(spec):
+    """Parses the impairments of the path given in the command line.
+
+    Args:
+        spec: comma-separated key=value pairs of the impairments
+
+    Returns:
+        Dictionary of the impairments as key -> list of float values
+
+    Raises:
+        AssertionError: if the impairments are not valid
+    """
+    impairments = {}
+    for item in spec.split(','):
+        key, _, value = item.partition('=')
+        assert key in ('loss', 'ge', 'delay', 'jitter', 'reorder', 'dup',
+                       'rate', 'queue'), \
+            'Error: Unknown impairment: \'{}\'...\n'.format(item)
+        try:
+            values = [float(field) for field in value.split(':')]
+        except ValueError:
+            raise AssertionError('Error: Impairment provided: \'{}\' is not '
+                                 'numeric...\n'.format(item))
+        assert len(values) <= {'ge': 4, 'reorder': 2}.get(key, 1) and \
+            len(values) >= (2 if key == 'ge' else 1) and \
+            all(v >= 0 for v in values), \
+            'Error: Impairment provided: \'{}\' is not valid...\n'.format(item)
+        probabilities = {'loss': values, 'ge': values, 'dup': values,
+                         'reorder': values[:1]}.get(key, [])
+        assert all(v <= 1 for v in probabilities), \
+            'Error: Probability provided: \'{}\' is not in range of ' \
+            '[0, 1]...\n'.format(item)
+        assert key != 'queue' or values[0] >= 1 and values[0].is_integer(), \
+            'Error: Queue size provided: \'{}\' is not positive ' \
+            'Integer...\n'.format(item)
+        impairments[key] = values
+    assert 'loss' not in impairments or 'ge' not in impairments, \
+        'Error: Bernoulli and Gilbert-Elliott loss cannot be combined...\n'
+    return impairments
+
+
+class Path:
+    """Direction of the emulated network path between the P2MP-FTP Client
+    and the P2MP-FTP Server.
+
+    Attributes:
+        random: random number generator of the path
+        loss: Bernoulli loss probability
+        gilbert_elliott: Gilbert-Elliott loss as tuple of the probabilities
+                         of moving to the bad state, of moving back to the
+                         good state, and of the loss in the bad and in the
+                         good state, None for the Bernoulli loss
+        bad: True while the Gilbert-Elliott loss is in the bad state
+        delay: one-way delay in seconds
+        jitter: largest deviation of the delay in seconds
+        reorder: probability of holding the datagram back
+        reorder_delay: time in seconds the datagram is held back
+        duplicate: duplication probability
+        rate: bandwidth cap in bytes per second, 0 if there is none
+        queue_size: number of datagrams queued for the bandwidth cap
+        departures: times the queued datagrams leave the bandwidth cap
+        received: number of datagrams received
+        lost: number of datagrams lost
+        overflowed: number of datagrams dropped by the full queue
+        reordered: number of datagrams held back
+        duplicated: number of datagrams duplicated
+        delivered: number of datagrams delivered
+    """
+    def __init__(self, impairments, seed):
+        """Initiates Path object with the impairments parsed by
+        parse_impairments() and the seed of its random number generator."""
+        self.random = Random(seed)
+        self.loss = impairments.get('loss', [0])[0]
+        self.gilbert_elliott = None
+        if 'ge' in impairments:
+            # The loss probabilities of the bad and the good state default
+            # to 1 and 0
+            values = impairments['ge']
+            self.gilbert_elliott = tuple(values + [1, 0][len(values) - 2:])
+        self.bad = False
+        self.delay = impairments.get('delay', [0])[0]
+        self.jitter = impairments.get('jitter', [0])[0]
+        reorder = impairments.get('reorder', [0, DEFAULT_REORDER_DELAY])
+        self.reorder = reorder[0]
+        self.reorder_delay = reorder[1] if len(reorder) > 1 else \
+            DEFAULT_REORDER_DELAY
+        self.duplicate = impairments.get('dup', [0])[0]
+        self.rate = impairments.get('rate', [0])[0]
+        self.queue_size = int(impairments.get('queue',
+                                              [DEFAULT_QUEUE_SIZE])[0])
+        self.departures = deque()
+        self.received = 0
+        self.lost = 0
+        self.overflowed = 0
+        self.reordered = 0
+        self.duplicated = 0
+        self.delivered = 0
+
+    def is_lost(self):
+        """Draws whether the next datagram is lost.
+
+        The Gilbert-Elliott loss moves between the states before the
+        datagram is drawn from the loss probability of the state.
+
+        Returns:
+            True if the datagram is lost
+        """
+        if self.gilbert_elliott is None:
+            return self.loss > 0 and self.random.random() < self.loss
+        to_bad, to_good, loss_bad, loss_good = self.gilbert_elliott
+        if self.random.random() < (to_good if self.bad else to_bad):
+            self.bad = not self.bad
+        return self.random.random() < (loss_bad if self.bad else loss_good)
+
+    def schedule(self, now, size):
+        """Impairs the datagram arriving at the path.
+
+        Args:
+            now: arrival time of the datagram
+            size: size of the datagram in bytes
+
+        Returns:
+            List of delivery times of the copies of the datagram, empty if
+            it is dropped
+        """
+        self.received = self.received + 1
+        if self.is_lost():
+            self.lost = self.lost + 1
+            return []
+        copies = 1
+        if self.duplicate > 0 and self.random.random() < self.duplicate:
+            self.duplicated = self.duplicated + 1
+            copies = 2
+        deliveries = []
+        for _ in range(copies):
+            departure = now
+            if self.rate:
+                while self.departures and self.departures[0] <= now:
+                    self.departures.popleft()
+                if len(self.departures) >= self.queue_size:
+                    self.overflowed = self.overflowed + 1
+                    continue
+                if self.departures:
+                    departure = self.departures[-1]
+                departure = departure + size / self.rate
+                self.departures.append(departure)
+            delay = self.delay
+            if self.jitter:
+                delay = max(delay + self.random.uniform(-self.jitter,
+                                                        self.jitter), 0)
+            if self.reorder > 0 and self.random.random() < self.reorder:
+                self.reordered = self.reordered + 1
+                delay = delay + self.reorder_delay
+            deliveries.append(departure + delay)
+        return deliveries
+
+    def report(self):
+        """Summarizes the impairments the datagrams met.
+
+        Returns:
+            Summary string
+        """
+        return 'received = {}, lost = {}, overflowed = {}, reordered = {}, ' \
+               'duplicated = {}, delivered = {}'.format(
+                   self.received, self.lost, self.overflowed, self.reordered,
+                   self.duplicated, self.delivered)
+
+
+def is_ipv4_address(address):
+    """Verifies whether the address is a dotted-decimal IPv4 address.
+
+    Args:
+        address: address provided in the command line
+
+    Returns:
+        Boolean indicating whether the address is valid
+    """
+    octets = address.split('.')
+    return len(octets) == 4 and \
+        all(o.isdigit() and int(o) <= 255 for o in octets)
+
+
+# Actual program starts here
+listen_address = ''
+data_impairments = {}
+ack_impairments = {}
+seed = 0
+try:
+    # Validation of all options and arguments received from command line
+    opts, args = getopt.getopt(sys.argv[1:], 'l:d:a:s:',
+                               ['listen=', 'data=', 'ack=', 'seed='])
+    for opt, value in opts:
+        if opt in ('-l', '--listen'):
+            assert is_ipv4_address(value), \
+                'Error: Listen address provided: \'{}\' is not IPv4 ' \
+                'address...\n'.format(value)
+            listen_address = value
+        elif opt in ('-d', '--data'):
+            data_impairments = parse_impairments(value)
+        elif opt in ('-a', '--ack'):
+            ack_impairments = parse_impairments(value)
+        elif opt in ('-s', '--seed'):
+            assert value.isdigit(), \
+                'Error: Seed provided: \'{}\' is not Integer...\n'.format(
+                    value)
+            seed = int(value)
+    assert len(args) == 3, 'Error: Wrong number of arguments...\n'
+    assert args[0].isdigit() and args[2].isdigit(), \
+        'Error: Port numbers provided: \'{}\', \'{}\' are not Integer ' \
+        'type...\n'.format(args[0], args[2])
+    listen_port = int(args[0])
+    assert 1024 < listen_port <= 0xffff and 1024 < int(args[2]) <= 0xffff, \
+        'Port number must be in rage of (1024, 65535]\n'
+    server_address = (gethostbyname(args[1]), int(args[2]))
+    # The paths draw from independent random number generators, so the
+    # impairments of one path do not shift the other
+    data_path = Path(data_impairments, 2 * seed)
+    ack_path = Path(ack_impairments, 2 * seed + 1)
+    relay()
+except getopt.GetoptError, e:
+    print 'Error: {}...\n'.format(e), USAGE
+except AssertionError, e:
+    print e, USAGE
+except gaierror, (value, message):
+    print 'Error: Server host name provided: \'{}\' is not resolved: ' \
+          '{}...'.format(args[1], message)
@@ -0,0 +1,232 @@
+"""
+ngtitov_p2mpfec.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Forward error correction (FEC) of the P2MP-FTP Client (Sender) and the
+P2MP-FTP Server (Receiver).
+
+The Client splits the data packets into blocks of K consecutive segments and
+sends R parity packets after the last segment of every block. The parity
+packet i is the XOR of the payloads of the segments i, i + R, i + 2R, ... of
+the block, padded with zeros to the longest payload, so the Server rebuilds
+a segment lost out of them from the parity packet and the other segments,
+without asking the Client for the repair. With several Servers losing
+different segments, a single parity packet repairs all of them at once. The
+interleaving lets R parity packets repair a burst of up to R lost segments.
+(Reed-Solomon codes would repair any R lost segments of the block, at the
+cost of the arithmetic in the Galois field, which is too slow in Python.)
+
+The number of parity packets may be fixed for the run or adapted to the
+loss: it is doubled for the next block whenever more than 1% of the segments
+still need to be re-transmitted, and decreased by one while none of them
+does.
+
+The XOR is computed by NumPy when it is installed, and by the long integer
+arithmetic otherwise.
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None (NumPy is optional)
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+import binascii
+try:
+    import numpy
+except ImportError:
+    numpy = None
+from ngtitov_p2mpchecksum import ones_complement_sum
+from ngtitov_p2mpcodec import FEC_PACKET, LAST_FEC_PACKET, HEADER_SIZE, \
+    SESSION_ID_SIZE, FEC_HEADER_SIZE, pack_session, pack_fec_header
+
+# Initialization of constants
+# The index and the number of the parity packets take a byte of the header
+MAX_BLOCK_SIZE = 255
+# Fraction of the segments re-transmitted in spite of the parity packets,
+# above which the number of parity packets is doubled
+MAX_RESIDUAL_LOSS = 0.01
+# Offset of the payload of the parity packet preceded by the session ID
+PARITY_OFFSET = SESSION_ID_SIZE + FEC_HEADER_SIZE
+
+
+def xor_into(parity, data, offset=0):
+    """XORs the data into the parity buffer in place.
+
+    Args:
+        parity: writable buffer (bytearray) at least offset plus the size of
+                the data long
+        data: data to be XORed (string or buffer)
+        offset: offset of the data in the parity buffer, by default the
+                first byte
+    """
+    size = len(data)
+    if not size:
+        return
+    if numpy is not None:
+        target = numpy.frombuffer(parity, dtype=numpy.uint8, count=size,
+                                  offset=offset)
+        numpy.bitwise_xor(target, numpy.frombuffer(data, dtype=numpy.uint8),
+                          out=target)
+        return
+    value = int(binascii.hexlify(buffer(parity, offset, size)), 16) ^ \
+        int(binascii.hexlify(data), 16)
+    parity[offset:offset + size] = binascii.unhexlify('%0*x' % (2 * size,
+                                                                value))
+
+
+def parity_checksum(seq_number, indicator, index, count, block_size,
+                    segment_size, length, payload):
+    """Calculates checksum of the parity packet.
+
+    Calculation is performed by adding all 16 bit words of the header but
+    the checksum, and of the payload, performing wrap around if overflow
+    occurs and takes complement of it.
+
+    Args:
+        seq_number: sequence number of the first segment of the block
+        indicator: FEC packet indicator or last FEC packet indicator
+        index: index of the parity packet in the block
+        count: number of parity packets of the block
+        block_size: number of segments of the block
+        segment_size: size of the datagrams but the last one, i.e. the MSS
+        length: XOR of the payload sizes of the segments
+        payload: XOR of the payloads of the segments
+
+    Returns:
+        Checksum of the parity packet
+    """
+    checksum = ones_complement_sum(
+        payload, (seq_number & 0xffff) + (seq_number >> 16) + indicator +
+        (index << 8 | count) + block_size + segment_size + length)
+    return ~checksum & 0xffff
+
+
+def recover(parity, length, payloads):
+    """Rebuilds the payload of the only missing segment of the parity
+    packet.
+
+    Args:
+        parity: payload of the parity packet (string or buffer)
+        length: XOR of the payload sizes of the segments
+        payloads: payloads of all other segments of the parity packet
+
+    Returns:
+        Payload of the missing segment (bytearray), None if its size does
+        not fit the parity packet
+    """
+    payload = bytearray(parity)
+    for data in payloads:
+        xor_into(payload, data)
+        length = length ^ len(data)
+    if length > len(payload):
+        return None
+    del payload[length:]
+    return payload
+
+
+class ParityEncoder:
+    """Parity packets of the blocks of segments sent by the P2MP-FTP Client.
+
+    Attributes:
+        block_size: number of segments of the block K
+        count: number of parity packets of the block R
+        adaptive: True if the number of parity packets is adapted to the
+                  residual loss, False if it is fixed
+        session_id: session ID of the transfer preceding the parity packets
+        segment_size: size of the datagrams but the last one, i.e. the MSS
+        seq_number: sequence number of the first segment of the block
+        segments: number of segments of the block added so far
+        parity: parity packets of the block preceded by the session ID
+        lengths: XOR of the payload sizes of every parity packet
+        transmitted: number of segment transmissions when the number of
+                     parity packets was last adapted
+        retransmitted: number of segment re-transmissions when the number
+                       of parity packets was last adapted
+    """
+    def __init__(self, block_size, count, session_id, segment_size):
+        """Initiates ParityEncoder object, the number of parity packets
+        count is None to adapt it starting from 1."""
+        self.block_size = block_size
+        self.count = count or 1
+        self.adaptive = count is None
+        self.session_id = session_id
+        self.segment_size = segment_size
+        self.seq_number = 0
+        self.segments = 0
+        self.parity = []
+        self.lengths = []
+        self.transmitted = 0
+        self.retransmitted = 0
+
+    def adapt(self, transmitted, retransmitted):
+        """Adapts the number of parity packets of the next block to the
+        segments re-transmitted in spite of the parity packets.
+
+        The number is doubled if more than MAX_RESIDUAL_LOSS of the segments
+        transmitted since the last adaptation were re-transmitted, and
+        decreased by one if none of them was. The adaptation waits for at
+        least a block of transmissions and does not change the block that
+        is started.
+
+        Args:
+            transmitted: number of segment transmissions so far
+            retransmitted: number of segment re-transmissions so far
+        """
+        sent = transmitted - self.transmitted
+        if not self.adaptive or self.segments or sent < self.block_size:
+            return
+        lost = retransmitted - self.retransmitted
+        if lost > MAX_RESIDUAL_LOSS * sent:
+            self.count = min(self.count * 2, self.block_size)
+        elif not lost:
+            self.count = max(self.count - 1, 1)
+        self.transmitted = transmitted
+        self.retransmitted = retransmitted
+
+    def add(self, seq_number, payload, last):
+        """Adds the payload of the next segment to the parity packets of its
+        block.
+
+        Args:
+            seq_number: sequence number of the segment
+            payload: payload of the segment (string or buffer)
+            last: True for the last segment of the file
+
+        Returns:
+            List of the parity packets preceded by the session ID (bytearray)
+            if the segment completes the block, None otherwise
+        """
+        if not self.segments:
+            self.seq_number = seq_number
+            self.parity = [bytearray(PARITY_OFFSET + self.segment_size -
+                                     HEADER_SIZE) for _ in range(self.count)]
+            self.lengths = [0] * self.count
+        index = self.segments % self.count
+        xor_into(self.parity[index], payload, PARITY_OFFSET)
+        self.lengths[index] = self.lengths[index] ^ len(payload)
+        self.segments = self.segments + 1
+        if self.segments < self.block_size and not last:
+            return None
+        indicator = LAST_FEC_PACKET if last else FEC_PACKET
+        # The short last block may leave some parity packets empty
+        parity = self.parity[:self.segments]
+        for index, packet in enumerate(parity):
+            pack_session(packet, self.session_id)
+            checksum = parity_checksum(
+                self.seq_number, indicator, index, self.count, self.segments,
+                self.segment_size, self.lengths[index],
+                buffer(packet, PARITY_OFFSET))
+            pack_fec_header(packet, self.seq_number, checksum, indicator,
+                            index, self.count, self.segments,
+                            self.segment_size, self.lengths[index],
+                            offset=SESSION_ID_SIZE)
+        self.segments = 0
+        return parity
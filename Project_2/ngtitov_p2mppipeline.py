@@ -0,0 +1,254 @@
+"""
+ngtitov_p2mppipeline.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Pipelined receiver of the P2MP-FTP Server (Receiver).
+
+The receiving loop of the Server is split into three stages, so a slow disk
+write or a slow checksum does not delay the next read from the socket:
+ - the receiver thread drains the socket into a bounded pool of preallocated
+   buffers and queues them for the worker,
+ - the worker, i.e. the receiving loop of the Server, takes the datagrams
+   from the queue, validates and ACKs them,
+ - the writer thread writes the payloads handed over by the worker to the
+   files and returns their buffers to the pool.
+When the pool runs out of buffers the receiver thread waits for the worker
+and the writer, and the datagrams are queued by the kernel in the socket
+receive buffer, where they are dropped once it overflows. The deepest queue
+and the number of datagrams the kernel dropped are reported when the
+pipeline is closed.
+
+The threads pay off when the disk stalls the writes. Otherwise they only
+compete with the worker for the interpreter lock, so without the buffer pool
+the stages run inline in the worker instead, the same way as a single loop.
+
+The socket is read with the idle interval as the timeout, and the worker
+gets an empty datagram whenever nothing arrives for that long, which drives
+the NACK feedback and keeps the worker responsive to <Ctrl c>.
+
+The compressed payloads are decompressed by the writer right before they
+are written, so the decompression does not delay the ACKs either.
+
+Every payload is written to the file given along with it, so the sessions of
+the daemon mode share one pipeline. A file is closed through the pipeline
+after the payloads handed over before it are written.
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+from socket import error, timeout
+import os
+import Queue
+import threading
+from ngtitov_p2mpcodec import MAX_DATAGRAM_SIZE
+from ngtitov_p2mpcompress import NO_COMPRESSION, decompress
+
+
+class ReceivePipeline:
+    """Receiver and writer threads of the P2MP-FTP Server around the bounded
+    queue of preallocated buffers.
+
+    Attributes:
+        server_socket: UDP socket of the Server
+        size: number of preallocated buffers, 0 if the stages run inline
+        free: queue of the buffers not in use
+        datagrams: queue of the received datagrams for the worker
+        writes: queue of the payloads for the writer
+        current: buffer of the datagram the worker is processing
+        handed_over: True if the current buffer is handed over to the writer
+        max_depth: largest number of datagrams waiting for the worker
+        error: exception the writer thread failed with, None if there is
+               none
+        closed: True once the pipeline is closed
+        receiver: receiver thread, None if the stages run inline
+        writer: writer thread, None if the stages run inline
+    """
+    def __init__(self, server_socket, size, idle_interval):
+        """Allocates the buffers and starts the receiver and writer threads.
+
+        Args:
+            server_socket: UDP socket of the Server
+            size: number of preallocated buffers, 0 to run the stages inline
+            idle_interval: time in seconds after which the worker gets an
+                           empty datagram when nothing arrives
+        """
+        self.server_socket = server_socket
+        self.size = size
+        self.free = Queue.Queue()
+        for _ in range(size):
+            self.free.put(bytearray(MAX_DATAGRAM_SIZE))
+        self.datagrams = Queue.Queue()
+        self.writes = Queue.Queue()
+        self.current = None
+        self.handed_over = False
+        self.max_depth = 0
+        self.error = None
+        self.closed = False
+        self.receiver = None
+        self.writer = None
+        server_socket.settimeout(idle_interval)
+        if not size:
+            # Datagrams are received into the same preallocated buffer
+            self.current = bytearray(MAX_DATAGRAM_SIZE)
+            return
+        self.receiver = threading.Thread(target=self.receive_loop)
+        self.writer = threading.Thread(target=self.write_loop)
+        for thread in (self.receiver, self.writer):
+            thread.daemon = True
+            thread.start()
+
+    def receive(self):
+        """Takes the next received datagram from the queue.
+
+        The buffer of the previous datagram is returned to the pool, unless
+        it is handed over to the writer.
+
+        Returns:
+            Tuple of buffer, number of bytes received and address of the
+            sender, or (None, 0, None) if nothing arrived for the idle
+            interval
+        """
+        if self.receiver is None:
+            try:
+                nbytes, address = self.server_socket.recvfrom_into(
+                    self.current)
+            except timeout:
+                return None, 0, None
+            return self.current, nbytes, address
+        if self.current is not None and not self.handed_over:
+            self.free.put(self.current)
+        self.current, nbytes, address = self.datagrams.get()
+        self.handed_over = False
+        return self.current, nbytes, address
+
+    def write(self, file_out, offset, payload, codec=NO_COMPRESSION):
+        """Hands the payload of the current datagram over to the writer.
+
+        Args:
+            file_out: writer of the output file
+            offset: offset in the file in bytes
+            payload: payload of the current datagram (buffer)
+            codec: codec the payload is decompressed by, by default it is
+                   written as it is
+        """
+        if self.writer is None:
+            if codec != NO_COMPRESSION:
+                payload = decompress(codec, payload)
+            file_out.write(offset, payload)
+            return
+        if self.error is not None:
+            raise self.error
+        self.handed_over = True
+        self.writes.put((file_out, offset, payload, codec, self.current))
+
+    def close_file(self, file_out):
+        """Closes the file once the writer writes every payload handed over
+        for it.
+
+        Args:
+            file_out: writer of the output file
+        """
+        if self.writer is None:
+            file_out.close()
+            return
+        self.writes.put((file_out, None, None, None, None))
+
+    def receive_loop(self):
+        """Drains the socket into the free buffers (receiver thread)."""
+        while not self.closed:
+            buf = self.free.get()
+            try:
+                nbytes, address = self.server_socket.recvfrom_into(buf)
+            except timeout:
+                self.free.put(buf)
+                self.datagrams.put((None, 0, None))
+                continue
+            except error:
+                # The socket is closed
+                return
+            self.datagrams.put((buf, nbytes, address))
+            self.max_depth = max(self.max_depth, self.datagrams.qsize())
+
+    def write_loop(self):
+        """Writes the handed over payloads to the files (writer thread)."""
+        while True:
+            write = self.writes.get()
+            if write is None:
+                return
+            file_out, offset, payload, codec, buf = write
+            try:
+                if buf is None:
+                    file_out.close()
+                elif codec != NO_COMPRESSION:
+                    file_out.write(offset, decompress(codec, payload))
+                else:
+                    file_out.write(offset, payload)
+            except (IOError, OSError, ValueError), e:
+                self.error = e
+            if buf is not None:
+                self.free.put(buf)
+
+    def close(self):
+        """Waits until the writer writes every handed over payload, stops
+        the threads and reports the deepest queue and the datagrams dropped
+        by the kernel.
+        """
+        self.closed = True
+        drops = kernel_drops(self.server_socket)
+        if drops is None:
+            drops = 'n/a'
+        if self.receiver is None:
+            print 'Kernel drops = {}'.format(drops)
+            return
+        self.writes.put(None)
+        self.writer.join()
+        # Return the buffer of the last datagram that was not handed over to
+        # the writer, e.g. of a HELLO, duplicate or corrupted one, and the
+        # queued buffers, so the receiver does not wait for one
+        if self.current is not None and not self.handed_over:
+            self.free.put(self.current)
+            self.current = None
+        while not self.datagrams.empty():
+            buf = self.datagrams.get()[0]
+            if buf is not None:
+                self.free.put(buf)
+        self.receiver.join()
+        print 'Pipeline: max queue depth = {} of {} buffers, kernel ' \
+              'drops = {}'.format(self.max_depth, self.size, drops)
+        if self.error is not None:
+            raise self.error
+
+
+def kernel_drops(server_socket):
+    """Reads the number of datagrams the kernel dropped on the socket.
+
+    The count is taken from the drops column of /proc/net/udp (Linux) in the
+    line of the socket inode.
+
+    Args:
+        server_socket: UDP socket of the Server
+
+    Returns:
+        Number of datagrams dropped or None if it is not available
+    """
+    try:
+        inode = str(os.fstat(server_socket.fileno()).st_ino)
+        with open('/proc/net/udp') as udp:
+            for line in udp:
+                fields = line.split()
+                if len(fields) > 12 and fields[9] == inode:
+                    return int(fields[12])
+    except (IOError, OSError, ValueError):
+        pass
+    return None
@@ -24,15 +24,144 @@ whether it is in-sequence, and does the following:
    using UDP) to the client and then writes the received data into a file whose
    name is provided in the command line.
  - If the packet received is out-of-sequence, an ACK for the last received
-   in-sequence packet is sent.
+   in-sequence packet is sent. Since ACKs are cumulative, the same receiver
+   serves both Stop-and-Wait and Go-Back-N clients.
  - If the checksum is incorrect, it does nothing.
 
+With the receive window greater than 1 the Server runs the receiving side of
+the Selective Repeat ARQ: every valid packet is ACKed individually and
+out-of-sequence packets within the window are recorded in the reorder buffer
+until the gap before them is filled.
+
+The payload of every accepted packet is written at its offset in the file
+right away, derived from its sequence number, so out-of-sequence payloads
+are not kept in memory. Adjacent payloads are coalesced into large writes,
+and the file may be memory-mapped instead.
+
+Optionally the Server runs a pipeline of three threads: the receiver drains
+the socket into a bounded queue of preallocated buffers, the receiving loop
+validates and ACKs the queued packets, and the writer writes the payloads to
+the file, so a slow disk does not hold back the receiving.
+
+The Server may join an IP multicast group to receive the data packets the
+Client sends once to the group. The re-transmitted packets still arrive by
+unicast and the ACKs are always sent back by unicast.
+
+With the NACK feedback the Server does not ACK every packet. It NACKs the
+ranges of missing packets when it detects a gap or stays idle, and reports
+its progress with a cumulative ACK after every half of the receive window.
+
+The Server answers the HELLO of the Client with the highest protocol version
+supported by both. With the version 2 every ACK carries the next expected
+sequence number and the SACK bitmap of the packets kept in the reorder
+buffer, so the Client learns every missing packet from a single ACK. The
+Client that sends no HELLO speaks the version 1.
+
+In the daemon mode the Server runs until it is interrupted and receives the
+transfers of any number of Clients on the same port. Every transfer is a
+session identified by the session ID the Client offers in its HELLO, which
+precedes every data packet of the session, and is written to its own file in
+the output directory.
+
+The Server agrees to the payload compression the Client offers by the HELLO
+with the offered codec, if it is installed, or with zlib. The compressed data
+packet carries a block of several segments of the file, which the writer
+decompresses before writing it at the offset of its first segment.
+
+With the forward error correction (FEC) the Server keeps the payloads of
+the latest packets received. The parity packet the Client sends after every
+block of packets rebuilds the only packet of its share of the block that is
+missing, which is then processed as if it was received, so the Client does
+not need to re-transmit it. The NACK is not sent for a new gap right away,
+but when the Server stays idle, as the gap may still be repaired.
+
+Receiving the stripes of the file, the Server runs a pool of processes, each
+listening to its own port, and writes every stripe into the same output file
+from the offset the HELLO of the stripe offers.
+
+The Server may write the file into a stream instead, i.e. the standard
+output or a named pipe, e.g. into the decompressing program, so a file
+streamed by the Client is never stored. The stream is written in sequence,
+keeping the payloads received out of sequence in memory until the gap before
+them is filled. Writing to the standard output, the messages of the Server
+go to the standard error.
+
+In the batch mode the Server receives the batch of the files of the
+directory the Client sends in a single session, i.e. the manifest of the
+tree followed by the contents of the files, and recreates the tree in the
+output directory as the stream arrives. In the daemon mode every session is
+unpacked into its own directory.
+
+Holding an older version of the file, the Server may receive the file as the
+delta against it. It answers the HELLO offering the delta with the size of
+the older version, and the requests of the Client with the signatures of the
+blocks of the older version. The delta then received is written in sequence,
+copying the blocks of the older version it refers to, and the file it makes
+up is checked against the MD5 digest the delta ends with.
+
+Resuming the transfers, the Server keeps the partial file of the interrupted
+transfer and records the range of it received in sequence in the progress
+file next to it. The HELLO asking where to resume is answered with the end
+of that range, and the Client then offers the offset it resumes from, which
+is never beyond it. The Server restarted with the same file picks up the
+progress file, and the running Server starts over the transfer of the
+restarted Client, which offers another session ID, from the offered offset.
+
+The Server counts the datagrams received and dropped, and the valid,
+duplicate, out-of-sequence, corrupted and repaired packets, the bytes
+received in sequence and the ACKs and NACKs sent by every session, and keeps
+the histogram of the time the next expected packet of the session was
+missing while the later ones arrived. The report is written as JSON on exit,
+and the metrics may be exported in the Prometheus text format while the
+Server runs. The lost and corrupted packets are logged by the leveled logger,
+which is silent by default.
+
 Execute the program run:
- > python ngtitov_p2mpserver.py arg1 arg2 arg3
+ > python ngtitov_p2mpserver.py [options] arg1 arg2 arg3
  where all 3 (three) arguments are required
  - arg1: Port number of the Server
- - arg2: Name of the file
+ - arg2: Name of the file, '-' for the standard output or the name of the
+   named pipe, or the output directory in the daemon and batch modes
  - arg3: Packet loss probability
+ and options are
+ - -w, --window: receive window size N of the Selective Repeat ARQ, the
+   default 1 accepts in-sequence packets only (Stop-and-Wait, Go-Back-N)
+ - -m, --multicast: IPv4 multicast group to join, the data packets sent to
+   the group are received in addition to the unicast ones
+ - -i, --interface: IPv4 address of the local interface to join the
+   multicast group on
+ - -n, --nack: NACK feedback, the missing packets are NACKed and the progress
+   is reported by periodic cumulative ACKs instead of ACKing every packet
+ - -p, --protocol: highest protocol version supported, 1 (ACK of a single
+   packet) or 2 (ACK with SACK bitmap, default)
+ - -o, --output: output sink, 'file' (coalesced writes, default) or 'mmap'
+   (memory-mapped file)
+ - -q, --queue: number of preallocated buffers of the receive queue, runs
+   the receiver and the writer threads (default 0, single thread)
+ - -d, --daemon: receive the sessions of any number of Clients until
+   <Ctrl c>, each into its own file in the output directory
+ - -t, --timeout: idle time in seconds after which the session of the daemon
+   mode is closed (default 60.0)
+ - -b, --batch: receive the batch of the files of the directory the Client
+   sends and recreate the tree in the output directory
+ - -u, --update: name of the older version of the file, the file is received
+   as the delta against it from the Client started with the same option
+ - -s, --stripes: number of stripes K received by K processes on the ports
+   arg1, ..., arg1 + K - 1 (default 1)
+ - -f, --fec: rebuild the lost packets from the parity packets of the Client
+   started with the same option
+ - -r, --resume: keep the partial file of the interrupted transfer and
+   resume it, the existing file is resumed from its progress file
+ - -l, --listen: IPv4 address the Server listens on (default all), several
+   Servers on the same port of one host listen on different addresses
+ - -k, --seed: seed of the random number generator of the packet loss
+   probability, the same packets are dropped in every run (default unseeded)
+ - -j, --stats: name of the JSON file of the report written on exit, the
+   number of the stripe is inserted before the extension in the striped mode
+ - -e, --metrics: name of the file of the metrics in the Prometheus text
+   format, rewritten every second
+ - -v, --verbose: log the corrupted and repaired packets, and the lost and
+   duplicate packets as well if given twice
 
 
 @version: 1.0
@@ -49,8 +178,32 @@ Execute the program run:
 # Import required Python libraries
 from socket import *
 from random import *
+from collections import OrderedDict
+import getopt
+import multiprocessing
 import sys
 import os
+import time
+from ngtitov_p2mpchecksum import ones_complement_sum
+from ngtitov_p2mpcodec import DATA_PACKET, LAST_DATA_PACKET, HELLO, \
+    FEC_PACKET, LAST_FEC_PACKET, COMPRESSED_PACKET, LAST_COMPRESSED_PACKET, \
+    SIGNATURE, VERSION_1, VERSION_2, HEADER_SIZE, ACK_SIZE, MAX_MSS, \
+    SESSION_ID_SIZE, FEC_HEADER_SIZE, COMPRESSION_HEADER_SIZE, \
+    BLOCK_SIGNATURE, MAX_SIGNATURES, pack_header, unpack_header, \
+    unpack_session, pack_ack, pack_sack, pack_hello, unpack_hello, \
+    pack_nack, unpack_fec_header, unpack_compression_header, \
+    pack_signatures, unpack_signatures, seq_add, seq_diff
+from ngtitov_p2mpcompress import NO_COMPRESSION, CODEC_NAMES, accept
+from ngtitov_p2mpfec import parity_checksum, recover
+from ngtitov_p2mpwriter import PROGRESS_SUFFIX, COALESCE_SIZE, FileWriter, \
+    SharedFileWriter, StreamWriter, read_progress, write_progress, \
+    remove_progress
+from ngtitov_p2mppipeline import ReceivePipeline, kernel_drops
+from ngtitov_p2mpbatch import BatchUnpacker
+from ngtitov_p2mpdelta import MIN_DELTA_BLOCK, MAX_DELTA_BLOCK, Basis, \
+    DeltaPatcher
+from ngtitov_p2mpstats import COUNTER, GAUGE, HISTOGRAM, Histogram, Exporter, \
+    format_metrics, report_values, write_report, stripe_name, create_logger
 
 # P2MP-FTP Stop-and-Wait ARQ protocol for Data Packet is defined:
 """
@@ -77,86 +230,929 @@ import os
 """
 
 # Initialization of constants
-DATA_PACKET = 0b0101010101010101
-LAST_DATA_PACKET = 0b0101010101010111
-ACK = 0b1010101010101010
-HEADER_SIZE = 8
-MAX_MSS = 2048
-USAGE = 'usage: ngtitov_p2mpserver.py arg1 arg2 arg3\n\n        ' \
+# Idle time in seconds after which the NACK feedback is sent
+FEEDBACK_INTERVAL = 0.05
+# Idle time in seconds after which the receiving loop wakes up otherwise
+IDLE_INTERVAL = 0.5
+# Output sinks of the received data
+FILE_OUTPUT = 'file'
+MMAP_OUTPUT = 'mmap'
+# Idle time in seconds after which the session of the daemon mode is closed
+SESSION_TIMEOUT = 60.0
+# Number of the latest payloads kept by the session to rebuild the lost
+# packets with the FEC, at least a receive window and a block of packets
+FEC_HISTORY_SIZE = 1024
+# Metrics of the Server and of every session as tuples of the key of the
+# value, name, type and help text
+SERVER_METRICS = (
+    ('elapsed', 'elapsed_seconds', GAUGE,
+     'Time since the Server started listening'),
+    ('received', 'datagrams_total', COUNTER, 'Datagrams received'),
+    ('dropped', 'dropped_total', COUNTER,
+     'Datagrams dropped by the packet loss probability'),
+    ('kernel_drops', 'kernel_drops_total', COUNTER,
+     'Datagrams dropped by the kernel'),
+    ('max_queue_depth', 'max_queue_depth', GAUGE,
+     'Deepest queue of the receive pipeline'),
+    ('sessions', 'sessions', GAUGE, 'Sessions kept by the Server'))
+SESSION_METRICS = (
+    ('packets', 'session_packets_total', COUNTER,
+     'Valid data packets received'),
+    ('delivered', 'session_delivered_bytes_total', COUNTER,
+     'Bytes of the file received in sequence'),
+    ('goodput', 'session_goodput_bytes_per_second', GAUGE,
+     'Bytes of the file received in sequence per second since the first '
+     'data packet'),
+    ('duplicates', 'session_duplicates_total', COUNTER,
+     'Valid data packets received again'),
+    ('out_of_sequence', 'session_out_of_sequence_total', COUNTER,
+     'Valid data packets received ahead of the next expected one'),
+    ('corrupted', 'session_corrupted_total', COUNTER,
+     'Packets dropped for the checksum or the indicator'),
+    ('repaired', 'session_repaired_total', COUNTER,
+     'Data packets rebuilt from the parity packets'),
+    ('acks', 'session_acks_total', COUNTER, 'ACKs sent'),
+    ('nacks', 'session_nacks_total', COUNTER, 'NACKs sent'),
+    ('buffered', 'session_reorder_buffer_packets', GAUGE,
+     'Out-of-sequence packets in the reorder buffer'),
+    ('recovery', 'session_recovery_seconds', HISTOGRAM,
+     'Time the next expected packet was missing while later ones arrived'))
+USAGE = 'usage: ngtitov_p2mpserver.py [options] arg1 arg2 arg3\n\n        ' \
         'arg1: Port number of the Server to which server is listening\n      ' \
-        '  arg2: Name of the file where the received data is written into\n  ' \
-        '      arg3: Packet loss probability must be in range of [0, 1]'
+        '  arg2: Name of the file where the received data is written into, ' \
+        '\'-\' for the standard output\n  ' \
+        '      arg3: Packet loss probability must be in range of [0, 1]\n' \
+        '\n    options:\n        -w, --window N:        Receive window size ' \
+        'of the Selective Repeat ARQ (default 1)\n        -m, --multicast ' \
+        'GROUP: IPv4 multicast group to join\n        -i, --interface ' \
+        'ADDR:  IPv4 address of the local interface for the multicast ' \
+        'group\n' \
+        '        -n, --nack:            Send NACKs for the missing packets ' \
+        'and periodic cumulative ACKs instead of ACKing every packet\n' \
+        '        -p, --protocol VERSION: Highest protocol version ' \
+        'supported: 1 or 2 (ACK with SACK bitmap, default)\n' \
+        '        -o, --output SINK:     Output sink: \'file\' (coalesced ' \
+        'writes, default) or \'mmap\' (memory-mapped file)\n' \
+        '        -q, --queue N:         Number of preallocated buffers of ' \
+        'the receive queue, runs the receiver and writer threads (default ' \
+        '0, single thread)\n' \
+        '        -d, --daemon:          Receive the sessions of any number ' \
+        'of Clients until <Ctrl c>, arg2 is the output directory\n' \
+        '        -t, --timeout SECONDS: Idle time after which the session ' \
+        'of the daemon is closed (default 60.0)\n' \
+        '        -b, --batch:           Receive the batch of the files of a ' \
+        'directory, arg2 is the output directory\n' \
+        '        -u, --update FILE:     Receive the file as the delta ' \
+        'against its older version FILE\n' \
+        '        -s, --stripes K:       Receive K stripes of the file on ' \
+        'ports arg1, ..., arg1 + K - 1 (default 1)\n' \
+        '        -f, --fec:             Rebuild the lost packets from the ' \
+        'parity packets of the Client\n' \
+        '        -r, --resume:          Keep the partial file and resume ' \
+        'it, the existing file is resumed from its progress file\n' \
+        '        -l, --listen ADDR:     IPv4 address the Server listens on ' \
+        '(default all)\n' \
+        '        -k, --seed N:          Seed of the random number generator ' \
+        'of the packet loss probability (default unseeded)\n' \
+        '        -j, --stats FILE:      Write the report as JSON on exit\n' \
+        '        -e, --metrics FILE:    Export the metrics in the ' \
+        'Prometheus text format every second\n' \
+        '        -v, --verbose:         Log the corrupted and repaired ' \
+        'packets, and the lost ones as well if given twice'
 
 
-def rdt_receive():
+def rdt_receive(file_out, port, progress_name=None):
     """Receives and handles data packets from the P2MP-FTP Client.
 
     It receives the data packet, decides whether it needs to discard or
     process it based on probability value. It contains infinite loop and the
     only way to stop it is Keyboard Interrupt - <Ctrl c>.
+
+    The HELLO of the Client is answered with the agreed protocol version,
+    which selects the format of the ACKs sent afterwards. With the NACK
+    feedback the Server reports its progress and the missing ranges
+    whenever no packet arrives for the feedback interval. Receiving the
+    stripes, the data is written from the offset of the stripe in the file
+    offered by the HELLO. Holding the older version of the file, the HELLO
+    offering the delta is answered with the size of the older version, and
+    the requests of the signatures with the signatures of its blocks.
+
+    Resuming the transfers, the progress recorded by the previous run is
+    picked up and the progress of the incomplete transfer is recorded once
+    the Server is interrupted, after the pending payloads are written.
+
+    The metrics are exported while the Server runs and the report is written
+    on exit, if their files are given.
+
+    Args:
+        file_out: writer of the output file
+        port: port number the Server is listening to
+        progress_name: name of the progress file, None unless the transfers
+                       are resumed
+
+    Returns:
+        True if the file is received completely
     """
+    global received, dropped
     server_socket = socket(AF_INET, SOCK_DGRAM)
-    file_out = open(file_name, 'wb')
+    session = Session(0, file_out)
+    if progress_name is not None:
+        progress = read_progress(progress_name)
+        if progress is not None:
+            session.range_offset, session.file_offset = progress
+            file_out.resume(session.file_offset)
+            print 'Progress = {} bytes from offset {}'.format(
+                session.file_offset - session.range_offset,
+                session.range_offset)
+    pipeline = None
+    exporter = None
     try:
-        server_socket.bind(('', server_port))
-        seq_number = 0
+        bind_socket(server_socket, port)
+        start_listening()
+        if metrics_name is not None:
+            # The session is replaced when the transfer starts over
+            exporter = Exporter(metrics_name, lambda: collect_metrics(
+                server_socket, pipeline, [session], port))
+        # With the NACK feedback wake up for the feedback when no packet
+        # arrives
+        pipeline = ReceivePipeline(server_socket, queue_size,
+                                   FEEDBACK_INTERVAL if nack else
+                                   IDLE_INTERVAL)
         print 'P2MP-FTP Server is initialized and listing ...'
-        receive = True
-        while receive:
-            datagram, client_address = server_socket.recvfrom(MAX_MSS)
+        while not session.complete:
+            recv_buffer, nbytes, client_address = pipeline.receive()
+            if recv_buffer is None:
+                # Idle timer: report the progress and the missing ranges
+                if nack and session.client_address is not None:
+                    send_feedback(server_socket, session)
+                continue
+            received = received + 1
             random_number = random()
             # Discard (r <= p) or process received packet (r > p)
-            if probability < random_number:
-                # Process the data packet
-                header = datagram[:HEADER_SIZE]
-                payload = datagram[HEADER_SIZE:]
-                # Do validation on checksum, data indicator and sequence number
-                rcv_seq_number = validation(header, payload, seq_number)
-                # Received packet is in-sequence
-                if rcv_seq_number is not None and rcv_seq_number == seq_number:
-                    # Construct the ACK and send it back to the client
-                    ack_packet = ack_encapsulation(rcv_seq_number)
-                    server_socket.sendto(ack_packet, client_address)
-                    # Write payload to the file
-                    file_out.write(payload)
-                    # Compute next expected sequence number
-                    seq_number = seq_number + len(header) + len(payload)
-                    if seq_number > 0xffffffff:
-                        seq_number = seq_number - 0xffffffff
-                    # Check if this is the last packet in sequence
-                    if int(header[6:8].encode('hex'), 16) == LAST_DATA_PACKET:
-                        receive = False
-                # Received packet is out-of-sequence
-                elif rcv_seq_number is not None:
-                    # Construct the ACK and send it back to the client
-                    if rcv_seq_number < seq_number:
-                        ack_packet = ack_encapsulation(rcv_seq_number)
-                    else:
-                        # ACK for the last received in-sequence packet
-                        ack_packet = ack_encapsulation(seq_number)
-                    server_socket.sendto(ack_packet, client_address)
+            if probability >= random_number:
+                dropped = dropped + 1
+                continue
+            if nbytes < HEADER_SIZE:
+                continue
+            session.client_address = client_address
+            rcv_seq_number, rcv_checksum, rcv_indicator = unpack_header(
+                recv_buffer)
+            if rcv_indicator == HELLO:
+                try:
+                    version, session_id, offset, codec, query, delta = \
+                        unpack_hello(buffer(recv_buffer, 0, nbytes))
+                except ValueError:
+                    continue
+                delta = delta and basis is not None
+                if resume:
+                    session, offset = resume_session(session, session_id,
+                                                     offset, query)
+                elif delta:
+                    # The offset is the block size the older version is
+                    # signed by
+                    if offset is None or \
+                            not MIN_DELTA_BLOCK <= offset <= MAX_DELTA_BLOCK:
+                        continue
+                    basis.sign(offset)
+                    offset = basis.size
+                elif stripes == 1:
+                    offset = None
+                elif offset is not None and \
+                        session.last_seq_number is None:
+                    session.file_offset = offset
+                session.version, session.codec = negotiate(
+                    server_socket, version, client_address, offset=offset,
+                    codec=codec, resume=resume and query, delta=delta)
+                continue
+            if rcv_indicator == SIGNATURE:
+                if basis is not None:
+                    send_signatures(server_socket,
+                                    buffer(recv_buffer, 0, nbytes),
+                                    client_address)
+                continue
+            receive_packet(server_socket, pipeline, session,
+                           buffer(recv_buffer, 0, nbytes))
         print 'Complete!'
     except error, (value, message):
         print 'Exception while creating and binding RFC Server socket:'
         print message
     except KeyboardInterrupt:
         print 'Not completed. Goodbye!'
-    file_out.close()
+    if pipeline is not None:
+        pipeline.close()
+    session.file_out.close()
+    if progress_name is not None:
+        if session.complete:
+            remove_progress(progress_name)
+        elif session.range_offset is not None:
+            write_progress(progress_name, session.range_offset,
+                           session.file_offset)
+            print 'Progress = {} bytes from offset {}'.format(
+                session.file_offset - session.range_offset,
+                session.range_offset)
+    finish(server_socket, pipeline, [session], port, exporter)
+    server_socket.close()
+    return session.complete
+
+
+def open_stream(file_name):
+    """Opens the output stream the file is written into.
+
+    The standard output is taken over by the file, so the messages of the
+    Server are redirected to the standard error.
+
+    Args:
+        file_name: '-' for the standard output, or the name of the named pipe
+
+    Returns:
+        File object of the output stream
+    """
+    if file_name != '-':
+        return open(file_name, 'wb', COALESCE_SIZE)
+    file_out = os.fdopen(os.dup(sys.stdout.fileno()), 'wb', COALESCE_SIZE)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    return file_out
+
+
+def start_listening():
+    """Records the time when the Server started listening."""
+    global listen_start
+    listen_start = time.time()
+
+
+def finish(server_socket, pipeline, sessions, port, exporter):
+    """Exports the final metrics and writes the report, if their files are
+    given.
+
+    Args:
+        server_socket: UDP socket of the Server
+        pipeline: receive pipeline of the Server, None if it is not created
+        sessions: sessions of the Server
+        port: port number the Server is listening to
+        exporter: exporter of the metrics, None if they are not exported
+    """
+    if exporter is not None:
+        exporter.close()
+    if stats_name is not None:
+        write_report(stats_name, server_report(server_socket, pipeline,
+                                               sessions, port))
+
+
+def server_values(server_socket, pipeline, sessions):
+    """Collects the values of the metrics of the Server.
+
+    Args:
+        server_socket: UDP socket of the Server
+        pipeline: receive pipeline of the Server, None if it is not created
+        sessions: sessions of the Server
+
+    Returns:
+        Dictionary of the values as key -> number or None
+    """
+    return OrderedDict([
+        ('elapsed', time.time() - listen_start if listen_start else None),
+        ('received', received), ('dropped', dropped),
+        ('kernel_drops', kernel_drops(server_socket)),
+        ('max_queue_depth', pipeline.max_depth if pipeline is not None and
+         queue_size else None),
+        ('sessions', len(sessions))])
+
+
+def collect_metrics(server_socket, pipeline, sessions, port):
+    """Collects the metrics of the Server and of every session in the
+    Prometheus text format.
+
+    Args:
+        server_socket: UDP socket of the Server
+        pipeline: receive pipeline of the Server, None if it is not created
+        sessions: sessions of the Server
+        port: port number the Server is listening to
+
+    Returns:
+        Metrics as text
+    """
+    labels = [('port', port)]
+    return format_metrics(
+        'p2mp_server_', SERVER_METRICS,
+        [(labels, server_values(server_socket, pipeline, sessions))]) + \
+        format_metrics('p2mp_server_', SESSION_METRICS,
+                       [(labels + session.labels(), session.values())
+                        for session in sessions])
+
+
+def server_report(server_socket, pipeline, sessions, port):
+    """Builds the report of the Server and of every session.
+
+    Args:
+        server_socket: UDP socket of the Server
+        pipeline: receive pipeline of the Server, None if it is not created
+        sessions: sessions of the Server
+        port: port number the Server is listening to
+
+    Returns:
+        Dictionary of the report
+    """
+    report = OrderedDict([
+        ('output', directory if daemon or batch else file_name),
+        ('port', port),
+        ('probability', probability), ('window', window_size),
+        ('multicast', multicast_group), ('nack', nack), ('fec', fec),
+        ('resume', resume), ('update', update_name)])
+    report.update(server_values(server_socket, pipeline, sessions))
+    report['sessions'] = [
+        OrderedDict(session.labels() + report_values(
+            session.values()).items()) for session in sessions]
+    return report
+
+
+def resume_session(session, session_id, offset, query):
+    """Handles the HELLO of the P2MP-FTP Client resuming the transfer.
+
+    The HELLO asking where to resume the range of the file from the offered
+    offset is answered with the end of the range received in sequence, if
+    the progress is of the same range, or with the offered offset
+    otherwise. The HELLO of the Client that offers a session ID of its own
+    starts the transfer over from the offered offset, which continues the
+    progress if it is not beyond it. The HELLO offering no offset starts
+    from the beginning of the file.
+
+    Args:
+        session: current session of the transfer
+        session_id: session ID offered by the Client
+        offset: offset in the file offered by the Client, None if there is
+                none
+        query: True if the HELLO asks where to resume
+
+    Returns:
+        Tuple of the session of the transfer and the offset in the file the
+        HELLO is answered with, None for the HELLO without the offset
+    """
+    first = offset or 0
+    if query:
+        if session.range_offset == first:
+            return session, session.file_offset
+        return session, first
+    if session.last_seq_number is not None and \
+            session.client_session_id == session_id:
+        return session, offset
+    range_offset = session.range_offset
+    if range_offset is None or not range_offset <= first <= \
+            session.file_offset:
+        range_offset = first
+    session = Session(0, session.file_out)
+    session.range_offset = range_offset
+    session.file_offset = first
+    session.client_session_id = session_id
+    return session, offset
+
+
+def rdt_receive_striped():
+    """Receives the stripes of the file from the P2MP-FTP Client in a pool
+    of worker processes.
+
+    Every stripe is received by its own process listening to the port
+    following the well-known one by the number of the stripe, and written
+    into the same output file from the offset of the stripe. Once all
+    processes are done, the file is truncated to the farthest end of the
+    data written.
+    """
+    # The partial file is kept when resuming the stripes
+    open(file_name, 'ab' if resume else 'wb').close()
+    lock = multiprocessing.Lock()
+    end = multiprocessing.Value('l', 0)
+    workers = [multiprocessing.Process(target=receive_stripe,
+                                       args=(stripe, lock, end))
+               for stripe in range(stripes)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        # Every worker gets the <Ctrl c> as well
+        for worker in workers:
+            worker.join()
+    with open(file_name, 'r+b') as file_out:
+        file_out.truncate(end.value)
+    print 'Stripes received = {} of {}, file size = {}'.format(
+        sum(1 for worker in workers if worker.exitcode == 0), stripes,
+        end.value)
+
+
+def receive_stripe(stripe, lock, end):
+    """Receives a stripe of the file (worker process).
+
+    The process exits with 0 if the stripe is received completely, with 1
+    otherwise.
+
+    Args:
+        stripe: number of the stripe
+        lock: lock of the processes writing the output file
+        end: shared value of the farthest end of the data written
+    """
+    global stats_name, metrics_name
+    # The processes drop different packets
+    seed(None if loss_seed is None else loss_seed + stripe)
+    if stats_name is not None:
+        stats_name = stripe_name(stats_name, stripe)
+    if metrics_name is not None:
+        metrics_name = stripe_name(metrics_name, stripe)
+    progress_name = None
+    if resume:
+        progress_name = '{}.{}{}'.format(file_name, stripe, PROGRESS_SUFFIX)
+    if not rdt_receive(SharedFileWriter(file_name, lock, end),
+                       server_port + stripe, progress_name):
+        sys.exit(1)
+
+
+def rdt_receive_daemon():
+    """Receives and handles data packets of the sessions of any number of
+    P2MP-FTP Clients on the same port.
+
+    The HELLO with the session ID opens the session, which writes its own
+    file in the output directory. The data packets are preceded by the
+    session ID and processed by the session they belong to, the packets of
+    an unknown session are dropped. The complete session closes its file,
+    but keeps answering the duplicate packets until it stays idle for the
+    session timeout. The incomplete session is closed after the session
+    timeout as well, leaving the partial file. It runs until Keyboard
+    Interrupt - <Ctrl c>. The metrics and the report cover the sessions that
+    are not closed yet.
+    """
+    global received, dropped
+    server_socket = socket(AF_INET, SOCK_DGRAM)
+    # Open sessions as session ID -> Session
+    sessions = {}
+    pipeline = None
+    exporter = None
+    try:
+        bind_socket(server_socket, server_port)
+        start_listening()
+        if metrics_name is not None:
+            exporter = Exporter(metrics_name, lambda: collect_metrics(
+                server_socket, pipeline, sessions.values(), server_port))
+        interval = FEEDBACK_INTERVAL if nack else IDLE_INTERVAL
+        pipeline = ReceivePipeline(server_socket, queue_size, interval)
+        print 'P2MP-FTP Server daemon is initialized and listing ...'
+        next_check = time.time() + interval
+        while True:
+            recv_buffer, nbytes, client_address = pipeline.receive()
+            now = time.time()
+            if recv_buffer is not None:
+                received = received + 1
+                # Only the received packets draw the random numbers, so
+                # the seed drops the same packets whenever the idle timer
+                # wakes up
+                random_number = random()
+            # Discard (r <= p) or process received packet (r > p)
+            if recv_buffer is not None and probability >= random_number:
+                dropped = dropped + 1
+            elif recv_buffer is not None:
+                if nbytes == ACK_SIZE:
+                    if unpack_header(recv_buffer)[2] == HELLO:
+                        rcv_version, rcv_session_id, offset, rcv_codec, \
+                            query, delta = unpack_hello(buffer(recv_buffer, 0,
+                                                               nbytes))
+                        open_session(server_socket, sessions, rcv_session_id,
+                                     rcv_version, rcv_codec, client_address,
+                                     now)
+                elif nbytes >= SESSION_ID_SIZE + HEADER_SIZE:
+                    session = sessions.get(unpack_session(recv_buffer))
+                    if session is not None:
+                        session.client_address = client_address
+                        session.last_active = now
+                        receive_packet(server_socket, pipeline, session,
+                                       buffer(recv_buffer, SESSION_ID_SIZE,
+                                              nbytes - SESSION_ID_SIZE))
+                        if session.complete and session.file_out is not None:
+                            pipeline.close_file(session.file_out)
+                            session.file_out = None
+                            print 'Session {:08x} complete!'.format(
+                                session.session_id)
+            if now >= next_check:
+                check_sessions(server_socket, pipeline, sessions, now)
+                next_check = now + interval
+    except error, (value, message):
+        print 'Exception while creating and binding RFC Server socket:'
+        print message
+    except KeyboardInterrupt:
+        print 'Goodbye!'
+    if pipeline is not None:
+        pipeline.close()
+    for session in sessions.itervalues():
+        if session.file_out is not None:
+            session.file_out.close()
+    finish(server_socket, pipeline, sessions.values(), server_port, exporter)
     server_socket.close()
-    del server_socket
 
 
-def validation(header, payload, seq_number):
+def open_session(server_socket, sessions, session_id, version, codec,
+                 client_address, now):
+    """Opens the session the HELLO of the P2MP-FTP Client asks for and
+    answers the HELLO.
+
+    The file of the session, or its directory in the batch mode, is named
+    after the address of the Client and the session ID. The session is
+    refused if the file already exists or cannot be created, and the HELLO
+    without the session ID is ignored, so the Client falls back to the
+    version 1 and does not reach the daemon. The HELLO of the open session
+    is answered again.
+
+    Args:
+        server_socket: UDP socket of the Server
+        sessions: open sessions as session ID -> Session
+        session_id: session ID offered by the Client
+        version: highest protocol version offered by the Client
+        codec: codec of the compression offered by the Client
+        client_address: address of the P2MP-FTP Client
+        now: current time
+    """
+    session = sessions.get(session_id)
+    if session is None:
+        if not session_id:
+            print 'HELLO without session ID, dropping it'
+            return
+        session_name = os.path.join(directory, '{}_{:08x}'.format(
+            client_address[0], session_id))
+        if os.path.exists(session_name):
+            print 'Exception: \'{}\' file already exists, session ' \
+                  'refused'.format(session_name)
+            return
+        try:
+            if batch:
+                os.mkdir(session_name)
+                file_out = StreamWriter(BatchUnpacker(session_name))
+            else:
+                file_out = FileWriter(session_name,
+                                      use_mmap=output == MMAP_OUTPUT)
+        except (IOError, OSError), e:
+            print 'Exception: {}, session refused'.format(e)
+            return
+        session = Session(session_id, file_out)
+        sessions[session_id] = session
+        print 'Session {:08x} of {} is opened, file \'{}\''.format(
+            session_id, client_address[0], session_name)
+    session.client_address = client_address
+    session.last_active = now
+    session.version, session.codec = negotiate(
+        server_socket, version, client_address, session_id, codec=codec)
+
+
+def check_sessions(server_socket, pipeline, sessions, now):
+    """Closes the sessions idle for the session timeout and sends the NACK
+    feedback of the idle sessions.
+
+    Args:
+        server_socket: UDP socket of the Server
+        pipeline: receive pipeline of the Server
+        sessions: open sessions as session ID -> Session
+        now: current time
+    """
+    for session_id, session in sessions.items():
+        idle = now - session.last_active
+        if idle >= session_timeout:
+            if session.file_out is not None:
+                pipeline.close_file(session.file_out)
+                session.file_out = None
+                print 'Session {:08x} timed out, not completed'.format(
+                    session_id)
+            del sessions[session_id]
+        elif nack and not session.complete and idle >= FEEDBACK_INTERVAL \
+                and session.client_address is not None:
+            send_feedback(server_socket, session)
+
+
+def receive_packet(server_socket, pipeline, session, datagram):
+    """Processes the data packet of the session with the ACK or the NACK
+    feedback, or the parity packet with the FEC.
+
+    Args:
+        server_socket: UDP socket of the Server
+        pipeline: receive pipeline of the Server
+        session: session the data packet belongs to
+        datagram: data packet without the session ID (buffer)
+    """
+    if session.first_active is None:
+        session.first_active = time.time()
+    if fec and len(datagram) >= FEC_HEADER_SIZE and \
+            unpack_header(datagram)[2] in (FEC_PACKET, LAST_FEC_PACKET):
+        receive_parity(server_socket, pipeline, session, datagram)
+    elif nack:
+        receive_packet_nack(server_socket, pipeline, session, datagram)
+    else:
+        receive_packet_ack(server_socket, pipeline, session, datagram)
+
+
+def receive_parity(server_socket, pipeline, session, datagram):
+    """Rebuilds the lost data packet from the parity packet.
+
+    The parity packet covers every R-th packet of the block starting from
+    its index. If exactly one of them is not received yet, while the others
+    are still kept by the session, the missing payload is the XOR of the
+    parity and the other payloads. The data packet is rebuilt with its
+    checksum and processed as if it was received. Corrupted parity packets
+    and the ones that repair nothing are ignored.
+
+    Args:
+        server_socket: UDP socket of the Server
+        pipeline: receive pipeline of the Server
+        session: session the parity packet belongs to
+        datagram: parity packet without the session ID (buffer)
+    """
+    (seq_number, rcv_checksum, rcv_indicator, index, count, block_size,
+     segment_size, length) = unpack_fec_header(datagram)
+    parity = buffer(datagram, FEC_HEADER_SIZE)
+    if parity_checksum(seq_number, rcv_indicator, index, count, block_size,
+                       segment_size, length, parity) != rcv_checksum:
+        session.corrupted = session.corrupted + 1
+        logger.info('Parity packet is corrupted, dropping it')
+        return
+    members = []
+    for i in range(index, block_size, max(count, 1)):
+        members.append(seq_add(seq_number, i * segment_size))
+    missing = [rcv_seq_number for rcv_seq_number in members
+               if rcv_seq_number not in session.history]
+    # The packets before the next expected one are written already
+    if len(missing) != 1 or seq_diff(missing[0], session.seq_number) < 0:
+        return
+    rcv_seq_number = missing[0]
+    payload = recover(parity, length, [session.history[member]
+                                       for member in members
+                                       if member != rcv_seq_number])
+    if payload is None or HEADER_SIZE + len(payload) > MAX_MSS:
+        return
+    if rcv_indicator == LAST_FEC_PACKET and \
+            rcv_seq_number == members[-1] and index == \
+            (block_size - 1) % max(count, 1):
+        indicator = LAST_DATA_PACKET
+    else:
+        indicator = DATA_PACKET
+    # The checksum of the data packet covers the data packet indicator
+    checksum = ones_complement_sum(
+        payload, (rcv_seq_number & 0xffff) + (rcv_seq_number >> 16) +
+        DATA_PACKET)
+    # The writer thread may hold the payload, so the rebuilt packet gets its
+    # own buffer
+    repair_packet = bytearray(HEADER_SIZE + len(payload))
+    pack_header(repair_packet, rcv_seq_number, ~checksum & 0xffff, indicator)
+    repair_packet[HEADER_SIZE:] = payload
+    session.repaired = session.repaired + 1
+    logger.info('FEC, sequence number = %d', rcv_seq_number)
+    receive_packet(server_socket, pipeline, session, buffer(repair_packet))
+
+
+def receive_packet_ack(server_socket, pipeline, session, datagram):
+    """Validates the data packet, writes its payload to the file and ACKs it.
+
+    With the receive window greater than 1 (Selective Repeat), every valid
+    packet is ACKed individually. Out-of-sequence packets within the window
+    are written to the file at their offsets and recorded in the reorder
+    buffer, which the in-sequence run of packets is skipped over as soon as
+    the gap before it is filled.
+
+    Args:
+        server_socket: UDP socket of the Server
+        pipeline: receive pipeline of the Server
+        session: session the data packet belongs to
+        datagram: data packet without the session ID (buffer)
+    """
+    nbytes = len(datagram)
+    rcv_seq_number, rcv_checksum, rcv_indicator = unpack_header(datagram)
+    payload = buffer(datagram, HEADER_SIZE, nbytes - HEADER_SIZE)
+    # Do validation on checksum, data indicator and sequence number
+    rcv_seq_number = validation(rcv_seq_number, rcv_checksum, rcv_indicator,
+                                payload, session)
+    if rcv_seq_number is None:
+        return
+    if fec:
+        session.remember(rcv_seq_number, payload)
+    block = session.measure(rcv_indicator, payload)
+    if block is None:
+        return
+    size, span, codec = block
+    # Received packet is in-sequence
+    if rcv_seq_number == session.seq_number:
+        if session.version == VERSION_1:
+            # Construct the ACK and send it back to the client
+            send_ack(server_socket, session,
+                     ack_encapsulation(rcv_seq_number))
+        # Write payload to the file and skip the in-sequence run of buffered
+        # packets that follows it
+        pipeline.write(session.file_out, session.file_offset, payload, codec)
+        session.advance(rcv_indicator, size, span)
+        if session.version == VERSION_2:
+            # The ACK of version 2 reports the packets written
+            send_ack(server_socket, session, sack_encapsulation(
+                session.seq_number, session.reorder_buffer,
+                session.segment_size))
+        return
+    # Received packet is out-of-sequence, construct the ACK and send it back
+    # to the client
+    if seq_diff(rcv_seq_number, session.seq_number) < 0:
+        ack_packet = ack_encapsulation(rcv_seq_number)
+    elif window_size > 1:
+        # Selective Repeat: buffer the packet if it is within the receive
+        # window and ACK it individually
+        if rcv_seq_number not in session.reorder_buffer:
+            if len(session.reorder_buffer) >= window_size - 1 or \
+                    session.beyond_window(rcv_seq_number):
+                return
+            session.reorder_buffer[rcv_seq_number] = (rcv_indicator, size,
+                                                      span)
+            pipeline.write(session.file_out, session.payload_offset(
+                rcv_seq_number), payload, codec)
+        ack_packet = ack_encapsulation(rcv_seq_number)
+    elif session.last_seq_number is not None:
+        # ACK for the last received in-sequence packet, the ACK is
+        # cumulative for the Go-Back-N client
+        ack_packet = ack_encapsulation(session.last_seq_number)
+    else:
+        # Nothing is received in-sequence yet
+        return
+    if session.version == VERSION_2:
+        ack_packet = sack_encapsulation(
+            session.seq_number, session.reorder_buffer, session.segment_size)
+    send_ack(server_socket, session, ack_packet)
+
+
+def receive_packet_nack(server_socket, pipeline, session, datagram):
+    """Validates the data packet and writes its payload to the file with the
+    NACK feedback.
+
+    The data packets are processed the same way as in receive_packet_ack(),
+    but the Server stays silent while the packets arrive in sequence. It
+    sends:
+     - NACK with the missing ranges as soon as a new gap in the sequence
+       numbers is detected, unless the FEC may still repair it, and
+       whenever no packet arrives for the feedback interval while the gap
+       is not filled
+     - cumulative ACK of the last in-sequence packet (or NACK, while a gap
+       is not filled) after every half of the receive window of packets
+       received, for the last packet, for a duplicate packet and whenever
+       no packet arrives for the feedback interval
+
+    Args:
+        server_socket: UDP socket of the Server
+        pipeline: receive pipeline of the Server
+        session: session the data packet belongs to
+        datagram: data packet without the session ID (buffer)
+    """
+    nbytes = len(datagram)
+    rcv_seq_number, rcv_checksum, rcv_indicator = unpack_header(datagram)
+    payload = buffer(datagram, HEADER_SIZE, nbytes - HEADER_SIZE)
+    rcv_seq_number = validation(rcv_seq_number, rcv_checksum, rcv_indicator,
+                                payload, session)
+    if rcv_seq_number is None:
+        return
+    if fec:
+        session.remember(rcv_seq_number, payload)
+    block = session.measure(rcv_indicator, payload)
+    if block is None:
+        return
+    size, span, codec = block
+    # Received packet is in-sequence
+    if rcv_seq_number == session.seq_number:
+        pipeline.write(session.file_out, session.file_offset, payload, codec)
+        session.advance(rcv_indicator, size, span)
+        if session.complete or \
+                session.unreported >= max(1, window_size // 2):
+            send_feedback(server_socket, session)
+    # Received packet is already written, the feedback was lost
+    elif seq_diff(rcv_seq_number, session.seq_number) < 0:
+        send_feedback(server_socket, session)
+    # Received packet is out-of-sequence
+    else:
+        if window_size > 1:
+            # Ignore the packet beyond the receive window
+            if session.beyond_window(rcv_seq_number):
+                return
+            if rcv_seq_number not in session.reorder_buffer and \
+                    len(session.reorder_buffer) < window_size - 1:
+                session.reorder_buffer[rcv_seq_number] = (rcv_indicator,
+                                                          size, span)
+                pipeline.write(session.file_out, session.payload_offset(
+                    rcv_seq_number), payload, codec)
+                session.unreported = session.unreported + 1
+        new_gap = seq_diff(rcv_seq_number, session.highest_seq_number) > 0
+        session.receive_through(seq_add(rcv_seq_number,
+                                        span * HEADER_SIZE + size))
+        if new_gap and not fec or \
+                session.unreported >= max(1, window_size // 2):
+            send_feedback(server_socket, session)
+
+
+def send_feedback(server_socket, session):
+    """Sends the NACK feedback to the P2MP-FTP Client.
+
+    Sends NACK with the missing ranges if there are any, otherwise the
+    cumulative ACK of the last in-sequence packet if there is one. The
+    missing ranges of the NACK are followed by the empty range at the
+    sequence number following the highest received packet.
+
+    Args:
+        server_socket: UDP socket of the Server
+        session: session of the P2MP-FTP Client
+    """
+    session.unreported = 0
+    ranges = missing_ranges(session.seq_number, session.reorder_buffer,
+                            session.highest_seq_number)
+    if ranges:
+        # The empty range marks the end of the received sequence numbers
+        ranges.append((session.highest_seq_number,
+                       session.highest_seq_number))
+        size = pack_nack(feedback_packet, session.seq_number, ranges)
+        server_socket.sendto(buffer(feedback_packet, 0, size),
+                             session.client_address)
+        session.nacks = session.nacks + 1
+    elif session.last_seq_number is not None and \
+            session.version == VERSION_2:
+        send_ack(server_socket, session, sack_encapsulation(
+            session.seq_number, session.reorder_buffer,
+            session.segment_size))
+    elif session.last_seq_number is not None:
+        send_ack(server_socket, session,
+                 ack_encapsulation(session.last_seq_number))
+
+
+def send_ack(server_socket, session, ack):
+    """Sends the ACK to the P2MP-FTP Client of the session.
+
+    Args:
+        server_socket: UDP socket of the Server
+        session: session of the P2MP-FTP Client
+        ack: ACK packet
+    """
+    server_socket.sendto(ack, session.client_address)
+    session.acks = session.acks + 1
+
+
+def missing_ranges(seq_number, reorder_buffer, highest_seq_number):
+    """Finds the ranges of the sequence numbers that are not received yet.
+
+    Args:
+        seq_number: next expected sequence number
+        reorder_buffer: out-of-sequence packets as sequence number ->
+                        (indicator, size of the data, number of segments)
+        highest_seq_number: sequence number following the highest received
+                            packet
+
+    Returns:
+        List of missing ranges as tuples of the first missing sequence
+        number and the sequence number following the range
+    """
+    ranges = []
+    # The sequence numbers are ordered by the distance from the next
+    # expected one, which keeps the order across the wrap
+    for rcv_seq_number in sorted(
+            reorder_buffer, key=lambda key: seq_diff(key, seq_number)):
+        if seq_diff(rcv_seq_number, seq_number) > 0:
+            ranges.append((seq_number, rcv_seq_number))
+        indicator, size, span = reorder_buffer[rcv_seq_number]
+        seq_number = seq_add(rcv_seq_number, span * HEADER_SIZE + size)
+    if seq_diff(highest_seq_number, seq_number) > 0:
+        ranges.append((seq_number, highest_seq_number))
+    return ranges
+
+
+def bind_socket(server_socket, port):
+    """Binds the socket of the Server to the port on the listen address.
+
+    The socket joins the multicast group as well, if any is given, to
+    receive the data packets sent to the group. As the multicast Server
+    listens on all addresses, the port is bound with the address reuse, so
+    that several multicast Servers can run on one host.
+
+    Args:
+        server_socket: UDP socket of the Server
+        port: port number the Server is listening to
+    """
+    if multicast_group is not None:
+        server_socket.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+    server_socket.bind((listen_address, port))
+    if multicast_group is not None:
+        membership = inet_aton(multicast_group) + \
+            inet_aton(multicast_interface or '0.0.0.0')
+        server_socket.setsockopt(IPPROTO_IP, IP_ADD_MEMBERSHIP, membership)
+
+
+def validation(rcv_seq_number, rcv_checksum, rcv_indicator, payload,
+               session):
     """Performs validation on the received packet.
 
-    It extracts sequence number, checksum and indicator from the header of
-    the received data packet and performs validation on each field to ensure
-    this is expected data packet.
+    It takes sequence number, checksum and indicator unpacked from the header
+    of the received data packet and performs validation on each field to
+    ensure this is expected data packet. The packet is counted by the
+    session as corrupted, duplicate or out-of-sequence. The first
+    out-of-sequence packet ahead of the next expected one starts the time of
+    the recovery of the missing packet.
 
     Args:
-        header: the header of the datagram - 64 bits (8 bytes)
+        rcv_seq_number: sequence number of the received data packet
+        rcv_checksum: checksum of the received data packet
+        rcv_indicator: data packet indicator of the received data packet
         payload: payload that needs to be written into the file
-        seq_number: expected sequence number to verify in-sequence order
+        session: session the data packet belongs to, with the expected
+                 sequence number to verify in-sequence order
 
     Returns:
         - ACK number for the received packet
@@ -165,100 +1161,606 @@ def validation(header, payload, seq_number):
         - None
           If validation fails (checksum or not P2MP-FTP protocol)
     """
-    rcv_seq_number = int(header[:4].encode('hex'), 16)
-    rcv_checksum = int(header[4:6].encode('hex'), 16)
-    rcv_indicator = int(header[6:8].encode('hex'), 16)
-    # Split 32-bit sequence number into two 16-bit numbers
-    # Initialize checksum with right-most 16 bits of sequence number
-    checksum = rcv_seq_number & 0xffff
-    rcv_seq_num_left_bits = rcv_seq_number >> 16
-    # Add checksum with left-most 16 bits of sequence number, received
-    # checksum and data packet indicator
-    checksum = wrap_around(checksum, rcv_seq_num_left_bits)
-    checksum = wrap_around(checksum, rcv_checksum)
-    checksum = wrap_around(checksum, DATA_PACKET)
-    # Add received payload (file content) into checksum
-    for i in range(0, len(payload), 2):
-        try:
-            word = ord(payload[i]) + (ord(payload[i + 1]) << 8)
-        except IndexError:
-            word = ord(payload[i]) + (0 << 8)
-        checksum = wrap_around(checksum, word)
-    # Validate each field
-    try:
-        assert rcv_indicator in [DATA_PACKET, LAST_DATA_PACKET], \
-            'Packet dropped, not a data packet'
-        assert checksum == 0xffff, \
-            'Packet is corrupted, dropping it [checksum = {}]'.format(
-                bin(checksum).lstrip('-0b').zfill(16))
-    except AssertionError, _e:
-        print _e
+    # Split 32-bit sequence number into two 16-bit numbers and add them with
+    # received checksum, data packet indicator and received payload (file
+    # content) words
+    checksum = ones_complement_sum(
+        payload, (rcv_seq_number & 0xffff) + (rcv_seq_number >> 16) +
+        rcv_checksum + DATA_PACKET)
+    # Validate each field, the messages are formatted only if they are
+    # logged
+    if rcv_indicator not in (DATA_PACKET, LAST_DATA_PACKET,
+                             COMPRESSED_PACKET, LAST_COMPRESSED_PACKET):
+        session.corrupted = session.corrupted + 1
+        logger.info('Packet dropped, not a data packet')
         return None
-    try:
-        assert seq_number == rcv_seq_number, \
-            'Packet loss, sequence number = {}'.format(rcv_seq_number)
-    except AssertionError, _e:
+    if checksum != 0xffff:
+        session.corrupted = session.corrupted + 1
+        logger.info('Packet is corrupted, dropping it [checksum = %s]',
+                    bin(checksum).lstrip('-0b').zfill(16))
+        return None
+    session.packets = session.packets + 1
+    distance = seq_diff(rcv_seq_number, session.seq_number)
+    if distance < 0:
+        session.duplicates = session.duplicates + 1
+        logger.debug('Duplicate packet, sequence number = %d',
+                     rcv_seq_number)
+    elif distance > 0:
         # The packet is out-of-sequence
-        print _e
+        session.out_of_sequence = session.out_of_sequence + 1
+        if session.missing_since is None:
+            session.missing_since = time.time()
+        logger.debug('Packet loss, sequence number = %d', rcv_seq_number)
     # Return ACK for the last received in-sequence packet
     return rcv_seq_number
 
 
-def wrap_around(a, b):
-    """Performs wrap around on two 16-bit words if overflow occurs.
+def ack_encapsulation(seq_number):
+    """Encapsulates data into ACK packet that will be sent to P2MP-FTP Client.
+
+    The ACK packet is packed into the same preallocated buffer every time.
 
     Args:
-        a: first 16-bit word
-        b: second 16-bit word
+        seq_number: ACKed sequence number
 
     Returns:
-        Result of the wrap around, a new 16-bit word
+        ACK packet ready to send back to P2MP-FTP Client
     """
-    checksum = a + b
-    return (checksum & 0xffff) + (checksum >> 16)
+    pack_ack(ack_packet, seq_number)
+    return ack_packet
 
 
-def ack_encapsulation(seq_number):
-    """Encapsulates data into ACK packet that will be sent to P2MP-FTP Client.
+def sack_encapsulation(seq_number, reorder_buffer, segment_size):
+    """Encapsulates data into ACK packet of version 2 that will be sent to
+    P2MP-FTP Client.
+
+    The bit of the SACK bitmap is set for every packet of the reorder buffer
+    at a whole number of segments past the next expected sequence number.
+    The ACK packet is packed into the same preallocated buffer every time.
 
     Args:
-        seq_number: ACKed sequence number
+        seq_number: next expected sequence number
+        reorder_buffer: out-of-sequence packets as sequence number ->
+                        (indicator, size of the data, number of segments)
+        segment_size: size of the datagrams but the last one, i.e. the MSS
+                      of the Client
 
     Returns:
         ACK packet ready to send back to P2MP-FTP Client
     """
-    seq_number_hex = hex(seq_number).lstrip('-0x').zfill(8)
-    seq_number_hex = seq_number_hex.decode('hex')
-    zero_field_hex = hex(0).lstrip('-0x').zfill(4)
-    zero_field_hex = zero_field_hex.decode('hex')
-    ack_indicator = hex(ACK).lstrip('-0x').zfill(4)
-    ack_indicator = ack_indicator.decode('hex')
-    return seq_number_hex + zero_field_hex + ack_indicator
+    bits = 32 * sack_words
+    bitmap = 0
+    for rcv_seq_number in reorder_buffer:
+        index, offset = divmod(seq_diff(rcv_seq_number, seq_number),
+                               segment_size)
+        if offset == 0 and 0 < index <= bits:
+            bitmap = bitmap | 1 << (bits - index)
+    size = pack_sack(feedback_packet, seq_number, bitmap, sack_words)
+    return buffer(feedback_packet, 0, size)
+
+
+def negotiate(server_socket, version, client_address, session_id=0,
+              offset=None, codec=NO_COMPRESSION, resume=False, delta=False):
+    """Answers the HELLO of the P2MP-FTP Client with the agreed protocol
+    version and codec of the compression.
+
+    Args:
+        server_socket: UDP socket of the Server
+        version: highest protocol version offered by the Client
+        client_address: address of the P2MP-FTP Client
+        session_id: session ID accepted, 0 outside the daemon mode
+        offset: offset in the file of the stripe accepted, None unless the
+                stripes are received
+        codec: codec of the compression offered by the Client
+        resume: True if the offset answers the HELLO asking where to resume
+        delta: True if the offset answers the HELLO offering the delta with
+               the size of the older version
+
+    Returns:
+        Tuple of protocol version agreed on, the highest one supported by
+        both, and codec of the compression agreed on
+    """
+    version = min(version, protocol_version)
+    codec = accept(codec)
+    size = pack_hello(feedback_packet, version, session_id, offset, codec,
+                      resume, delta)
+    server_socket.sendto(buffer(feedback_packet, 0, size), client_address)
+    if delta:
+        print 'HELLO, protocol version = {}, older version = {} bytes in ' \
+              'blocks of {}'.format(version, offset, basis.block)
+    elif resume:
+        print 'HELLO, protocol version = {}, resume offset = {}'.format(
+            version, offset)
+    elif session_id:
+        print 'HELLO, protocol version = {}, session = {:08x}'.format(
+            version, session_id)
+    elif offset is not None:
+        print 'HELLO, protocol version = {}, offset = {}'.format(
+            version, offset)
+    else:
+        print 'HELLO, protocol version = {}'.format(version)
+    if codec != NO_COMPRESSION:
+        print 'Compression = {}'.format(CODEC_NAMES[codec])
+    return version, codec
+
+
+def send_signatures(server_socket, request, client_address):
+    """Answers the request of the P2MP-FTP Client with the signatures of the
+    blocks of the older version of the file.
+
+    The blocks beyond the older version are left out, and the answer holds
+    at most MAX_SIGNATURES blocks.
+
+    Args:
+        server_socket: UDP socket of the Server
+        request: received request of the signatures (string or buffer)
+        client_address: address of the P2MP-FTP Client
+    """
+    try:
+        index, count, signatures = unpack_signatures(request)
+    except ValueError:
+        return
+    count = min(count, MAX_SIGNATURES)
+    size = pack_signatures(feedback_packet, index, buffer(
+        basis.signatures, index * BLOCK_SIGNATURE.size,
+        count * BLOCK_SIGNATURE.size))
+    server_socket.sendto(buffer(feedback_packet, 0, size), client_address)
+
+
+class Session:
+    """Transfer of the file from a P2MP-FTP Client.
+
+    Used for keeping track of the receiving state of the transfer, so the
+    Server in the daemon mode receives several transfers at the same time.
+
+    Attributes:
+        session_id: session ID of the transfer, 0 outside the daemon mode
+        file_out: writer of the output file, None once it is closed
+        client_address: address of the P2MP-FTP Client, None until the
+                        first packet arrives
+        version: protocol version agreed on with the Client
+        seq_number: next expected sequence number
+        last_seq_number: sequence number of the last received in-sequence
+                         packet
+        reorder_buffer: out-of-sequence packets written ahead as sequence
+                        number -> (indicator, size of the data, number of
+                        segments)
+        file_offset: offset in the file of the payload of the next expected
+                     packet
+        segment_size: size of the datagrams but the last one, i.e. the MSS
+                      of the Client
+        highest_seq_number: sequence number following the highest received
+                            packet
+        unreported: number of packets written since the last NACK feedback
+        complete: True once the last packet is written in sequence
+        last_active: time when the last packet of the session arrived
+        history: payloads of the latest valid packets as sequence number ->
+                 payload, kept with the FEC only
+        codec: codec of the compression agreed on with the Client
+        range_offset: offset in the file of the range received in sequence
+                      up to the file offset, None unless the transfers are
+                      resumed
+        client_session_id: session ID offered by the Client of the resumed
+                           transfer
+        packets: number of valid data packets received
+        delivered: number of bytes of the file received in sequence
+        duplicates: number of valid data packets received again
+        out_of_sequence: number of valid data packets received ahead of the
+                         next expected one
+        corrupted: number of packets dropped for the checksum or the
+                   indicator
+        repaired: number of data packets rebuilt from the parity packets
+        acks: number of ACKs sent
+        nacks: number of NACKs sent
+        first_active: time when the first data packet of the session
+                      arrived, None until it does
+        complete_time: time when the last packet was written in sequence
+        missing_since: time when the next expected packet went missing, i.e.
+                       a later packet arrived, None if it is not missing
+        recovery: histogram of the times the next expected packet was
+                  missing
+    """
+    def __init__(self, session_id, file_out):
+        """Initiates Session object writing to the file."""
+        self.session_id = session_id
+        self.file_out = file_out
+        self.client_address = None
+        self.version = VERSION_1
+        self.seq_number = 0
+        self.last_seq_number = None
+        self.reorder_buffer = {}
+        self.file_offset = 0
+        self.segment_size = 0
+        self.highest_seq_number = 0
+        self.unreported = 0
+        self.complete = False
+        self.last_active = time.time()
+        self.history = OrderedDict()
+        self.codec = NO_COMPRESSION
+        self.range_offset = None
+        self.client_session_id = None
+        self.packets = 0
+        self.delivered = 0
+        self.duplicates = 0
+        self.out_of_sequence = 0
+        self.corrupted = 0
+        self.repaired = 0
+        self.acks = 0
+        self.nacks = 0
+        self.first_active = None
+        self.complete_time = None
+        self.missing_since = None
+        self.recovery = Histogram()
+
+    def measure(self, indicator, payload):
+        """Finds the size of the data the packet carries and the number of
+        segments it takes, and learns the segment size from it.
+
+        The compressed packet takes all segments of its block, each but the
+        last one carrying the same size of the data.
+
+        Args:
+            indicator: data packet indicator of the packet
+            payload: payload of the packet (buffer)
+
+        Returns:
+            Tuple of size of the data in the file, number of segments and
+            codec the payload is decompressed by, None if the compressed
+            packet is not valid
+        """
+        if indicator in (DATA_PACKET, LAST_DATA_PACKET):
+            size, span, codec = len(payload), 1, NO_COMPRESSION
+        elif self.codec == NO_COMPRESSION or \
+                len(payload) < COMPRESSION_HEADER_SIZE:
+            return None
+        else:
+            span, size = unpack_compression_header(payload)
+            codec = self.codec
+            if not span:
+                return None
+        if indicator in (DATA_PACKET, COMPRESSED_PACKET):
+            self.segment_size = HEADER_SIZE + size // span
+        return size, span, codec
+
+    def beyond_window(self, rcv_seq_number):
+        """Checks whether the out-of-sequence packet is beyond the receive
+        window.
+
+        The compressed packets take several segments each, so they are
+        limited by the size of the reorder buffer only.
+
+        Args:
+            rcv_seq_number: sequence number of the out-of-sequence packet
+
+        Returns:
+            True if the packet is to be ignored
+        """
+        return self.codec == NO_COMPRESSION and seq_diff(
+            rcv_seq_number, self.seq_number) >= \
+            window_size * self.segment_size
+
+    def advance(self, indicator, size, span=1):
+        """Moves the next expected sequence number past the in-sequence
+        packet and the in-sequence run of buffered packets that follows it.
+
+        Args:
+            indicator: data packet indicator of the in-sequence packet
+            size: size of the data of the in-sequence packet in the file
+            span: number of segments the in-sequence packet takes
+        """
+        packet = (indicator, size, span)
+        while packet is not None:
+            indicator, size, span = packet
+            self.last_seq_number = self.seq_number
+            self.file_offset = self.file_offset + size
+            self.unreported = self.unreported + 1
+            # Compute next expected sequence number
+            self.seq_number = seq_add(self.seq_number,
+                                      span * HEADER_SIZE + size)
+            self.delivered = self.delivered + size
+            # Check if this is the last packet in sequence
+            if indicator in (LAST_DATA_PACKET, LAST_COMPRESSED_PACKET):
+                self.complete = True
+                self.complete_time = time.time()
+            packet = self.reorder_buffer.pop(self.seq_number, None)
+        self.receive_through(self.seq_number)
+        if self.missing_since is not None:
+            # The missing packet is recovered, the next gap of the reorder
+            # buffer, if any, starts missing now
+            now = time.time()
+            self.recovery.observe(now - self.missing_since)
+            self.missing_since = now if self.reorder_buffer else None
+
+    def receive_through(self, seq_number):
+        """Moves the sequence number following the highest received packet
+        up to the given one, unless it is past it already.
+
+        Args:
+            seq_number: sequence number following a received packet
+        """
+        if seq_diff(seq_number, self.highest_seq_number) > 0:
+            self.highest_seq_number = seq_number
+
+    def labels(self):
+        """Lists the labels of the metrics of the session.
+
+        Returns:
+            List of label pairs of the session ID and the Client address
+        """
+        return [('session', '{:08x}'.format(self.session_id)),
+                ('client', self.client_address[0]
+                 if self.client_address is not None else '')]
+
+    def values(self):
+        """Collects the values of the metrics of the session.
+
+        The goodput counts the bytes received in sequence from the first
+        data packet until the session is complete, or until now.
+
+        Returns:
+            Dictionary of the values as key -> number, Histogram or None
+        """
+        goodput = None
+        if self.first_active is not None:
+            elapsed = (self.complete_time or time.time()) - self.first_active
+            if elapsed > 0:
+                goodput = self.delivered / elapsed
+        return OrderedDict([
+            ('version', self.version), ('packets', self.packets),
+            ('delivered', self.delivered), ('goodput', goodput),
+            ('duplicates', self.duplicates),
+            ('out_of_sequence', self.out_of_sequence),
+            ('corrupted', self.corrupted), ('repaired', self.repaired),
+            ('acks', self.acks), ('nacks', self.nacks),
+            ('buffered', len(self.reorder_buffer)),
+            ('recovery', self.recovery)])
+
+    def remember(self, rcv_seq_number, payload):
+        """Keeps the payload of the valid packet to rebuild the lost packets
+        of its block, dropping the oldest one beyond FEC_HISTORY_SIZE.
+
+        Args:
+            rcv_seq_number: sequence number of the packet
+            payload: payload of the packet (buffer)
+        """
+        if rcv_seq_number not in self.history:
+            self.history[rcv_seq_number] = str(payload)
+            if len(self.history) > FEC_HISTORY_SIZE:
+                self.history.popitem(last=False)
+
+    def payload_offset(self, rcv_seq_number):
+        """Finds the offset in the file of the payload of the out-of-sequence
+        packet.
+
+        Every packet before the out-of-sequence one carries a full segment,
+        as only the last packet of the file may be shorter. The number of
+        segments is given by the distance between the sequence numbers
+        modulo 2^32, as they may wrap around in between.
+
+        Args:
+            rcv_seq_number: sequence number of the out-of-sequence packet
+
+        Returns:
+            Offset in the file in bytes
+        """
+        return self.file_offset + seq_diff(
+            rcv_seq_number, self.seq_number) // self.segment_size * \
+            (self.segment_size - HEADER_SIZE)
+
+
+def is_ipv4_address(address, multicast=False):
+    """Verifies whether the address is a dotted-decimal IPv4 address.
+
+    Args:
+        address: address provided in the command line
+        multicast: if True, the address must be an IPv4 multicast group
+                   address, i.e. in range of [224.0.0.0, 239.255.255.255]
+
+    Returns:
+        Boolean indicating whether the address is valid
+    """
+    octets = address.split('.')
+    if len(octets) != 4 or \
+            not all(o.isdigit() and int(o) <= 255 for o in octets):
+        return False
+    return not multicast or 224 <= int(octets[0]) <= 239
 
 
 # Actual program starts here
+# Reusable buffers for the ACK and NACK packets sent to P2MP-FTP Client
+ack_packet = bytearray(ACK_SIZE)
+feedback_packet = bytearray(MAX_MSS)
+window_size = 1
+multicast_group = None
+multicast_interface = None
+nack = False
+protocol_version = VERSION_2
+output = FILE_OUTPUT
+queue_size = 0
+daemon = False
+session_timeout = SESSION_TIMEOUT
+batch = False
+# Name of the older version of the file and the older version the file is
+# received as the delta against, None unless the file is updated
+update_name = None
+basis = None
+stripes = 1
+fec = False
+resume = False
+# Whether the file is written into a stream
+streaming = False
+listen_address = ''
+# Seed of the packet loss probability, None for the unseeded drops
+loss_seed = None
+# Names of the files of the report and of the metrics, the numbers of
+# datagrams received and dropped by the packet loss probability, and the
+# time the Server started listening
+stats_name = None
+metrics_name = None
+verbosity = 0
+received = 0
+dropped = 0
+listen_start = None
 try:
-    # Validation of all arguments received from command line
-    assert len(sys.argv) == 4, 'Error: Wrong number of arguments...\n'
-    assert sys.argv[1].isdigit(), \
+    # Validation of all options and arguments received from command line
+    opts, args = getopt.getopt(sys.argv[1:],
+                               'w:m:i:np:o:q:dt:bu:s:frl:k:j:e:v',
+                               ['window=', 'multicast=', 'interface=',
+                                'nack', 'protocol=', 'output=', 'queue=',
+                                'daemon', 'timeout=', 'batch', 'update=',
+                                'stripes=', 'fec',
+                                'resume', 'listen=', 'seed=', 'stats=',
+                                'metrics=', 'verbose'])
+    for opt, value in opts:
+        if opt in ('-w', '--window'):
+            assert value.isdigit() and int(value) > 0, \
+                'Error: Receive window size provided: \'{}\' is not ' \
+                'positive Integer...\n'.format(value)
+            window_size = int(value)
+        elif opt in ('-m', '--multicast'):
+            assert is_ipv4_address(value, multicast=True), \
+                'Error: Multicast group provided: \'{}\' is not IPv4 ' \
+                'multicast address...\n'.format(value)
+            multicast_group = value
+        elif opt in ('-i', '--interface'):
+            assert is_ipv4_address(value), \
+                'Error: Interface address provided: \'{}\' is not IPv4 ' \
+                'address...\n'.format(value)
+            multicast_interface = value
+        elif opt in ('-n', '--nack'):
+            nack = True
+        elif opt in ('-p', '--protocol'):
+            assert value in (str(VERSION_1), str(VERSION_2)), \
+                'Error: Protocol version provided: \'{}\' is not ' \
+                'supported...\n'.format(value)
+            protocol_version = int(value)
+        elif opt in ('-o', '--output'):
+            assert value in (FILE_OUTPUT, MMAP_OUTPUT), \
+                'Error: Unknown output sink: \'{}\'...\n'.format(value)
+            output = value
+        elif opt in ('-q', '--queue'):
+            assert value.isdigit(), \
+                'Error: Queue size provided: \'{}\' is not ' \
+                'Integer...\n'.format(value)
+            queue_size = int(value)
+        elif opt in ('-d', '--daemon'):
+            daemon = True
+        elif opt in ('-t', '--timeout'):
+            session_timeout = float(value)
+            assert session_timeout > 0, \
+                'Error: Session timeout provided: \'{}\' is not ' \
+                'positive...\n'.format(value)
+        elif opt in ('-b', '--batch'):
+            batch = True
+        elif opt in ('-u', '--update'):
+            update_name = value
+        elif opt in ('-s', '--stripes'):
+            assert value.isdigit() and int(value) > 0, \
+                'Error: Number of stripes provided: \'{}\' is not ' \
+                'positive Integer...\n'.format(value)
+            stripes = int(value)
+        elif opt in ('-f', '--fec'):
+            fec = True
+        elif opt in ('-r', '--resume'):
+            resume = True
+        elif opt in ('-l', '--listen'):
+            assert is_ipv4_address(value), \
+                'Error: Listen address provided: \'{}\' is not IPv4 ' \
+                'address...\n'.format(value)
+            listen_address = value
+        elif opt in ('-k', '--seed'):
+            assert value.isdigit(), \
+                'Error: Seed provided: \'{}\' is not Integer...\n'.format(
+                    value)
+            loss_seed = int(value)
+        elif opt in ('-j', '--stats'):
+            stats_name = value
+        elif opt in ('-e', '--metrics'):
+            metrics_name = value
+        elif opt in ('-v', '--verbose'):
+            verbosity = verbosity + 1
+    logger = create_logger('ngtitov_p2mpserver', verbosity)
+    # The socket bound to a unicast address does not get the datagrams sent
+    # to the multicast group
+    assert not listen_address or multicast_group is None, \
+        'Error: Multicast group cannot be joined listening on a single ' \
+        'address...\n'
+    assert not daemon or multicast_group is None, \
+        'Error: Multicast group cannot be joined in the daemon mode...\n'
+    assert stripes == 1 or not daemon and output == FILE_OUTPUT, \
+        'Error: Stripes cannot be received in the daemon mode or into the ' \
+        'memory-mapped file...\n'
+    # The session IDs of the daemon mode name the files, and the restarted
+    # Client offers another one
+    assert not daemon or not resume, \
+        'Error: Transfers cannot be resumed in the daemon mode...\n'
+    # The batch is a stream unpacked in sequence
+    assert not batch or stripes == 1 and not resume and \
+        output == FILE_OUTPUT, \
+        'Error: Batch cannot be striped, resumed or memory-mapped...\n'
+    # The delta is a stream patched in sequence
+    assert update_name is None or not daemon and not batch and \
+        stripes == 1 and not resume and output == FILE_OUTPUT, \
+        'Error: Delta cannot be received in the daemon or batch mode, ' \
+        'striped, resumed or memory-mapped...\n'
+    assert len(args) == 3, 'Error: Wrong number of arguments...\n'
+    assert args[0].isdigit(), \
         'Error: Port number of the Server provided to which server must ' \
-        'listen: \'{}\' is not Integer type...\n'.format(sys.argv[1])
-    server_port = int(sys.argv[1])
-    assert 1024 < server_port <= 0xffff, \
+        'listen: \'{}\' is not Integer type...\n'.format(args[0])
+    server_port = int(args[0])
+    assert 1024 < server_port <= 0xffff - stripes + 1, \
         'Port number must be in rage of (1024, 65535]\n'
-    file_name = sys.argv[2]
-    assert not os.path.isfile(file_name), \
-        'Exception: \'{}\' file already exists, consider giving ' \
-        'different name or removing file...\n'.format(file_name)
-    probability = float(sys.argv[3])
+    if daemon or batch:
+        directory = args[1]
+        assert os.path.isdir(directory), \
+            'Error: \'{}\' no such directory...\n'.format(directory)
+    else:
+        file_name = args[1]
+        assert resume or not os.path.isfile(file_name), \
+            'Exception: \'{}\' file already exists, consider giving ' \
+            'different name or removing file...\n'.format(file_name)
+        # Anything but a regular file, e.g. the named pipe, is a stream
+        streaming = file_name == '-' or os.path.exists(file_name) and \
+            not os.path.isfile(file_name)
+        assert not streaming or stripes == 1 and not resume and \
+            output == FILE_OUTPUT, \
+            'Error: Stream output cannot be striped, resumed or ' \
+            'memory-mapped...\n'
+    probability = float(args[2])
     assert 0 <= probability <= 1, \
         'Exception: Packet loss probability must be in range of [0, 1]\n'
+    # Number of 32-bit words of the SACK bitmap to cover the receive window
+    sack_words = (window_size + 30) // 32
+    # The seeded Server drops the same packets in every run
+    seed(loss_seed)
     # Start listening on well-known port
-    rdt_receive()
+    if daemon:
+        rdt_receive_daemon()
+    elif stripes > 1:
+        rdt_receive_striped()
+    elif batch:
+        rdt_receive(StreamWriter(BatchUnpacker(directory)), server_port)
+    elif update_name is not None:
+        basis = Basis(update_name)
+        print 'Older version = {} bytes in blocks of {}'.format(basis.size,
+                                                                basis.block)
+        rdt_receive(StreamWriter(DeltaPatcher(
+            basis, open_stream(file_name) if streaming else
+            open(file_name, 'wb', COALESCE_SIZE))), server_port)
+    elif streaming:
+        rdt_receive(StreamWriter(open_stream(file_name)), server_port)
+    else:
+        rdt_receive(FileWriter(file_name, use_mmap=output == MMAP_OUTPUT,
+                               resume=resume), server_port,
+                    file_name + PROGRESS_SUFFIX if resume else None)
+except getopt.GetoptError, e:
+    print 'Error: {}...\n'.format(e), USAGE
 except AssertionError, e:
     print e, USAGE
 except ValueError, e:
     print e
     print 'Exception: Packet loss probability argument provided: \'{}\' is ' \
           'neither of Integer nor Float type, it must be integer or float in ' \
-          'range of [0, 1]'.format(sys.argv[3])
+          'range of [0, 1]'.format(args[2])
+except (IOError, OSError), e:
+    print 'Exception: {}'.format(e)
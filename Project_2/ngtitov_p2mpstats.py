@@ -0,0 +1,285 @@
+"""
+ngtitov_p2mpstats.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Transfer telemetry of the P2MP-FTP Client (Sender) and Server (Receiver).
+
+The Client keeps the counters and histograms of every Server and the Server
+of every session in memory instead of printing a message per packet. The
+report of the transfer is written as JSON when the program exits. The same
+metrics may be exported in the Prometheus text format as well, into a file
+rewritten by a background thread every second while the transfer runs, so
+that a collector picks up the progress, e.g. the textfile collector of the
+node exporter. Both files are replaced atomically, so a reader never sees a
+partial one.
+
+The messages per packet go to the leveled logger, which drops them unless
+the program is started with the verbose option.
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+from bisect import bisect_left
+from collections import OrderedDict
+import json
+import logging
+import os
+import sys
+import threading
+
+# Initialization of constants
+# Upper bounds in seconds of the buckets of the latency histograms
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Interval in seconds of the periodic export of the metrics
+EXPORT_INTERVAL = 1.0
+# Types of the metrics
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+
+class Histogram:
+    """Distribution of the observed values over the buckets of fixed upper
+    bounds.
+
+    Attributes:
+        bounds: upper bounds of the buckets in increasing order
+        counts: number of the values observed in every bucket, the last one
+                counting the values above the highest bound
+        count: number of the values observed
+        total: sum of the values observed
+        minimum: lowest value observed, None if there is none
+        maximum: highest value observed, None if there is none
+    """
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        """Initiates empty Histogram object with the bucket bounds."""
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def observe(self, value):
+        """Adds the value to its bucket.
+
+        Args:
+            value: value observed
+        """
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count = self.count + 1
+        self.total = self.total + value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def report(self):
+        """Summarizes the distribution for the JSON report.
+
+        Returns:
+            Dictionary of the count, sum, minimum, mean and maximum of the
+            values, and the cumulative counts of the buckets as upper bound
+            -> number of the values up to it
+        """
+        buckets = OrderedDict()
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative = cumulative + count
+            buckets[repr(bound)] = cumulative
+        buckets['+Inf'] = self.count
+        return OrderedDict([
+            ('count', self.count), ('sum', self.total),
+            ('min', self.minimum),
+            ('mean', self.total / self.count if self.count else None),
+            ('max', self.maximum), ('buckets', buckets)])
+
+
+def report_values(values):
+    """Converts the values collected for the metrics into the JSON report.
+
+    Args:
+        values: dictionary of the values as key -> number, Histogram or None
+
+    Returns:
+        Dictionary of the values with every Histogram summarized
+    """
+    return OrderedDict((key, value.report() if isinstance(value, Histogram)
+                        else value) for key, value in values.iteritems())
+
+
+def format_metrics(prefix, metrics, groups):
+    """Formats the metrics in the Prometheus text exposition format.
+
+    Args:
+        prefix: prefix of the names of the metrics
+        metrics: definitions of the metrics as tuples of the key of the value,
+                 name, type (COUNTER, GAUGE or HISTOGRAM) and help text
+        groups: values of the metrics as tuples of the list of label pairs
+                and dictionary of the values as key -> number, Histogram or
+                None; a missing or None value is left out
+
+    Returns:
+        Metrics as text
+    """
+    lines = []
+    for key, name, kind, text in metrics:
+        name = prefix + name
+        lines.append('# HELP {} {}'.format(name, text))
+        lines.append('# TYPE {} {}'.format(name, kind))
+        for labels, values in groups:
+            value = values.get(key)
+            if value is None:
+                continue
+            if kind != HISTOGRAM:
+                lines.append('{}{} {}'.format(name, format_labels(labels),
+                                              format_value(value)))
+                continue
+            cumulative = 0
+            for bound, count in zip(value.bounds, value.counts):
+                cumulative = cumulative + count
+                lines.append('{}_bucket{} {}'.format(
+                    name, format_labels(labels + [('le', repr(bound))]),
+                    cumulative))
+            lines.append('{}_bucket{} {}'.format(
+                name, format_labels(labels + [('le', '+Inf')]), value.count))
+            lines.append('{}_sum{} {}'.format(name, format_labels(labels),
+                                              format_value(value.total)))
+            lines.append('{}_count{} {}'.format(name, format_labels(labels),
+                                                value.count))
+    return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    """Formats the labels of the sample, escaping their values.
+
+    Args:
+        labels: list of label pairs of the name and value
+
+    Returns:
+        Labels in braces, empty if there are none
+    """
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(
+        name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+            '\n', '\\n')) for name, value in labels) + '}'
+
+
+def format_value(value):
+    """Formats the value of the sample, the floats at full precision."""
+    if isinstance(value, float):
+        return repr(value)
+    return str(int(value))
+
+
+def write_text(file_name, text):
+    """Writes the text into the file, replacing the previous one atomically.
+
+    Args:
+        file_name: name of the file
+        text: content of the file
+    """
+    temp_name = file_name + '.tmp'
+    with open(temp_name, 'w') as text_file:
+        text_file.write(text)
+    os.rename(temp_name, file_name)
+
+
+def write_report(report_name, report):
+    """Writes the report as JSON, replacing the previous one atomically.
+
+    Args:
+        report_name: name of the JSON file
+        report: dictionary of the report
+    """
+    write_text(report_name, json.dumps(report, indent=2,
+                                       separators=(',', ': ')) + '\n')
+
+
+def stripe_name(file_name, stripe):
+    """Names the file of the stripe after the file of the whole transfer by
+    inserting the number of the stripe before the extension.
+
+    Args:
+        file_name: name of the file, e.g. 'stats.json'
+        stripe: number of the stripe
+
+    Returns:
+        Name of the file of the stripe, e.g. 'stats.0.json'
+    """
+    root, extension = os.path.splitext(file_name)
+    return '{}.{}{}'.format(root, stripe, extension)
+
+
+def create_logger(name, verbosity):
+    """Creates the leveled logger of the messages per packet.
+
+    The messages are written to the standard output, the same as the other
+    messages of the program, so they keep their order.
+
+    Args:
+        name: name of the logger
+        verbosity: 0 to log the warnings only, 1 to log the INFO messages
+                   as well, 2 or more to log the DEBUG messages as well
+
+    Returns:
+        Logger object
+    """
+    logger = logging.getLogger(name)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger.setLevel(max(logging.WARNING - 10 * verbosity, logging.DEBUG))
+    return logger
+
+
+class Exporter:
+    """Background thread rewriting the metrics file periodically.
+
+    Attributes:
+        metrics_name: name of the metrics file
+        collect: function returning the metrics as text
+        interval: interval in seconds of the export
+        stopped: event set once the export is stopped
+        thread: exporting thread
+    """
+    def __init__(self, metrics_name, collect, interval=EXPORT_INTERVAL):
+        """Initiates Exporter object and starts its thread."""
+        self.metrics_name = metrics_name
+        self.collect = collect
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.export_loop)
+        # The thread must not keep the interrupted program running
+        self.thread.daemon = True
+        self.thread.start()
+
+    def export_loop(self):
+        """Exports the metrics every interval until the export is stopped
+        (exporting thread)."""
+        while not self.stopped.wait(self.interval):
+            self.export()
+
+    def export(self):
+        """Writes the metrics collected into the metrics file."""
+        write_text(self.metrics_name, self.collect())
+
+    def close(self):
+        """Stops the thread and exports the final metrics."""
+        self.stopped.set()
+        self.thread.join()
+        self.export()
@@ -0,0 +1,303 @@
+"""
+ngtitov_p2mpwriter.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Output file writer of the P2MP-FTP Server (Receiver).
+
+The payload of every data packet is written at its absolute offset in the
+file as soon as the packet is accepted, whether it arrives in-sequence or
+out-of-sequence, so the Server does not keep the out-of-sequence payloads in
+memory until the gap before them is filled.
+
+Writes adjacent to each other are coalesced in a preallocated staging buffer
+and written to the file with a single system call once the buffer is full or
+the next write is not adjacent. The file is extended ahead of the writes in
+large steps and truncated to the size of the written data when it is closed.
+
+Optionally the file is memory-mapped and the payloads are copied straight
+into the mapping, leaving the write back to the kernel.
+
+The stripes of the file received by several processes are written into the
+same file. Each process extends the file under the shared lock and never
+shrinks it, and the file is truncated to the farthest end written by any of
+them once they are all done.
+
+The partial file of the interrupted transfer may be kept and resumed. The
+progress of the transfer, i.e. the range of the file received in sequence,
+is recorded in the progress file next to it, which is replaced atomically
+and removed once the file is complete.
+
+The stream, i.e. the standard output or a named pipe, cannot be written at
+the offsets. Its data is written in sequence, and the payloads received out
+of sequence are kept in memory until the gap before them is filled, which
+the receive window bounds.
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+import mmap
+import os
+
+# Initialization of constants
+# Size of the staging buffer coalescing the adjacent writes in bytes
+COALESCE_SIZE = 256 * 1024
+# Step in bytes the file is extended by ahead of the writes
+PREALLOCATION_SIZE = 16 * 1024 * 1024
+# Suffix of the name of the progress file of the partial file
+PROGRESS_SUFFIX = '.progress'
+
+
+def read_progress(progress_name):
+    """Reads the progress of the partial file.
+
+    Args:
+        progress_name: name of the progress file
+
+    Returns:
+        Tuple of the offsets in the file of the first byte of the range
+        received in sequence and of the byte following it, None if there is
+        no valid progress file
+    """
+    try:
+        with open(progress_name) as progress_file:
+            first, end = [int(field) for field in progress_file.read().split()]
+    except (IOError, ValueError):
+        return None
+    if not 0 <= first <= end:
+        return None
+    return first, end
+
+
+def write_progress(progress_name, first, end):
+    """Records the progress of the partial file, replacing the previous one
+    atomically.
+
+    Args:
+        progress_name: name of the progress file
+        first: offset in the file of the first byte of the range received in
+               sequence
+        end: offset in the file following the range
+    """
+    temp_name = progress_name + '.tmp'
+    with open(temp_name, 'w') as progress_file:
+        progress_file.write('{} {}\n'.format(first, end))
+    os.rename(temp_name, progress_name)
+
+
+def remove_progress(progress_name):
+    """Removes the progress file of the complete file, if there is one.
+
+    Args:
+        progress_name: name of the progress file
+    """
+    try:
+        os.remove(progress_name)
+    except OSError:
+        pass
+
+
+class FileWriter:
+    """Output file of the P2MP-FTP Server written at absolute offsets.
+
+    Attributes:
+        file_out: file object of the output file
+        size: size of the written data, i.e. the end of the farthest write
+        allocated: size the file is extended to
+        file_map: memory mapping of the file, None unless the mmap sink is
+                  used
+        staging: staging buffer of the adjacent writes
+        start: offset in the file of the data in the staging buffer
+        length: number of bytes in the staging buffer
+    """
+    # Mode the output file is opened in, and the existing file is resumed in
+    mode = 'w+b'
+    resume_mode = 'r+b'
+
+    def __init__(self, file_name, use_mmap=False, resume=False):
+        """Creates the output file, memory-mapped if use_mmap is True, or
+        opens the existing one if resume is True."""
+        self.file_out = open(file_name, self.resume_mode if resume and
+                             os.path.isfile(file_name) else self.mode)
+        self.size = 0
+        self.allocated = 0
+        self.file_map = None
+        self.staging = None if use_mmap else bytearray(COALESCE_SIZE)
+        self.start = 0
+        self.length = 0
+
+    def resume(self, size):
+        """Keeps the data received before the file was resumed, dropping
+        whatever follows it.
+
+        Args:
+            size: size of the data kept
+        """
+        self.file_out.truncate(size)
+        self.size = size
+        self.allocated = size
+        if self.staging is None and size:
+            self.allocate(size)
+
+    def write(self, offset, data):
+        """Writes the data at the absolute offset in the file.
+
+        Args:
+            offset: offset in the file in bytes
+            data: data to be written (string or buffer)
+        """
+        end = offset + len(data)
+        if end > self.allocated:
+            self.allocate(end)
+        if self.staging is None:
+            self.file_map.seek(offset)
+            self.file_map.write(data)
+        else:
+            if self.length and (offset != self.start + self.length or
+                                self.length + len(data) > COALESCE_SIZE):
+                self.flush()
+            if len(data) > COALESCE_SIZE:
+                self.file_out.seek(offset)
+                self.file_out.write(data)
+            else:
+                if not self.length:
+                    self.start = offset
+                self.staging[self.length:self.length + len(data)] = data
+                self.length = self.length + len(data)
+        self.size = max(self.size, end)
+
+    def allocate(self, end):
+        """Extends the file ahead of the write ending at the given offset.
+
+        Args:
+            end: offset in the file following the write
+        """
+        self.allocated = (end // PREALLOCATION_SIZE + 1) * PREALLOCATION_SIZE
+        if self.staging is not None:
+            self.file_out.truncate(self.allocated)
+        elif self.file_map is None:
+            self.file_out.truncate(self.allocated)
+            self.file_map = mmap.mmap(self.file_out.fileno(), self.allocated)
+        else:
+            self.file_map.resize(self.allocated)
+
+    def flush(self):
+        """Writes the data of the staging buffer to the file."""
+        if self.length:
+            self.file_out.seek(self.start)
+            self.file_out.write(buffer(self.staging, 0, self.length))
+            self.length = 0
+
+    def close(self):
+        """Writes the pending data and truncates the file to its size."""
+        if self.staging is None:
+            if self.file_map is not None:
+                self.file_map.close()
+        else:
+            self.flush()
+        self.file_out.truncate(self.size)
+        self.file_out.close()
+
+
+class SharedFileWriter(FileWriter):
+    """Output file of the P2MP-FTP Server shared by the processes receiving
+    the stripes of the file.
+
+    The file is created before the processes start. The adjacent writes are
+    coalesced the same way as by FileWriter, the memory mapping is not
+    supported.
+
+    Attributes:
+        lock: lock of the processes, held while the file is extended
+        end: shared value of the farthest end of the data written by any of
+             the processes
+    """
+    mode = 'r+b'
+
+    def __init__(self, file_name, lock, end):
+        """Opens the existing output file shared by the processes."""
+        FileWriter.__init__(self, file_name)
+        self.lock = lock
+        self.end = end
+
+    def resume(self, size):
+        """Keeps the data received before the file was resumed, which the
+        other processes share.
+
+        Args:
+            size: end of the data of the stripe kept
+        """
+        self.size = size
+
+    def allocate(self, end):
+        """Extends the file ahead of the write ending at the given offset,
+        unless another process has extended it further.
+
+        Args:
+            end: offset in the file following the write
+        """
+        self.allocated = (end // PREALLOCATION_SIZE + 1) * PREALLOCATION_SIZE
+        with self.lock:
+            if os.fstat(self.file_out.fileno()).st_size < self.allocated:
+                self.file_out.truncate(self.allocated)
+
+    def close(self):
+        """Writes the pending data and reports the end of the written data.
+        """
+        self.flush()
+        self.file_out.close()
+        with self.lock:
+            self.end.value = max(self.end.value, self.size)
+
+
+class StreamWriter:
+    """Output stream of the P2MP-FTP Server written in sequence.
+
+    Attributes:
+        file_out: file object of the output stream, buffered to coalesce the
+                  writes
+        size: size of the data written in sequence
+        pending: payloads received out of sequence as offset -> data
+    """
+    def __init__(self, file_out):
+        """Initiates StreamWriter object of the stream."""
+        self.file_out = file_out
+        self.size = 0
+        self.pending = {}
+
+    def resume(self, size):
+        """The stream cannot be resumed."""
+        raise IOError('Stream output cannot be resumed')
+
+    def write(self, offset, data):
+        """Writes the data once all data before its offset is written.
+
+        Args:
+            offset: offset in the stream in bytes
+            data: data to be written (string or buffer)
+        """
+        if offset != self.size:
+            if offset > self.size:
+                # The buffer of the payload is reused once it is handled
+                self.pending[offset] = str(data)
+            return
+        self.file_out.write(data)
+        self.size = self.size + len(data)
+        while self.size in self.pending:
+            data = self.pending.pop(self.size)
+            self.file_out.write(data)
+            self.size = self.size + len(data)
+
+    def close(self):
+        """Writes the buffered data and closes the stream."""
+        self.file_out.close()
@@ -0,0 +1,172 @@
+"""
+test_ngtitov_p2mpbatch.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Unit tests of the batch of the files of a directory: the names of the
+manifest must never lead out of the output directory.
+
+Run the tests from the directory of the project:
+ > python -m unittest discover
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from ngtitov_p2mpbatch import MANIFEST_HEADER, pack_manifest, \
+    unpack_manifest, scan_directory, BatchReader, BatchUnpacker
+
+FILE_MODE = stat.S_IFREG | 0644
+DIRECTORY_MODE = stat.S_IFDIR | 0755
+MTIME = 1509494400
+
+
+def entries_of(manifest):
+    """Unpacks the entries of the packed manifest."""
+    magic, count, size = MANIFEST_HEADER.unpack_from(manifest)
+    return unpack_manifest(buffer(manifest, MANIFEST_HEADER.size, size),
+                           count)
+
+
+class ManifestTest(unittest.TestCase):
+    """Verification of the names and modes of the manifest."""
+
+    def test_round_trip(self):
+        entries = [('a', DIRECTORY_MODE, MTIME, 0),
+                   ('a/b', DIRECTORY_MODE, MTIME, 0),
+                   ('a/b/c.txt', FILE_MODE, MTIME, 10),
+                   ('d.bin', FILE_MODE, MTIME + 1, 2 ** 40)]
+        self.assertEqual(entries_of(pack_manifest(entries)), entries)
+
+    def test_unsafe_names(self):
+        for name in ('/etc/passwd', '/', '..', '../x', 'a/../../x', 'a/..',
+                     '.', './x', 'a/./b', 'a//b', 'a/', '', 'a\0b', '\0'):
+            manifest = pack_manifest([(name, FILE_MODE, MTIME, 1)])
+            self.assertRaises(ValueError, entries_of, manifest)
+
+    def test_unsafe_directory_names(self):
+        for name in ('/tmp', '..', 'a/..', '.'):
+            manifest = pack_manifest([(name, DIRECTORY_MODE, MTIME, 0)])
+            self.assertRaises(ValueError, entries_of, manifest)
+
+    def test_unsupported_modes(self):
+        for mode in (stat.S_IFLNK | 0777, stat.S_IFIFO | 0644,
+                     stat.S_IFCHR | 0644, 0644):
+            manifest = pack_manifest([('x', mode, MTIME, 0)])
+            self.assertRaises(ValueError, entries_of, manifest)
+
+    def test_truncated(self):
+        manifest = pack_manifest([('abc', FILE_MODE, MTIME, 1)])
+        magic, count, size = MANIFEST_HEADER.unpack_from(manifest)
+        # The name is cut short
+        self.assertRaises(ValueError, unpack_manifest, buffer(
+            manifest, MANIFEST_HEADER.size, size - 1), count)
+        # The entry is missing
+        self.assertRaises(ValueError, unpack_manifest, buffer(
+            manifest, MANIFEST_HEADER.size, size), count + 1)
+
+
+class BatchTest(unittest.TestCase):
+    """Batch of the tree read by the Client and unpacked by the Server."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.source = os.path.join(self.root, 'source')
+        self.output = os.path.join(self.root, 'output')
+        os.mkdir(self.output)
+
+    def tearDown(self):
+        for root, directories, files in os.walk(self.root):
+            for name in directories:
+                os.chmod(os.path.join(root, name), 0755)
+        shutil.rmtree(self.root)
+
+    def make_tree(self):
+        """Creates the nested tree with empty, small and large files, an
+        empty directory and a read-only directory."""
+        files = {'top.txt': 'top', 'empty': '',
+                 'a/b/c/deep.bin': os.urandom(70000),
+                 'a/b/small.txt': 'small', 'readonly/file': 'locked'}
+        for name, data in files.items():
+            path = os.path.join(self.source, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as file_out:
+                file_out.write(data)
+            os.utime(path, (MTIME, MTIME))
+        os.makedirs(os.path.join(self.source, 'a', 'empty_directory'))
+        os.chmod(os.path.join(self.source, 'a', 'b', 'small.txt'), 0600)
+        os.chmod(os.path.join(self.source, 'readonly'), 0555)
+        return files
+
+    def transfer(self, chunk_size):
+        """Reads the batch of the source tree and unpacks it into the output
+        directory in the chunks of the size."""
+        reader = BatchReader(self.source)
+        unpacker = BatchUnpacker(self.output)
+        received = 0
+        while True:
+            data = reader.read(chunk_size)
+            if not data:
+                break
+            received = received + len(data)
+            unpacker.write(data)
+        reader.close()
+        unpacker.close()
+        self.assertEqual(received, reader.size)
+        return unpacker
+
+    def test_nested_tree(self):
+        files = self.make_tree()
+        for chunk_size in (7, 1000, 65536):
+            shutil.rmtree(self.output)
+            os.mkdir(self.output)
+            unpacker = self.transfer(chunk_size)
+            self.assertEqual(unpacker.files, len(files))
+            for name, data in files.items():
+                with open(os.path.join(self.output, name), 'rb') as file_in:
+                    self.assertEqual(file_in.read(), data, name)
+            self.assertEqual(scan_directory(self.output),
+                             scan_directory(self.source))
+            for directory in self.output, os.path.join(self.output,
+                                                       'readonly'):
+                os.chmod(directory, 0755)
+
+    def test_unsafe_manifest(self):
+        manifest = pack_manifest([('../escaped', FILE_MODE, MTIME, 4)])
+        unpacker = BatchUnpacker(self.output)
+        self.assertRaises(IOError, unpacker.write, manifest + 'data')
+        unpacker.close()
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'escaped')))
+        self.assertEqual(os.listdir(self.output), [])
+
+    def test_not_batch(self):
+        unpacker = BatchUnpacker(self.output)
+        self.assertRaises(IOError, unpacker.write, 'Not a batch stream')
+
+    def test_directory_error(self):
+        # A file is in the place of the directory of the batch
+        with open(os.path.join(self.output, 'a'), 'wb') as file_out:
+            file_out.write('file')
+        manifest = pack_manifest([('a', DIRECTORY_MODE, MTIME, 0),
+                                  ('a/b', FILE_MODE, MTIME, 1)])
+        unpacker = BatchUnpacker(self.output)
+        self.assertRaises(IOError, unpacker.write, manifest + 'x')
+
+
+if __name__ == '__main__':
+    unittest.main()
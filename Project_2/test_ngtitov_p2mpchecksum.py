@@ -0,0 +1,108 @@
+"""
+test_ngtitov_p2mpchecksum.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Unit tests of the Internet checksum engine: the word-by-word, array and
+NumPy sums must give bit-identical results.
+
+Run the tests from the directory of the project:
+ > python -m unittest discover
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None (NumPy is optional)
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+import random
+import unittest
+import ngtitov_p2mpchecksum
+from ngtitov_p2mpchecksum import NUMPY_MIN_SIZE, ones_complement_sum, fold, \
+    wrap_around, _sum_words_array, _sum_words_numpy, _sum_words_legacy
+from ngtitov_p2mpcodec import DATA_PACKET, HEADER_SIZE, MAX_MSS
+
+MAX_PAYLOAD_SIZE = MAX_MSS - HEADER_SIZE
+
+
+def payloads():
+    """Generates the random and all-ones payloads of every allowed size,
+    the latter overflowing the sum of every word."""
+    generator = random.Random(573)
+    data = ''.join(chr(generator.randrange(256))
+                   for _ in range(MAX_PAYLOAD_SIZE))
+    for size in range(MAX_PAYLOAD_SIZE + 1):
+        yield data[:size]
+        yield '\xff' * size
+
+
+class ChecksumTest(unittest.TestCase):
+    """Bit-identical results of the checksum implementations."""
+
+    def test_known_words(self):
+        # The first byte of the pair is the low-order byte of the word
+        self.assertEqual(_sum_words_legacy('\x01\x00\x02\x00'), 3)
+        self.assertEqual(_sum_words_legacy('\x00\x01'), 0x100)
+        # The odd trailing byte forms the last word on its own
+        self.assertEqual(_sum_words_legacy('\x01\x00\x05'), 6)
+        self.assertEqual(fold(_sum_words_array('\x01\x00\x05')), 6)
+
+    def test_wrap_around(self):
+        self.assertEqual(wrap_around(0xffff, 1), 1)
+        self.assertEqual(wrap_around(0xffff, 0xffff), 0xffff)
+        self.assertEqual(fold(0x2fffd), 0xffff)
+        self.assertEqual(fold(0), 0)
+
+    def test_array_sum(self):
+        for payload in payloads():
+            self.assertEqual(fold(_sum_words_array(payload)),
+                             _sum_words_legacy(payload), len(payload))
+
+    @unittest.skipIf(ngtitov_p2mpchecksum.numpy is None,
+                     'NumPy is not installed')
+    def test_numpy_sum(self):
+        for payload in payloads():
+            self.assertEqual(fold(_sum_words_numpy(payload)),
+                             _sum_words_legacy(payload), len(payload))
+
+    def test_ones_complement_sum(self):
+        # Both sides of NUMPY_MIN_SIZE, with the initial header words
+        for size in (0, 1, NUMPY_MIN_SIZE - 1, NUMPY_MIN_SIZE,
+                     NUMPY_MIN_SIZE + 1, MAX_PAYLOAD_SIZE):
+            for payload in ('\xff' * size, '\x5a' * size):
+                for initial in (0, DATA_PACKET, 0x3fffd):
+                    self.assertEqual(
+                        ones_complement_sum(payload, initial),
+                        fold(_sum_words_legacy(payload) + initial))
+
+    def test_buffer_types(self):
+        payload = ''.join(chr(i % 256) for i in range(MAX_PAYLOAD_SIZE))
+        expected = ones_complement_sum(payload)
+        for data in (buffer(payload), bytearray(payload)):
+            self.assertEqual(ones_complement_sum(data), expected)
+        # The payload of a datagram is a buffer within the datagram
+        datagram = bytearray(HEADER_SIZE) + bytearray(payload)
+        self.assertEqual(ones_complement_sum(buffer(
+            datagram, HEADER_SIZE, MAX_PAYLOAD_SIZE)), expected)
+
+    def test_verification(self):
+        # The sum of the payload, the header words and the checksum of the
+        # sender is all ones at the receiver
+        seq_number = 0xfffffe0c
+        for size in (0, 1, 511, 512, NUMPY_MIN_SIZE + 1, MAX_PAYLOAD_SIZE):
+            payload = '\xa5' * size
+            header = (seq_number & 0xffff) + (seq_number >> 16) + DATA_PACKET
+            checksum = ~ones_complement_sum(payload, header) & 0xffff
+            self.assertEqual(ones_complement_sum(payload, header + checksum),
+                             0xffff)
+
+
+if __name__ == '__main__':
+    unittest.main()
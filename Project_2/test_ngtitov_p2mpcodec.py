@@ -0,0 +1,266 @@
+"""
+test_ngtitov_p2mpcodec.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Unit tests of the binary header codec of the P2MP-FTP protocol.
+
+Run the tests from the directory of the project:
+ > python -m unittest discover
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+import struct
+import unittest
+from ngtitov_p2mpcodec import DATA_PACKET, LAST_DATA_PACKET, ACK, NACK, \
+    FEC_PACKET, LAST_FEC_PACKET, VERSION_1, VERSION_2, \
+    HEADER_SIZE, ACK_SIZE, MAX_MSS, SESSION_ID_SIZE, STRIPE_HELLO_SIZE, \
+    FEC_HEADER_SIZE, COMPRESSION_HEADER_SIZE, BLOCK_SIGNATURE, \
+    MAX_SIGNATURES, MAX_NACK_RANGES, SEQUENCE_MASK, pack_header, \
+    unpack_header, pack_session, unpack_session, pack_ack, unpack_ack, \
+    pack_sack, unpack_sack, pack_hello, unpack_hello, \
+    pack_signature_request, pack_signatures, unpack_signatures, \
+    pack_fec_header, unpack_fec_header, pack_compression_header, \
+    unpack_compression_header, pack_nack, unpack_nack, seq_add, seq_diff, \
+    seq_within, sack_ranges, acknowledged
+
+MSS = 500
+
+
+class RoundTripTest(unittest.TestCase):
+    """Every packet unpacks into the values it is packed from."""
+
+    def setUp(self):
+        self.buf = bytearray(MAX_MSS)
+
+    def test_header(self):
+        for seq_number in (0, 1000, SEQUENCE_MASK):
+            for indicator in (DATA_PACKET, LAST_DATA_PACKET):
+                pack_header(self.buf, seq_number, 0xbeef, indicator)
+                self.assertEqual(unpack_header(str(self.buf[:HEADER_SIZE])),
+                                 (seq_number, 0xbeef, indicator))
+
+    def test_header_after_session(self):
+        pack_session(self.buf, 0xdeadbeef)
+        pack_header(self.buf, 12345, 0x1234, offset=SESSION_ID_SIZE)
+        self.assertEqual(unpack_session(self.buf), 0xdeadbeef)
+        self.assertEqual(unpack_header(buffer(self.buf, SESSION_ID_SIZE)),
+                         (12345, 0x1234, DATA_PACKET))
+
+    def test_header_layout(self):
+        pack_header(self.buf, 0x01020304, 0x0506)
+        self.assertEqual(str(self.buf[:HEADER_SIZE]),
+                         '\x01\x02\x03\x04\x05\x06\x55\x55')
+
+    def test_ack(self):
+        pack_ack(self.buf, SEQUENCE_MASK)
+        self.assertEqual(unpack_ack(buffer(self.buf, 0, ACK_SIZE)),
+                         (SEQUENCE_MASK, 0, ACK))
+
+    def test_hello(self):
+        for version in (VERSION_1, VERSION_2):
+            for codec in (0, 1, 2, 0x3f):
+                for resume in (False, True):
+                    for delta in (False, True):
+                        size = pack_hello(self.buf, version, 0xcafe, None,
+                                          codec, resume, delta)
+                        self.assertEqual(size, ACK_SIZE)
+                        self.assertEqual(
+                            unpack_hello(buffer(self.buf, 0, size)),
+                            (version, 0xcafe, None, codec, resume, delta))
+
+    def test_hello_offset(self):
+        for offset in (0, 4096, 2 ** 64 - 1):
+            size = pack_hello(self.buf, VERSION_2, offset=offset, codec=1,
+                              resume=True)
+            self.assertEqual(size, STRIPE_HELLO_SIZE)
+            self.assertEqual(unpack_hello(buffer(self.buf, 0, size)),
+                             (VERSION_2, 0, offset, 1, True, False))
+
+    def test_not_hello(self):
+        pack_ack(self.buf, 0)
+        self.assertRaises(ValueError, unpack_hello,
+                          buffer(self.buf, 0, ACK_SIZE))
+        pack_hello(self.buf, VERSION_2)
+        self.assertRaises(ValueError, unpack_hello,
+                          buffer(self.buf, 0, ACK_SIZE + 1))
+
+    def test_signature_request(self):
+        size = pack_signature_request(self.buf, 7, MAX_SIGNATURES)
+        self.assertEqual(unpack_signatures(buffer(self.buf, 0, size)),
+                         (7, MAX_SIGNATURES, []))
+
+    def test_signatures(self):
+        signatures = [(i * 0x01010101, struct.pack('!Q', i))
+                      for i in range(MAX_SIGNATURES)]
+        packed = ''.join(BLOCK_SIGNATURE.pack(*signature)
+                         for signature in signatures)
+        size = pack_signatures(self.buf, 3, packed)
+        self.assertEqual(size, ACK_SIZE + len(packed))
+        self.assertTrue(size <= MAX_MSS)
+        self.assertEqual(unpack_signatures(buffer(self.buf, 0, size)),
+                         (3, MAX_SIGNATURES, signatures))
+
+    def test_not_signatures(self):
+        size = pack_signatures(self.buf, 0, BLOCK_SIGNATURE.pack(1, 'a' * 8))
+        self.assertRaises(ValueError, unpack_signatures,
+                          buffer(self.buf, 0, size - 1))
+        pack_ack(self.buf, 0)
+        self.assertRaises(ValueError, unpack_signatures,
+                          buffer(self.buf, 0, ACK_SIZE))
+
+    def test_fec_header(self):
+        for indicator in (FEC_PACKET, LAST_FEC_PACKET):
+            pack_fec_header(self.buf, SEQUENCE_MASK, 0xabcd, indicator, 3,
+                            4, 16, MAX_MSS, 0x5a5, offset=SESSION_ID_SIZE)
+            self.assertEqual(
+                unpack_fec_header(buffer(self.buf, SESSION_ID_SIZE,
+                                         FEC_HEADER_SIZE)),
+                (SEQUENCE_MASK, 0xabcd, indicator, 3, 4, 16, MAX_MSS, 0x5a5))
+
+    def test_compression_header(self):
+        pack_compression_header(self.buf, 40, 0xfffffffe,
+                                offset=HEADER_SIZE)
+        self.assertEqual(unpack_compression_header(buffer(
+            self.buf, HEADER_SIZE, COMPRESSION_HEADER_SIZE)),
+            (40, 0xfffffffe))
+
+    def test_nack(self):
+        ranges = [(1000, 3000), (5000, 5500), (8000, 8000)]
+        size = pack_nack(self.buf, 500, ranges)
+        packet = buffer(self.buf, 0, size)
+        self.assertEqual(unpack_ack(packet), (500, len(ranges), NACK))
+        self.assertEqual(unpack_nack(packet), (500, ranges))
+
+    def test_nack_truncated(self):
+        ranges = [(i, i + 1) for i in range(0, 4 * MAX_NACK_RANGES, 2)]
+        size = pack_nack(self.buf, 0, ranges)
+        self.assertTrue(size <= MAX_MSS)
+        self.assertEqual(unpack_nack(buffer(self.buf, 0, size)),
+                         (0, ranges[:MAX_NACK_RANGES]))
+
+
+class SequenceTest(unittest.TestCase):
+    """Serial number arithmetic of the sequence numbers modulo 2^32."""
+
+    def test_add_wraps_around(self):
+        self.assertEqual(seq_add(SEQUENCE_MASK, 1), 0)
+        self.assertEqual(seq_add(SEQUENCE_MASK - 99, MSS), MSS - 100)
+        self.assertEqual(seq_add(1000, MSS), 1000 + MSS)
+
+    def test_diff_across_wrap(self):
+        self.assertEqual(seq_diff(0, SEQUENCE_MASK), 1)
+        self.assertEqual(seq_diff(SEQUENCE_MASK, 0), -1)
+        self.assertEqual(seq_diff(MSS - 100, SEQUENCE_MASK - 99), MSS)
+        self.assertEqual(seq_diff(SEQUENCE_MASK - 99, MSS - 100), -MSS)
+        self.assertEqual(seq_diff(1000, 1000), 0)
+
+    def test_diff_half_space(self):
+        self.assertEqual(seq_diff(0x7fffffff, 0), 0x7fffffff)
+        self.assertEqual(seq_diff(0x80000000, 0), -0x80000000)
+
+    def test_within_across_wrap(self):
+        start = seq_add(SEQUENCE_MASK, -MSS + 1)
+        end = seq_add(start, 3 * MSS)
+        self.assertTrue(seq_within(start, start, end))
+        self.assertTrue(seq_within(0, start, end))
+        self.assertTrue(seq_within(seq_add(end, -1), start, end))
+        self.assertFalse(seq_within(end, start, end))
+        self.assertFalse(seq_within(seq_add(start, -1), start, end))
+
+
+class SackTest(unittest.TestCase):
+    """SACK bitmap of the ACK of version 2 and the missing ranges."""
+
+    def sack(self, seq_number, bitmap, words):
+        buf = bytearray(MAX_MSS)
+        size = pack_sack(buf, seq_number, bitmap, words)
+        return buffer(buf, 0, size)
+
+    def test_header(self):
+        packet = self.sack(12345, 0, 1)
+        self.assertEqual(unpack_ack(packet), (12345, VERSION_2, ACK))
+
+    def test_round_trip(self):
+        bitmap = 0x80000001 << 32 | 0x00f0000f
+        self.assertEqual(unpack_sack(self.sack(7, bitmap, 2)),
+                         (7, bitmap, 64))
+
+    def test_no_gaps(self):
+        self.assertEqual(sack_ranges(1000, 0, 32, MSS), ([], 1000))
+
+    def test_ranges(self):
+        # Segments 2 and 4 past the next expected one are received
+        bitmap = 0b0101 << 28
+        ranges, highest = sack_ranges(0, bitmap, 32, MSS)
+        self.assertEqual(ranges, [(0, 2 * MSS), (3 * MSS, 4 * MSS)])
+        self.assertEqual(highest, 5 * MSS)
+
+    def test_ranges_across_wrap(self):
+        seq_number = seq_add(0, -2 * MSS)
+        bitmap = 0b0101 << 28
+        ranges, highest = sack_ranges(seq_number, bitmap, 32, MSS)
+        self.assertEqual(ranges, [(seq_number, 0), (MSS, 2 * MSS)])
+        self.assertEqual(highest, 3 * MSS)
+
+    def test_acknowledged_across_wrap(self):
+        seq_number = seq_add(0, -2 * MSS)
+        ranges, highest = sack_ranges(seq_number, 0b0101 << 28, 32, MSS)
+        # Before the next expected sequence number
+        self.assertTrue(acknowledged(seq_add(seq_number, -MSS), seq_number,
+                                     ranges, highest))
+        # Missing segments
+        self.assertFalse(acknowledged(seq_number, seq_number, ranges,
+                                      highest))
+        self.assertFalse(acknowledged(MSS, seq_number, ranges, highest))
+        # Received out-of-sequence segments past the wrap
+        self.assertTrue(acknowledged(0, seq_number, ranges, highest))
+        self.assertTrue(acknowledged(2 * MSS, seq_number, ranges, highest))
+        # Beyond the highest received segment
+        self.assertFalse(acknowledged(highest, seq_number, ranges, highest))
+
+    def test_cumulative_ack_across_wrap(self):
+        # Every segment before the next expected one past the wrap is ACKed
+        for seq_number in (seq_add(0, -MSS), seq_add(0, -3 * MSS)):
+            self.assertTrue(acknowledged(seq_number, MSS, [], MSS))
+        self.assertFalse(acknowledged(MSS, MSS, [], MSS))
+
+
+class NackTest(unittest.TestCase):
+    """Missing ranges of the NACK across the wrap."""
+
+    def test_acknowledged_across_wrap(self):
+        buf = bytearray(MAX_MSS)
+        seq_number = seq_add(0, -MSS)
+        ranges = [(seq_number, 0), (2 * MSS, 3 * MSS), (4 * MSS, 4 * MSS)]
+        size = pack_nack(buf, seq_number, ranges)
+        rcv_seq_number, rcv_ranges = unpack_nack(buffer(buf, 0, size))
+        self.assertEqual(rcv_seq_number, seq_number)
+        self.assertEqual(rcv_ranges, ranges)
+        highest = rcv_ranges[-1][1]
+        self.assertFalse(acknowledged(seq_number, rcv_seq_number, rcv_ranges,
+                                      highest))
+        self.assertTrue(acknowledged(0, rcv_seq_number, rcv_ranges, highest))
+        self.assertTrue(acknowledged(MSS, rcv_seq_number, rcv_ranges,
+                                     highest))
+        self.assertFalse(acknowledged(2 * MSS, rcv_seq_number, rcv_ranges,
+                                      highest))
+        self.assertTrue(acknowledged(3 * MSS, rcv_seq_number, rcv_ranges,
+                                     highest))
+        self.assertFalse(acknowledged(4 * MSS, rcv_seq_number, rcv_ranges,
+                                      highest))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+"""
+test_ngtitov_p2mpcompress.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Unit tests of the payload compression: the blocks must fit the payload of a
+data packet and decompress into the file, the incompressible data must be
+sent uncompressed, and a block that does not decompress into its size must
+be refused.
+
+Run the tests from the directory of the project:
+ > python -m unittest discover
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None (lz4 is optional)
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+import random
+import unittest
+import zlib
+from ngtitov_p2mpcompress import NO_COMPRESSION, ZLIB, LZ4, MAX_SPAN, \
+    MAX_BACKOFF, supported, accept, compress, decompress, BlockCompressor
+from ngtitov_p2mpcodec import HEADER_SIZE, COMPRESSION_HEADER_SIZE, \
+    COMPRESSION_HEADER
+
+MSS = 1000
+UNIT = MSS - HEADER_SIZE
+CAPACITY = UNIT - COMPRESSION_HEADER_SIZE
+WORDS = ('protocol', 'segment', 'server', 'client', 'window', 'packet')
+
+
+def block_of(codec, data, span=1):
+    """Builds the payload of the compressed data packet of the data."""
+    return COMPRESSION_HEADER.pack(span, len(data)) + compress(codec, data)
+
+
+class CodecTest(unittest.TestCase):
+    """Negotiation of the codec and the decompression of the blocks."""
+
+    def setUp(self):
+        self.codecs = [ZLIB]
+        if supported(LZ4):
+            self.codecs.append(LZ4)
+
+    def test_accept(self):
+        self.assertTrue(supported(ZLIB))
+        self.assertFalse(supported(NO_COMPRESSION))
+        self.assertEqual(accept(NO_COMPRESSION), NO_COMPRESSION)
+        self.assertEqual(accept(ZLIB), ZLIB)
+        self.assertEqual(accept(LZ4), LZ4 if supported(LZ4) else ZLIB)
+        self.assertEqual(accept(7), ZLIB)
+
+    def test_round_trip(self):
+        for codec in self.codecs:
+            for data in ('', 'a', 'abc' * 1000, ''.join(
+                    chr(i % 251) for i in range(5000))):
+                self.assertEqual(decompress(codec, block_of(codec, data)),
+                                 data)
+                self.assertEqual(decompress(codec, buffer(
+                    block_of(codec, data))), data)
+
+    def test_size_mismatch(self):
+        for codec in self.codecs:
+            data = 'abc' * 1000
+            compressed = compress(codec, data)
+            for size in (len(data) - 1, len(data) + 1, 0):
+                self.assertRaises(ValueError, decompress, codec,
+                                  COMPRESSION_HEADER.pack(1, size) +
+                                  compressed)
+
+    def test_inflation_capped(self):
+        # The block claims 100 bytes, but inflates into 64 MB
+        block = COMPRESSION_HEADER.pack(1, 100) + \
+            zlib.compress('\0' * (64 << 20), 9)
+        self.assertTrue(len(block) < 100000)
+        self.assertRaises(ValueError, decompress, ZLIB, block)
+
+    def test_corrupted(self):
+        for codec in self.codecs:
+            self.assertRaises(ValueError, decompress, codec,
+                              COMPRESSION_HEADER.pack(1, 10) + 'not data')
+
+
+class BlockCompressorTest(unittest.TestCase):
+    """Blocks of whole segments adapted to the compression ratio."""
+
+    def setUp(self):
+        self.generator = random.Random(17)
+
+    def text(self, size):
+        """Generates the compressible text of the size."""
+        words = []
+        length = 0
+        while length < size:
+            words.append(self.generator.choice(WORDS))
+            length = length + len(words[-1]) + 1
+        return ' '.join(words)[:size]
+
+    def noise(self, size):
+        """Generates the incompressible data of the size."""
+        return ('%0*x' % (2 * size, self.generator.getrandbits(
+            8 * size))).decode('hex')
+
+    def send(self, compressor, data):
+        """Splits the data into the payloads the way the Client does.
+
+        Returns:
+            List of the span, size and compressed data of every block, None
+            for the segment sent uncompressed
+        """
+        blocks = []
+        offset = 0
+        while offset < len(data):
+            block = compressor.compress_block(data, offset, len(data))
+            blocks.append(block)
+            if block is None:
+                offset = offset + min(UNIT, len(data) - offset)
+            else:
+                span, size, compressed = block
+                self.assertTrue(len(compressed) <= CAPACITY)
+                self.assertTrue(span <= MAX_SPAN)
+                self.assertEqual(size, min(span * UNIT, len(data) - offset))
+                self.assertEqual(decompress(
+                    ZLIB, COMPRESSION_HEADER.pack(span, size) + compressed),
+                    data[offset:offset + size])
+                offset = offset + size
+        return blocks
+
+    def test_span_grows(self):
+        compressor = BlockCompressor(ZLIB, UNIT, CAPACITY)
+        blocks = self.send(compressor, self.text(200 * UNIT))
+        spans = [block[0] for block in blocks]
+        # The first block is a single segment, the next ones take as many
+        # segments as its ratio promises
+        self.assertEqual(spans[0], 1)
+        self.assertTrue(spans[1] > 1)
+        self.assertTrue(len(blocks) < 200 // 2)
+        self.assertEqual(compressor.backoff, 1)
+
+    def test_span_capped(self):
+        compressor = BlockCompressor(ZLIB, UNIT, CAPACITY)
+        blocks = self.send(compressor, '\0' * (3 * MAX_SPAN * UNIT))
+        self.assertEqual(max(block[0] for block in blocks), MAX_SPAN)
+
+    def test_span_shrinks(self):
+        # The span promised by the text does not fit the noise after it
+        compressor = BlockCompressor(ZLIB, UNIT, CAPACITY)
+        text = self.text(20 * UNIT)
+        data = text + self.text(2 * UNIT) + self.noise(2 * UNIT) + text
+        blocks = self.send(compressor, data)
+        self.assertTrue(None in blocks)
+        self.assertEqual(blocks[-1][1] + sum(
+            UNIT if block is None else block[1] for block in blocks[:-1]),
+            len(data))
+
+    def test_backoff(self):
+        compressor = BlockCompressor(ZLIB, UNIT, CAPACITY)
+        data = self.noise(200 * UNIT)
+        skips = []
+        for i in range(200):
+            tried = not compressor.skip
+            self.assertEqual(compressor.compress_block(data, i * UNIT,
+                                                       len(data)), None)
+            if tried:
+                skips.append(compressor.skip)
+        # The segments skipped double after every segment that does not
+        # compress, up to MAX_BACKOFF
+        self.assertEqual(skips, [1, 2, 4, 8, 16, 32, 64, 64, 64])
+        self.assertEqual(compressor.backoff, MAX_BACKOFF)
+
+    def test_backoff_reset(self):
+        compressor = BlockCompressor(ZLIB, UNIT, CAPACITY)
+        data = self.noise(3 * UNIT) + self.text(10 * UNIT)
+        blocks = self.send(compressor, data)
+        # Noise, skipped noise and noise, then two segments of the text are
+        # skipped before the compression is tried again
+        self.assertEqual(blocks[:5], [None] * 5)
+        self.assertNotEqual(blocks[5], None)
+        self.assertEqual(compressor.backoff, 1)
+        self.assertEqual(compressor.skip, 0)
+
+    def test_short_end(self):
+        compressor = BlockCompressor(ZLIB, UNIT, CAPACITY)
+        compressor.span = 10
+        span, size, compressed = compressor.compress_block(
+            self.text(UNIT + 10), 0, UNIT + 10)
+        self.assertEqual((span, size), (2, UNIT + 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
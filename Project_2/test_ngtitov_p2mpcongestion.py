@@ -0,0 +1,205 @@
+"""
+test_ngtitov_p2mpcongestion.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Unit tests of the pacing and congestion control of the P2MP-FTP Client: the
+token bucket and the congestion window are driven by the time the tests
+give them.
+
+Run the tests from the directory of the project:
+ > python -m unittest discover
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+import unittest
+from ngtitov_p2mpcongestion import INITIAL_WINDOW, MIN_WINDOW, \
+    SLOW_START_GAIN, CONGESTION_AVOIDANCE_GAIN, BURST_SEGMENTS, BURST_TIME, \
+    TokenBucket, CongestionWindow
+
+MSS = 1000
+# Rate of the bucket of the smallest depth, and of the depth set by time
+RATE = 100000
+FAST_RATE = 10000000
+START = 1000.0
+
+
+class TokenBucketTest(unittest.TestCase):
+    """Tokens of the bytes the Client may send."""
+
+    def test_depth(self):
+        bucket = TokenBucket(RATE, MSS, START)
+        self.assertEqual(bucket.depth, BURST_SEGMENTS * MSS)
+        self.assertEqual(bucket.tokens, bucket.depth)
+        bucket = TokenBucket(FAST_RATE, MSS, START)
+        self.assertEqual(bucket.depth, FAST_RATE * BURST_TIME)
+
+    def test_refill_capped(self):
+        bucket = TokenBucket(RATE, MSS, START)
+        bucket.consume(1500, START)
+        self.assertEqual(bucket.tokens, 500)
+        bucket.refill(START + 0.001)
+        self.assertAlmostEqual(bucket.tokens, 600)
+        # The idle time does not save up more than the depth
+        bucket.refill(START + 100)
+        self.assertEqual(bucket.tokens, bucket.depth)
+        # The time going backwards adds nothing
+        bucket.consume(1000, START + 100)
+        bucket.refill(START + 50)
+        self.assertEqual(bucket.tokens, 1000)
+        self.assertEqual(bucket.stamp, START + 100)
+
+    def test_debt(self):
+        bucket = TokenBucket(RATE, MSS, START)
+        for _ in range(5):
+            bucket.consume(MSS, START)
+        self.assertEqual(bucket.tokens, -3 * MSS)
+        self.assertFalse(bucket.admits(MSS, START))
+        # The debt is paid off before the next datagram is admitted
+        self.assertFalse(bucket.admits(MSS, START + 0.039))
+        self.assertTrue(bucket.admits(MSS, START + 0.041))
+
+    def test_admits(self):
+        bucket = TokenBucket(RATE, MSS, START)
+        self.assertTrue(bucket.admits(MSS, START))
+        # The datagram larger than the depth waits for a full bucket only
+        self.assertTrue(bucket.admits(10 * MSS, START))
+        bucket.consume(1, START)
+        self.assertFalse(bucket.admits(10 * MSS, START))
+
+    def test_next_time(self):
+        bucket = TokenBucket(RATE, MSS, START)
+        self.assertEqual(bucket.next_time(MSS, START), START)
+        bucket.consume(2 * MSS, START)
+        self.assertAlmostEqual(bucket.next_time(MSS, START), START + 0.01)
+        self.assertAlmostEqual(bucket.next_time(MSS, START + 0.004),
+                               START + 0.01)
+        bucket.consume(2 * MSS, START + 0.004)
+        # The debt of 1600 bytes and the datagram of 1000 bytes
+        self.assertAlmostEqual(bucket.next_time(MSS, START + 0.004),
+                               START + 0.03)
+        self.assertAlmostEqual(bucket.next_time(10 * MSS, START + 0.004),
+                               START + 0.04)
+        # The datagram is admitted at that time
+        now = bucket.next_time(MSS, START + 0.004)
+        self.assertFalse(bucket.admits(MSS, now - 0.001))
+        self.assertTrue(bucket.admits(MSS, now + 1e-9))
+
+    def test_set_rate(self):
+        bucket = TokenBucket(FAST_RATE, MSS, START)
+        bucket.consume(bucket.depth, START)
+        # The tokens of the previous rate are counted first
+        bucket.set_rate(RATE, MSS, START + 0.0001)
+        self.assertAlmostEqual(bucket.tokens, 1000, places=4)
+        self.assertEqual(bucket.depth, BURST_SEGMENTS * MSS)
+        bucket.set_rate(FAST_RATE, MSS, START + 1)
+        self.assertEqual(bucket.tokens, BURST_SEGMENTS * MSS)
+        # The depth cuts the tokens of the slower rate
+        bucket.refill(START + 2)
+        bucket.set_rate(RATE, MSS, START + 2)
+        self.assertEqual(bucket.tokens, BURST_SEGMENTS * MSS)
+
+
+class CongestionWindowTest(unittest.TestCase):
+    """Congestion window of the path to a Server."""
+
+    def test_initial(self):
+        window = CongestionWindow(64)
+        self.assertEqual(window.size, INITIAL_WINDOW)
+        self.assertEqual(window.segments(), INITIAL_WINDOW)
+        self.assertTrue(window.slow_start())
+        self.assertEqual(CongestionWindow(2).size, 2)
+
+    def test_slow_start(self):
+        window = CongestionWindow(64)
+        # Every ACK adds a segment, i.e. the window doubles every RTT
+        for _ in range(INITIAL_WINDOW):
+            window.on_ack()
+        self.assertEqual(window.size, 2 * INITIAL_WINDOW)
+        for _ in range(100):
+            window.on_ack()
+        self.assertEqual(window.size, 64)
+
+    def test_congestion_avoidance(self):
+        window = CongestionWindow(64)
+        window.size = 16.0
+        window.threshold = 16.0
+        self.assertFalse(window.slow_start())
+        # A window of ACKs adds about a segment
+        for _ in range(16):
+            window.on_ack()
+        self.assertTrue(16.9 < window.size < 17.0)
+        self.assertEqual(window.segments(), 16)
+        for _ in range(10000):
+            window.on_ack()
+        self.assertEqual(window.size, 64)
+
+    def test_pacing_rate(self):
+        window = CongestionWindow(64)
+        self.assertAlmostEqual(window.pacing_rate(MSS, 0.1),
+                               SLOW_START_GAIN * INITIAL_WINDOW * MSS / 0.1)
+        window.threshold = window.size
+        self.assertAlmostEqual(
+            window.pacing_rate(MSS, 0.1),
+            CONGESTION_AVOIDANCE_GAIN * INITIAL_WINDOW * MSS / 0.1)
+        # The RTT of zero does not divide by zero
+        self.assertTrue(window.pacing_rate(MSS, 0) > 0)
+
+    def test_one_reduction_per_window(self):
+        window = CongestionWindow(64)
+        window.size = 32.0
+        self.assertTrue(window.on_loss(START, START + 0.1))
+        self.assertEqual((window.size, window.threshold), (16, 16))
+        # The losses of the segments sent before the reduction do not
+        # reduce the window again
+        self.assertFalse(window.on_loss(START, START + 0.2))
+        self.assertFalse(window.on_loss(START + 0.09, START + 0.2))
+        self.assertEqual(window.size, 16)
+        self.assertEqual(window.reductions, 1)
+        # The loss of a segment sent after it does
+        self.assertTrue(window.on_loss(START + 0.1, START + 0.3))
+        self.assertEqual((window.size, window.threshold), (8, 8))
+        self.assertEqual(window.reductions, 2)
+        self.assertFalse(window.slow_start())
+
+    def test_smallest_window(self):
+        window = CongestionWindow(64)
+        window.size = 1.0
+        self.assertTrue(window.on_loss(START, START))
+        self.assertEqual(window.size, MIN_WINDOW)
+        window.size = 0.5
+        self.assertEqual(window.segments(), MIN_WINDOW)
+
+    def test_timeout(self):
+        window = CongestionWindow(64)
+        window.size = 20.0
+        window.on_timeout(START)
+        self.assertEqual(window.size, MIN_WINDOW)
+        self.assertEqual(window.threshold, 10)
+        self.assertEqual(window.recovery_start, START)
+        self.assertEqual(window.reductions, 1)
+        self.assertTrue(window.slow_start())
+        # The losses of the segments sent before the timeout are ignored
+        self.assertFalse(window.on_loss(START - 0.5, START + 0.1))
+        # The slow start runs up to the threshold, then the window grows
+        # by about a segment per window
+        for _ in range(9):
+            window.on_ack()
+        self.assertEqual(window.size, 10)
+        window.on_ack()
+        self.assertAlmostEqual(window.size, 10.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,230 @@
+"""
+test_ngtitov_p2mpdelta.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Unit tests of the delta of the file against its older version: the file
+patched by the delta must be the file sent, and a delta that does not fit
+the older version must be refused.
+
+Run the tests from the directory of the project:
+ > python -m unittest discover
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from ngtitov_p2mpcodec import BLOCK_SIGNATURE
+from ngtitov_p2mpdelta import MIN_DELTA_BLOCK, MAX_DELTA_BLOCK, MAX_LITERAL, \
+    DELTA_MAGIC, LITERAL, COPY, DELTA_HEADER, LITERAL_HEADER, \
+    COPY_INSTRUCTION, END_INSTRUCTION, delta_block_size, sign_block, Basis, \
+    DeltaReader, DeltaPatcher
+
+# Size of the reads of the delta, as the payloads of the segments
+READ_SIZE = 1000
+
+
+def random_data(generator, size):
+    """Generates the random data of the size."""
+    if not size:
+        return ''
+    return ('%0*x' % (2 * size, generator.getrandbits(8 * size))).decode(
+        'hex')
+
+
+class BlockSizeTest(unittest.TestCase):
+    """Block size of the delta of the file."""
+
+    def test_block_size(self):
+        self.assertEqual(delta_block_size(0), MIN_DELTA_BLOCK)
+        self.assertEqual(delta_block_size(3000000), 2048)
+        self.assertEqual(delta_block_size(2 ** 30), 32768)
+        self.assertEqual(delta_block_size(2 ** 40), MAX_DELTA_BLOCK)
+
+
+class DeltaTest(unittest.TestCase):
+    """Round trip of the file through the delta against the older
+    version."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.generator = random.Random(25)
+        self.new_name = os.path.join(self.directory, 'new')
+        self.old_name = os.path.join(self.directory, 'old')
+        self.out_name = os.path.join(self.directory, 'out')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def save(self, file_name, data):
+        with open(file_name, 'wb') as file_out:
+            file_out.write(data)
+
+    def make_delta(self, new, old=None):
+        """Produces the delta of the new file against the older version the
+        way the Client does, and patches the older version by it the way
+        the Server does.
+
+        Args:
+            new: data of the new file
+            old: data of the older version, None if there is none
+
+        Returns:
+            Tuple of the delta and the reader that produced it
+        """
+        self.save(self.new_name, new)
+        if old is not None:
+            self.save(self.old_name, old)
+        block = delta_block_size(len(new))
+        basis = Basis(self.old_name)
+        basis.sign(block)
+        blocks = set(BLOCK_SIGNATURE.unpack_from(basis.signatures, i)
+                     for i in range(0, len(basis.signatures),
+                                    BLOCK_SIGNATURE.size))
+        basis.close()
+        reader = DeltaReader(self.new_name, blocks, block)
+        chunks = []
+        while True:
+            data = reader.read(READ_SIZE)
+            chunks.append(data)
+            if len(data) < READ_SIZE:
+                break
+        reader.close()
+        return ''.join(chunks), reader
+
+    def patch(self, delta, chunk_size=READ_SIZE):
+        """Patches the older version by the delta received in chunks.
+
+        Returns:
+            Data of the patched file
+        """
+        patcher = DeltaPatcher(Basis(self.old_name),
+                               open(self.out_name, 'wb'))
+        try:
+            for i in range(0, len(delta), chunk_size):
+                patcher.write(delta[i:i + chunk_size])
+        finally:
+            patcher.close()
+        self.assertTrue(patcher.done)
+        with open(self.out_name, 'rb') as file_in:
+            return file_in.read()
+
+    def round_trip(self, new, old=None):
+        delta, reader = self.make_delta(new, old)
+        self.assertEqual(self.patch(delta), new)
+        self.assertEqual(reader.literal + reader.copied, len(new))
+        return delta, reader
+
+    def test_empty_basis(self):
+        new = random_data(self.generator, 3 * MAX_LITERAL + 123)
+        delta, reader = self.round_trip(new)
+        self.assertEqual(reader.copied, 0)
+        # The literal instructions carry at most MAX_LITERAL bytes each
+        self.assertEqual(len(delta), DELTA_HEADER.size + 4 *
+                         LITERAL_HEADER.size + len(new) +
+                         END_INSTRUCTION.size)
+        offset = DELTA_HEADER.size
+        sizes = []
+        while delta[offset] == LITERAL:
+            size = LITERAL_HEADER.unpack_from(delta, offset)[1]
+            sizes.append(size)
+            offset = offset + LITERAL_HEADER.size + size
+        self.assertEqual(sizes, [MAX_LITERAL] * 3 + [123])
+
+    def test_empty_file(self):
+        delta, reader = self.round_trip('', random_data(self.generator,
+                                                        5000))
+        self.assertEqual(len(delta), DELTA_HEADER.size + END_INSTRUCTION.size)
+
+    def test_smaller_than_block(self):
+        old = random_data(self.generator, 5000)
+        delta, reader = self.round_trip(old[:MIN_DELTA_BLOCK - 1], old)
+        self.assertEqual(reader.copied, 0)
+
+    def test_unchanged(self):
+        new = random_data(self.generator, 300000)
+        delta, reader = self.round_trip(new, new)
+        block = delta_block_size(len(new))
+        self.assertEqual(reader.copied, len(new) // block * block)
+        self.assertTrue(len(delta) < len(new) // 50)
+
+    def test_shifted_insert(self):
+        old = random_data(self.generator, 300000)
+        block = delta_block_size(len(old))
+        # The rolling checksum finds the blocks at every shift
+        for shift in (1, 7, block - 1, block + 1, 3 * block):
+            insert = random_data(self.generator, shift)
+            new = old[:5000] + insert + old[5000:]
+            delta, reader = self.round_trip(new, old)
+            # Only the block the insertion hits and the tail shorter than
+            # a block are sent as literal data
+            self.assertTrue(reader.literal <= shift + 2 * block, shift)
+
+    def test_replace_with_unchanged_tail(self):
+        old = random_data(self.generator, 200000)
+        new = old[:50000] + random_data(self.generator, 3000) + old[53000:]
+        delta, reader = self.round_trip(new, old)
+        block = delta_block_size(len(new))
+        self.assertTrue(reader.literal <= 3000 + 3 * block)
+        self.assertTrue(reader.copied >= len(new) - 3000 - 3 * block)
+
+    def test_chunk_sizes(self):
+        old = random_data(self.generator, 20000)
+        new = old[:7000] + 'inserted' + old[7000:]
+        delta, reader = self.make_delta(new, old)
+        for chunk_size in (1, 2, 13, len(delta)):
+            self.assertEqual(self.patch(delta, chunk_size), new)
+
+    def test_corrupted_copy(self):
+        old = random_data(self.generator, 20000)
+        self.save(self.old_name, old)
+        weak, strong = sign_block(old[:delta_block_size(len(old))])
+        delta = DELTA_HEADER.pack(DELTA_MAGIC, delta_block_size(len(old)),
+                                  len(old)) + \
+            COPY_INSTRUCTION.pack(COPY, weak, 'x' * 8)
+        self.assertRaises(IOError, self.patch, delta)
+
+    def test_corrupted_digest(self):
+        old = random_data(self.generator, 20000)
+        new = old[:10000] + 'changed' + old[10007:]
+        delta, reader = self.make_delta(new, old)
+        corrupted = delta[:-1] + chr(ord(delta[-1]) ^ 1)
+        self.assertRaises(IOError, self.patch, corrupted)
+
+    def test_corrupted_literal(self):
+        old = random_data(self.generator, 20000)
+        new = old[:10000] + 'changed' + old[10007:]
+        delta, reader = self.make_delta(new, old)
+        literal = delta.index('changed')
+        corrupted = delta[:literal] + 'CHANGED' + delta[literal + 7:]
+        self.assertRaises(IOError, self.patch, corrupted)
+
+    def test_different_basis(self):
+        # The older version of the Server is not the one the delta is made
+        # against
+        old = random_data(self.generator, 20000)
+        new = old[:10000] + 'changed' + old[10007:]
+        delta, reader = self.make_delta(new, old)
+        self.save(self.old_name, random_data(self.generator, 20000))
+        self.assertRaises(IOError, self.patch, delta)
+
+    def test_not_delta(self):
+        self.assertRaises(IOError, self.patch, 'Not a delta at all')
+
+
+if __name__ == '__main__':
+    unittest.main()
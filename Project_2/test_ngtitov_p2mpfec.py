@@ -0,0 +1,222 @@
+"""
+test_ngtitov_p2mpfec.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Unit tests of the forward error correction: the segment lost out of every
+parity packet of the block must be rebuilt byte for byte, by the NumPy and
+the long integer XOR alike.
+
+Run the tests from the directory of the project:
+ > python -m unittest discover
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None (NumPy is optional)
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+import random
+import unittest
+import ngtitov_p2mpfec
+from ngtitov_p2mpfec import PARITY_OFFSET, xor_into, parity_checksum, \
+    recover, ParityEncoder
+from ngtitov_p2mpcodec import FEC_PACKET, LAST_FEC_PACKET, HEADER_SIZE, \
+    SESSION_ID_SIZE, FEC_HEADER_SIZE, seq_add, unpack_session, \
+    unpack_fec_header
+
+SESSION = 0x5730601
+MSS = 500
+PAYLOAD_SIZE = MSS - HEADER_SIZE
+# Sequence number of the first segment, close to the wrap around
+FIRST_SEQ_NUMBER = 0xffffffff - 3 * MSS
+
+
+class FecTest(unittest.TestCase):
+    """XOR in place, parity packets of the blocks of segments and the
+    recovery of the missing payload, by NumPy when it is installed."""
+
+    def setUp(self):
+        self.generator = random.Random(16)
+
+    def random_payload(self, size):
+        return ''.join(chr(self.generator.randrange(256))
+                       for _ in range(size))
+
+    def test_xor_into(self):
+        parity = bytearray('\x0f' * 8)
+        xor_into(parity, '\xff\x00\xf0', 2)
+        self.assertEqual(str(parity), '\x0f\x0f\xf0\x0f\xff\x0f\x0f\x0f')
+        xor_into(parity, '')
+        xor_into(parity, buffer('\xff\x00\xf0'), 2)
+        self.assertEqual(str(parity), '\x0f' * 8)
+        # The leading zeros of the long integer XOR are kept
+        xor_into(parity, '\x0f\x0f')
+        self.assertEqual(str(parity), '\x00\x00' + '\x0f' * 6)
+
+    def test_recover(self):
+        payloads = [self.random_payload(size) for size in (300, 17, 300, 0)]
+        for missing in range(len(payloads)):
+            parity = bytearray(300)
+            length = 0
+            for payload in payloads:
+                xor_into(parity, payload)
+                length = length ^ len(payload)
+            others = payloads[:missing] + payloads[missing + 1:]
+            self.assertEqual(str(recover(parity, length, others)),
+                             payloads[missing])
+
+    def test_length_xor(self):
+        # The XOR of the sizes gives the size of the missing payload, the
+        # trailing zeros of the parity are not a part of it
+        payloads = ['abc\0\0', 'x' * 9]
+        parity = bytearray(9)
+        for payload in payloads:
+            xor_into(parity, payload)
+        self.assertEqual(str(recover(parity, 5 ^ 9, ['x' * 9])), 'abc\0\0')
+        self.assertEqual(str(recover(parity, 5 ^ 9, ['abc\0\0'])), 'x' * 9)
+        # The size that does not fit the parity packet
+        self.assertEqual(recover(parity, 5 ^ 9 ^ 16, ['abc\0\0']), None)
+
+    def segments(self, count, last_size=PAYLOAD_SIZE):
+        """Makes the payloads of the segments of the file."""
+        return [self.random_payload(PAYLOAD_SIZE)
+                for _ in range(count - 1)] + \
+            [self.random_payload(last_size)]
+
+    def encode(self, encoder, payloads):
+        """Adds the payloads to the encoder.
+
+        Returns:
+            List of the sequence number of every segment and list of the
+            parity packets of every block
+        """
+        seq_numbers = []
+        blocks = []
+        seq_number = FIRST_SEQ_NUMBER
+        for i, payload in enumerate(payloads):
+            seq_numbers.append(seq_number)
+            parity = encoder.add(seq_number, payload,
+                                 i == len(payloads) - 1)
+            if parity is not None:
+                blocks.append([str(packet) for packet in parity])
+            seq_number = seq_add(seq_number, MSS)
+        return seq_numbers, blocks
+
+    def check_recovery(self, packet, history):
+        """Rebuilds every segment of the parity packet from the others the
+        way the Server does.
+
+        Args:
+            packet: parity packet preceded by the session ID
+            history: payloads of the segments as sequence number -> payload
+
+        Returns:
+            FEC header of the parity packet
+        """
+        self.assertEqual(unpack_session(packet), SESSION)
+        datagram = buffer(packet, SESSION_ID_SIZE)
+        header = unpack_fec_header(datagram)
+        (seq_number, checksum, indicator, index, count, block_size,
+         segment_size, length) = header
+        parity = buffer(datagram, FEC_HEADER_SIZE)
+        self.assertEqual(len(parity), PAYLOAD_SIZE)
+        self.assertEqual(parity_checksum(
+            seq_number, indicator, index, count, block_size, segment_size,
+            length, parity), checksum)
+        self.assertEqual(segment_size, MSS)
+        members = [seq_add(seq_number, i * segment_size)
+                   for i in range(index, block_size, count)]
+        for missing in members:
+            others = [history[member] for member in members
+                      if member != missing]
+            self.assertEqual(str(recover(parity, length, others)),
+                             history[missing])
+        return header
+
+    def test_fixed(self):
+        # K = 8, R = 3: the groups of the block are 3, 3 and 2 segments
+        payloads = self.segments(20, 123)
+        encoder = ParityEncoder(8, 3, SESSION, MSS)
+        seq_numbers, blocks = self.encode(encoder, payloads)
+        history = dict(zip(seq_numbers, payloads))
+        self.assertEqual([len(block) for block in blocks], [3, 3, 3])
+        for i, block in enumerate(blocks):
+            for index, packet in enumerate(block):
+                header = self.check_recovery(packet, history)
+                self.assertEqual(header[0], seq_numbers[8 * i])
+                self.assertEqual(header[3:5], (index, 3))
+                self.assertEqual(header[2], LAST_FEC_PACKET if i == 2
+                                 else FEC_PACKET)
+        # The last block holds the 4 segments left
+        self.assertEqual(unpack_fec_header(buffer(
+            blocks[2][0], SESSION_ID_SIZE))[5], 4)
+
+    def test_short_last_block(self):
+        # The last block of 2 segments leaves 3 of 5 parity packets empty,
+        # they are not sent
+        payloads = self.segments(12, 1)
+        encoder = ParityEncoder(10, 5, SESSION, MSS)
+        seq_numbers, blocks = self.encode(encoder, payloads)
+        history = dict(zip(seq_numbers, payloads))
+        self.assertEqual([len(block) for block in blocks], [5, 2])
+        for packet in blocks[1]:
+            header = self.check_recovery(packet, history)
+            self.assertEqual(header[2], LAST_FEC_PACKET)
+            self.assertEqual(header[4:6], (5, 2))
+        # The encoder starts the next block afresh
+        self.assertEqual(encoder.segments, 0)
+
+    def test_single_segment(self):
+        encoder = ParityEncoder(4, 2, SESSION, MSS)
+        parity = encoder.add(FIRST_SEQ_NUMBER, '', True)
+        self.assertEqual(len(parity), 1)
+        self.assertEqual(len(parity[0]), PARITY_OFFSET + PAYLOAD_SIZE)
+        self.check_recovery(str(parity[0]), {FIRST_SEQ_NUMBER: ''})
+
+    def test_adapt(self):
+        encoder = ParityEncoder(10, None, SESSION, MSS)
+        self.assertEqual(encoder.count, 1)
+        # Less than a block transmitted since the last adaptation
+        encoder.adapt(9, 5)
+        self.assertEqual(encoder.count, 1)
+        encoder.adapt(100, 5)
+        self.assertEqual(encoder.count, 2)
+        # The started block is not changed
+        encoder.add(FIRST_SEQ_NUMBER, 'x', False)
+        encoder.adapt(200, 50)
+        self.assertEqual(encoder.count, 2)
+        self.assertEqual(encoder.transmitted, 100)
+        for _ in range(9):
+            encoder.add(FIRST_SEQ_NUMBER, 'x', False)
+        encoder.adapt(300, 50)
+        self.assertEqual(encoder.count, 4)
+        encoder.adapt(400, 50)
+        self.assertEqual(encoder.count, 3)
+        # The fixed number of parity packets is kept
+        encoder = ParityEncoder(10, 3, SESSION, MSS)
+        encoder.adapt(100, 50)
+        self.assertEqual(encoder.count, 3)
+
+
+class LongIntegerFecTest(FecTest):
+    """Parity packets and the recovery by the long integer XOR."""
+
+    def setUp(self):
+        FecTest.setUp(self)
+        self.numpy = ngtitov_p2mpfec.numpy
+        ngtitov_p2mpfec.numpy = None
+
+    def tearDown(self):
+        ngtitov_p2mpfec.numpy = self.numpy
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+test_ngtitov_p2mppipeline.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Unit tests of the pipelined receiver of the P2MP-FTP Server.
+
+Run the tests from the directory of the project:
+ > python -m unittest discover
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+from socket import socket, AF_INET, SOCK_DGRAM
+from StringIO import StringIO
+import sys
+import threading
+import unittest
+from ngtitov_p2mppipeline import ReceivePipeline
+
+IDLE_INTERVAL = 0.05
+# Time the pipeline is given to close before it is taken for hung
+CLOSE_TIMEOUT = 5.0
+
+
+class MemoryWriter:
+    """Writer of the output file keeping the payloads in memory."""
+
+    def __init__(self):
+        self.writes = []
+        self.closed = False
+
+    def write(self, offset, payload):
+        self.writes.append((offset, str(payload)))
+
+    def close(self):
+        self.closed = True
+
+
+class PipelineTest(unittest.TestCase):
+    """Receiver and writer threads around the pool of buffers."""
+
+    def setUp(self):
+        self.server_socket = socket(AF_INET, SOCK_DGRAM)
+        self.server_socket.bind(('127.0.0.1', 0))
+        self.client_socket = socket(AF_INET, SOCK_DGRAM)
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        self.server_socket.close()
+        self.client_socket.close()
+
+    def send(self, data):
+        self.client_socket.sendto(data, self.server_socket.getsockname())
+
+    def receive(self, pipeline):
+        """Takes the next datagram, skipping the idle ones."""
+        for _ in range(int(CLOSE_TIMEOUT / IDLE_INTERVAL)):
+            buf, nbytes, address = pipeline.receive()
+            if buf is not None:
+                return str(buf[:nbytes])
+        self.fail('No datagram received')
+
+    def close(self, pipeline):
+        """Closes the pipeline in a thread, so a hang fails the test."""
+        closing = threading.Thread(target=pipeline.close)
+        closing.daemon = True
+        closing.start()
+        closing.join(CLOSE_TIMEOUT)
+        self.assertFalse(closing.is_alive(), 'Pipeline did not close')
+
+    def test_close_after_datagram_not_handed_over(self):
+        # The only buffer holds a datagram the worker dropped, e.g. a HELLO
+        pipeline = ReceivePipeline(self.server_socket, 1, IDLE_INTERVAL)
+        self.send('hello')
+        self.assertEqual(self.receive(pipeline), 'hello')
+        self.close(pipeline)
+
+    def test_close_after_datagram_handed_over(self):
+        pipeline = ReceivePipeline(self.server_socket, 1, IDLE_INTERVAL)
+        file_out = MemoryWriter()
+        for i in range(3):
+            self.send('payload{}'.format(i))
+            data = self.receive(pipeline)
+            pipeline.write(file_out, 10 * i, buffer(data))
+        pipeline.close_file(file_out)
+        self.close(pipeline)
+        self.assertEqual(file_out.writes, [(0, 'payload0'), (10, 'payload1'),
+                                           (20, 'payload2')])
+        self.assertTrue(file_out.closed)
+
+    def test_inline(self):
+        pipeline = ReceivePipeline(self.server_socket, 0, IDLE_INTERVAL)
+        file_out = MemoryWriter()
+        self.send('inline')
+        data = self.receive(pipeline)
+        pipeline.write(file_out, 0, buffer(data))
+        pipeline.close_file(file_out)
+        self.close(pipeline)
+        self.assertEqual(file_out.writes, [(0, 'inline')])
+        self.assertTrue(file_out.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,303 @@
+"""
+test_ngtitov_p2mpwriter.py
+
+CSC 573 (601) - Internet Protocols
+Project 2
+Unit tests of the output file writer of the P2MP-FTP Server: the payloads
+written at their offsets, in any order and overlapping, must give the file
+sent, whether they are staged or copied into the memory mapping, and the
+progress file must let the interrupted transfer be resumed.
+
+Run the tests from the directory of the project:
+ > python -m unittest discover
+
+
+@version: 1.0
+@todo: None
+@since: November 01, 2017
+
+@status: Complete
+@requires: None
+
+@contact: ngtitov@ncsu.edu
+@author: Nikolay G. Titov
+"""
+
+# Import required Python libraries
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+from StringIO import StringIO
+from ngtitov_p2mpwriter import COALESCE_SIZE, PREALLOCATION_SIZE, \
+    PROGRESS_SUFFIX, read_progress, write_progress, remove_progress, \
+    FileWriter, SharedFileWriter, StreamWriter
+
+SEGMENT_SIZE = 1000
+
+
+class SharedEnd:
+    """Shared value of the end of the written data, in a single process."""
+
+    def __init__(self):
+        self.value = 0
+
+
+class ProgressTest(unittest.TestCase):
+    """Progress file of the partial file."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.progress_name = os.path.join(self.directory,
+                                          'file' + PROGRESS_SUFFIX)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        self.assertEqual(read_progress(self.progress_name), None)
+        write_progress(self.progress_name, 1000, 5000)
+        self.assertEqual(read_progress(self.progress_name), (1000, 5000))
+        # The progress is replaced, and the temporary file is renamed
+        write_progress(self.progress_name, 0, 2 ** 40)
+        self.assertEqual(read_progress(self.progress_name), (0, 2 ** 40))
+        self.assertEqual(os.listdir(self.directory),
+                         ['file' + PROGRESS_SUFFIX])
+        remove_progress(self.progress_name)
+        self.assertEqual(os.listdir(self.directory), [])
+        # The missing progress file is not an error
+        remove_progress(self.progress_name)
+
+    def test_invalid(self):
+        for content in ('', '100', '1 2 3', 'a b', '200 100', '-1 100'):
+            with open(self.progress_name, 'w') as progress_file:
+                progress_file.write(content)
+            self.assertEqual(read_progress(self.progress_name), None,
+                             content)
+
+
+class FileWriterTest(unittest.TestCase):
+    """Payloads written at their offsets, staged in the coalescing buffer.
+    """
+    use_mmap = False
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.directory, 'file')
+        self.generator = random.Random(11)
+        size = 100 * SEGMENT_SIZE
+        self.data = ('%0*x' % (2 * size, self.generator.getrandbits(
+            8 * size))).decode('hex')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.file_name, 'rb') as file_in:
+            return file_in.read()
+
+    def segments(self, first, end):
+        """Lists the offsets and payloads of the segments of the range."""
+        return [(offset, buffer(self.data, offset, min(SEGMENT_SIZE,
+                                                       end - offset)))
+                for offset in range(first, end, SEGMENT_SIZE)]
+
+    def test_in_sequence(self):
+        writer = FileWriter(self.file_name, use_mmap=self.use_mmap)
+        for offset, payload in self.segments(0, len(self.data)):
+            writer.write(offset, payload)
+        self.assertEqual(writer.size, len(self.data))
+        # The file is extended ahead of the writes
+        self.assertEqual(writer.allocated, PREALLOCATION_SIZE)
+        self.assertEqual(os.path.getsize(self.file_name), PREALLOCATION_SIZE)
+        writer.close()
+        self.assertEqual(self.read(), self.data)
+
+    def test_out_of_order(self):
+        writer = FileWriter(self.file_name, use_mmap=self.use_mmap)
+        segments = self.segments(0, len(self.data))
+        self.generator.shuffle(segments)
+        for offset, payload in segments:
+            writer.write(offset, payload)
+        writer.close()
+        self.assertEqual(self.read(), self.data)
+
+    def test_overlapping(self):
+        # The re-transmitted payloads overwrite the same bytes, and the
+        # latest write of every byte is kept
+        expected = bytearray(50 * SEGMENT_SIZE)
+        writer = FileWriter(self.file_name, use_mmap=self.use_mmap)
+        for _ in range(500):
+            offset = self.generator.randrange(len(expected) - 100)
+            size = self.generator.randrange(1, min(3 * SEGMENT_SIZE,
+                                                   len(expected) - offset))
+            payload = self.data[offset:offset + size]
+            writer.write(offset, payload)
+            expected[offset:offset + size] = payload
+        writer.write(len(expected) - 1, 'z')
+        expected[-1] = 'z'
+        writer.close()
+        # The bytes never written are zeros
+        self.assertEqual(self.read(), str(expected))
+
+    def test_gap(self):
+        # The file is truncated to the farthest write, the gap is zeros
+        writer = FileWriter(self.file_name, use_mmap=self.use_mmap)
+        writer.write(5000, 'tail')
+        writer.write(0, 'head')
+        writer.close()
+        self.assertEqual(self.read(), 'head' + '\0' * 4996 + 'tail')
+
+    def test_preallocation(self):
+        writer = FileWriter(self.file_name, use_mmap=self.use_mmap)
+        writer.write(PREALLOCATION_SIZE - 1, 'ab')
+        self.assertEqual(writer.allocated, 2 * PREALLOCATION_SIZE)
+        self.assertEqual(os.path.getsize(self.file_name),
+                         2 * PREALLOCATION_SIZE)
+        writer.close()
+        self.assertEqual(os.path.getsize(self.file_name),
+                         PREALLOCATION_SIZE + 1)
+
+    def test_empty(self):
+        writer = FileWriter(self.file_name, use_mmap=self.use_mmap)
+        writer.close()
+        self.assertEqual(self.read(), '')
+
+    def test_resume(self):
+        # The transfer is interrupted with the range [0, 30000) received in
+        # sequence and some segments beyond it
+        progress_name = self.file_name + PROGRESS_SUFFIX
+        writer = FileWriter(self.file_name, use_mmap=self.use_mmap,
+                            resume=True)
+        for offset, payload in self.segments(0, 30 * SEGMENT_SIZE) + \
+                self.segments(45 * SEGMENT_SIZE, 47 * SEGMENT_SIZE):
+            writer.write(offset, payload)
+        writer.close()
+        write_progress(progress_name, 0, 30 * SEGMENT_SIZE)
+        # The next run keeps the range received in sequence only
+        writer = FileWriter(self.file_name, use_mmap=self.use_mmap,
+                            resume=True)
+        first, end = read_progress(progress_name)
+        writer.resume(end)
+        self.assertEqual(os.path.getsize(self.file_name),
+                         PREALLOCATION_SIZE if self.use_mmap else end)
+        segments = self.segments(end, len(self.data))
+        self.generator.shuffle(segments)
+        for offset, payload in segments:
+            writer.write(offset, payload)
+        writer.close()
+        remove_progress(progress_name)
+        self.assertEqual(self.read(), self.data)
+        self.assertFalse(os.path.exists(progress_name))
+
+    def test_not_resumed(self):
+        with open(self.file_name, 'wb') as file_out:
+            file_out.write(self.data)
+        writer = FileWriter(self.file_name, use_mmap=self.use_mmap)
+        writer.write(0, 'new')
+        writer.close()
+        self.assertEqual(self.read(), 'new')
+
+
+class MmapFileWriterTest(FileWriterTest):
+    """Payloads copied into the memory mapping of the file."""
+    use_mmap = True
+
+
+class StagingTest(unittest.TestCase):
+    """Coalescing of the adjacent writes in the staging buffer."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.directory, 'file')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_coalescing(self):
+        writer = FileWriter(self.file_name)
+        writer.write(0, 'a' * 100)
+        writer.write(100, 'b' * 100)
+        self.assertEqual((writer.start, writer.length), (0, 200))
+        # The staged data is not written yet
+        writer.file_out.flush()
+        with open(self.file_name, 'rb') as file_in:
+            self.assertEqual(file_in.read(200), '\0' * 200)
+        # The write that is not adjacent flushes the staged data
+        writer.write(1000, 'c' * 100)
+        self.assertEqual((writer.start, writer.length), (1000, 100))
+        writer.file_out.flush()
+        with open(self.file_name, 'rb') as file_in:
+            self.assertEqual(file_in.read(200), 'a' * 100 + 'b' * 100)
+        writer.close()
+
+    def test_full_buffer(self):
+        writer = FileWriter(self.file_name)
+        writer.write(0, 'a' * (COALESCE_SIZE - 10))
+        writer.write(COALESCE_SIZE - 10, 'b' * 20)
+        self.assertEqual((writer.start, writer.length),
+                         (COALESCE_SIZE - 10, 20))
+        # The write larger than the buffer is written straight to the file
+        writer.write(COALESCE_SIZE + 10, 'c' * (COALESCE_SIZE + 1))
+        self.assertEqual(writer.length, 0)
+        writer.close()
+        with open(self.file_name, 'rb') as file_in:
+            self.assertEqual(file_in.read(), 'a' * (COALESCE_SIZE - 10) +
+                             'b' * 20 + 'c' * (COALESCE_SIZE + 1))
+
+
+class SharedFileWriterTest(unittest.TestCase):
+    """Stripes of the file written into the same file."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.directory, 'file')
+        open(self.file_name, 'wb').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_stripes(self):
+        lock = threading.Lock()
+        end = SharedEnd()
+        writers = [SharedFileWriter(self.file_name, lock, end)
+                   for _ in range(2)]
+        writers[1].write(PREALLOCATION_SIZE + 5, 'second')
+        # The other writer does not shrink the file extended further
+        writers[0].write(0, 'first')
+        self.assertEqual(os.path.getsize(self.file_name),
+                         2 * PREALLOCATION_SIZE)
+        for writer in writers:
+            writer.close()
+        self.assertEqual(end.value, PREALLOCATION_SIZE + 11)
+        with open(self.file_name, 'r+b') as file_out:
+            file_out.truncate(end.value)
+            file_out.seek(0)
+            data = file_out.read()
+        self.assertEqual(data[:5], 'first')
+        self.assertEqual(data[-6:], 'second')
+
+
+class StreamWriterTest(unittest.TestCase):
+    """Payloads written in sequence into the stream."""
+
+    def test_out_of_order(self):
+        stream = StringIO()
+        writer = StreamWriter(stream)
+        writer.write(3, buffer('def'))
+        writer.write(9, 'jk')
+        writer.write(0, 'abc')
+        self.assertEqual(stream.getvalue(), 'abcdef')
+        writer.write(6, 'ghi')
+        # The payload before the data written is a duplicate
+        writer.write(0, 'xyz')
+        self.assertEqual(stream.getvalue(), 'abcdefghijk')
+        self.assertEqual(writer.size, 11)
+        self.assertEqual(writer.pending, {})
+        self.assertRaises(IOError, writer.resume, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()